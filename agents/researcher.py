@@ -1,7 +1,5 @@
 import os
 from dotenv import load_dotenv
-from transformers import AutoModelForCausalLM, AutoTokenizer
-import openai
 
 # Load environment variables
 load_dotenv()
@@ -12,8 +10,12 @@ class ResearcherAgent:
             self.api_key = os.environ.get('OPENAI_API_KEY')  # Keep this for compatibility
             if not self.api_key:
                 raise ValueError("OPENAI_API_KEY not found in environment variables")
-            openai.api_key = self.api_key
+            # Imported here: the `openai` argument shadows the module name, and
+            # neither backend should load until an agent is actually created
+            import openai as openai_client
+            openai_client.api_key = self.api_key
         else:
+            from transformers import AutoModelForCausalLM, AutoTokenizer
             self.tokenizer = AutoTokenizer.from_pretrained('meta-llama/Llama-3-3')
             self.model = AutoModelForCausalLM.from_pretrained('meta-llama/Llama-3-3')
 
@@ -36,6 +38,7 @@ class ResearcherAgent:
             return self.tokenizer.decode(outputs[0], skip_special_tokens=True)
         else:
             # OpenAI summarization logic
+            import openai
             response = openai.Completion.create(
                 engine="text-davinci-003",
                 prompt=f"Summarize the following document: {compiled_document}",
@@ -9,8 +9,6 @@ from pg_crew_run import PageCrewRun
 from pg_export_crew import PageExportCrew
 from dotenv import load_dotenv
 import os
-from PIL import Image, ImageDraw, ImageFont
-from my_agent import ResearcherAgent
 
 def pages():
     return {
@@ -24,11 +22,19 @@ def pages():
     }
 
 def load_data():
-    ss.agents = db_utils.load_agents()
-    ss.tasks = db_utils.load_tasks()
-    ss.crews = db_utils.load_crews()
-    ss.tools = db_utils.load_tools()
-    ss.enabled_tools = db_utils.load_tools_state()
+    # Objects are rebuilt only after an entity write by any process (this one,
+    # the CLI or a job worker); until then the session keeps its objects,
+    # unsaved edits included. The rows come from db_utils' shared cache.
+    if ss.get('data_version') == db_utils.data_version():
+        return
+    snapshot = db_utils.load_snapshot()
+    ss.agents = snapshot.agents
+    ss.tasks = snapshot.tasks
+    ss.crews = snapshot.crews
+    ss.tools = snapshot.tools
+    ss.enabled_tools = snapshot.enabled_tools
+    ss.load_stats = snapshot.stats
+    ss.data_version = snapshot.data_version
 
 
 def draw_sidebar():
@@ -36,6 +42,7 @@ def draw_sidebar():
         img_path = os.path.join(os.path.dirname(__file__), 'img', 'crewai_logo.png')
         os.makedirs(os.path.dirname(img_path), exist_ok=True)
         if not os.path.exists(img_path):
+            from PIL import Image, ImageDraw, ImageFont
             img = Image.new('RGB', (300, 100), color = (73, 109, 137))
             d = ImageDraw.Draw(img)
             try:
@@ -91,6 +98,8 @@ class PageResearch:
             if topic:
                 # Create a researcher agent
                 try:
+                    # crewai and the search tools are only loaded once research starts
+                    from researcher_agent import ResearcherAgent
                     self.researcher = ResearcherAgent()
                     
                     # Perform research
@@ -0,0 +1,194 @@
+import csv
+import io
+import json
+import os
+import queue
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from run_executor import RUN_EXECUTOR, RUN_WORKERS
+from task_graph import CREW_DAG_WIDTH
+from utils import new_id
+
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', str(RUN_WORKERS)))
+BATCH_DIR = os.getenv('BATCH_DIR', 'batches')
+
+def parse_rows(text, fmt):
+    """Input rows (dicts of placeholder values) from the text of a CSV file with a header line, or of a JSONL file."""
+    if fmt == 'csv':
+        return [
+            {key: value or '' for key, value in row.items() if key is not None}
+            for row in csv.DictReader(io.StringIO(text))
+        ]
+    rows = []
+    for number, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+        row = json.loads(line)
+        if not isinstance(row, dict):
+            raise ValueError(f"Line {number}: expected a JSON object, got {type(row).__name__}")
+        rows.append(row)
+    return rows
+
+def read_rows(path):
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        return parse_rows(f.read(), 'csv' if path.lower().endswith('.csv') else 'jsonl')
+
+def _row_key(index, inputs):
+    return index, json.dumps(inputs, sort_keys=True, default=str)
+
+def completed_rows(output_path):
+    """Keys of the rows output_path already holds a completed result for."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue  # cut short when the app stopped mid-write
+            if result.get('status') == 'completed':
+                done.add(_row_key(result['row'], result['inputs']))
+    return done
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+class BatchRun:
+    """Kickoff of one crew for every row of inputs, like crewai's kickoff_for_each,
+    with at most `concurrency` runs in flight in the executor's worker processes.
+
+    Each run's result is appended to the JSONL file at output_path as soon as
+    it finishes: row (index in rows), inputs, run_id, status, output, error,
+    seconds (run time) and latency (from submit to finish). Rows with a
+    completed line in output_path are skipped, so starting the same batch
+    on the same file again resumes it and retries the failed rows.
+    """
+    def __init__(self, crew, rows, output_path, concurrency=BATCH_CONCURRENCY, parallel=False, width=CREW_DAG_WIDTH,
+                 executor=RUN_EXECUTOR):
+        self.batch_id = "B_" + new_id()
+        self.crew = crew
+        self.rows = list(rows)
+        self.output_path = output_path
+        self.concurrency = max(1, concurrency)
+        self.parallel = parallel
+        self.width = width
+        self.executor = executor
+        self.status = 'pending'
+        self.counts = {'completed': 0, 'failed': 0, 'cancelled': 0}
+        self.skipped = 0
+        self.latencies = []
+        self.run_seconds = []
+        self.in_flight = {}
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_requested = False
+        self.finished = queue.Queue()
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+
+    @property
+    def active(self):
+        return self.status in ('pending', 'running')
+
+    def start(self):
+        """Run the batch in a background thread."""
+        threading.Thread(target=self.run, name=f'batch-{self.batch_id}', daemon=True).start()
+        return self
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+    def cancel(self):
+        """Submit no more rows and cancel the runs in flight; their rows stay unfinished."""
+        self.cancel_requested = True
+        with self.lock:
+            run_ids = list(self.in_flight)
+        for run_id in run_ids:
+            self.executor.cancel(run_id)
+
+    def run(self):
+        self.started_at = time.time()
+        self.status = 'running'
+        try:
+            done = completed_rows(self.output_path)
+            pending = deque((index, inputs) for index, inputs in enumerate(self.rows) if _row_key(index, inputs) not in done)
+            self.skipped = len(self.rows) - len(pending)
+            os.makedirs(os.path.dirname(os.path.abspath(self.output_path)), exist_ok=True)
+            with open(self.output_path, 'a', encoding='utf-8') as output:
+                while self.in_flight or (pending and not self.cancel_requested):
+                    while pending and len(self.in_flight) < self.concurrency and not self.cancel_requested:
+                        index, inputs = pending.popleft()
+                        handle = self.executor.submit(self.crew, inputs, parallel=self.parallel, width=self.width)
+                        with self.lock:
+                            self.in_flight[handle.run_id] = index
+                        handle.add_done_callback(self.finished.put)
+                    if not self.in_flight:
+                        continue  # cancelled before the next row was submitted: nothing to wait for
+                    handle = self.finished.get()
+                    self._record(output, handle)
+            self.status = 'cancelled' if self.cancel_requested else 'completed'
+        except Exception as e:
+            self.cancel()
+            self.status = 'failed'
+            self.error = f"Error running batch: {e}\n{traceback.format_exc()}"
+        finally:
+            self.finished_at = time.time()
+            self.done.set()
+
+    def _record(self, output, handle):
+        with self.lock:
+            index = self.in_flight.pop(handle.run_id)
+        latency = handle.finished_at - handle.submitted_at
+        output.write(json.dumps({
+            'row': index,
+            'inputs': handle.inputs,
+            'run_id': handle.run_id,
+            'status': handle.status,
+            'output': handle.output,
+            'error': handle.error,
+            'seconds': round(handle.elapsed(), 3),
+            'latency': round(latency, 3),
+            'finished_at': datetime.now().isoformat(),
+        }, ensure_ascii=False, default=str) + '\n')
+        # Flush every row, so a crash loses at most the runs in flight
+        output.flush()
+        with self.lock:
+            self.counts[handle.status] = self.counts.get(handle.status, 0) + 1
+            if handle.status == 'completed':
+                self.latencies.append(latency)
+                self.run_seconds.append(handle.elapsed())
+
+    def stats(self):
+        """Progress, throughput (finished rows per minute) and the latency of completed rows in seconds.
+
+        Cancelled rows are counted apart and are not remaining: this batch
+        will not run them, starting it again will.
+        """
+        with self.lock:
+            counts = dict(self.counts)
+            latencies = sorted(self.latencies)
+            run_seconds = list(self.run_seconds)
+            in_flight = len(self.in_flight)
+        seconds = ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0.0
+        finished = sum(counts.values())
+        return {
+            'rows': len(self.rows),
+            'skipped': self.skipped,
+            **counts,
+            'in_flight': in_flight,
+            'remaining': len(self.rows) - self.skipped - counts['completed'] - counts['failed'] - counts['cancelled'],
+            'seconds': seconds,
+            'rows_per_minute': finished / seconds * 60 if seconds else 0.0,
+            'latency_avg': sum(latencies) / len(latencies) if latencies else None,
+            'latency_p50': _percentile(latencies, 0.5),
+            'latency_p95': _percentile(latencies, 0.95),
+            'latency_max': latencies[-1] if latencies else None,
+            'run_seconds_avg': sum(run_seconds) / len(run_seconds) if run_seconds else None,
+        }
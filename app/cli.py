@@ -0,0 +1,229 @@
+"""Run crews stored in crewai.db without the Streamlit UI.
+
+    python app/cli.py list
+    python app/cli.py run --crew "Research crew" --input topic=AI --output result.json
+    python app/cli.py batch --crew C_01J... --inputs-file companies.csv --output results.jsonl
+    python app/cli.py enqueue --crew "Research crew" --input topic=AI --priority 5
+    python app/cli.py worker --slots 4
+
+Only the modules needed to load and run crews are imported, so a run
+starts without the cost of Streamlit and the pages.
+"""
+import argparse
+import json
+import os
+import sys
+from dotenv import load_dotenv
+import db_utils
+
+def parse_inputs(pairs, inputs_file=None):
+    """Kickoff inputs from a JSON object file, overridden by KEY=VALUE pairs."""
+    inputs = {}
+    if inputs_file:
+        with open(inputs_file, encoding='utf-8') as f:
+            inputs = json.load(f)
+        if not isinstance(inputs, dict):
+            raise ValueError(f"{inputs_file} must hold a JSON object of placeholder values")
+    for pair in pairs or []:
+        key, separator, value = pair.partition('=')
+        if not separator:
+            raise ValueError(f"Expected KEY=VALUE, got {pair!r}")
+        inputs[key.strip()] = value
+    return inputs
+
+def find_crew(name_or_id):
+    crews = db_utils.load_crews()
+    crew = next((crew for crew in crews if crew.id == name_or_id), None)
+    if crew is not None:
+        return crew
+    matches = [crew for crew in crews if crew.name == name_or_id]
+    if not matches:
+        raise ValueError(f"No crew named or with id {name_or_id!r}")
+    if len(matches) > 1:
+        raise ValueError(f"{len(matches)} crews are named {name_or_id!r}, pass the id instead: "
+                         + ', '.join(crew.id for crew in matches))
+    return matches[0]
+
+def check_crew(crew, inputs):
+    from task_graph import CycleError
+    try:
+        crew.task_graph().order()
+    except CycleError as e:
+        raise ValueError(str(e))
+    missing = crew.placeholders() - set(inputs)
+    if missing:
+        print(f"Warning: no input for placeholders: {', '.join(sorted(missing))}", file=sys.stderr)
+
+def write_json(data, output, stdout):
+    text = json.dumps(data, indent=2, ensure_ascii=False, default=str)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text, file=stdout)
+
+def cmd_list(args):
+    crews = db_utils.load_crews()
+    if args.output or args.json:
+        write_json([
+            {'id': crew.id, 'name': crew.name, 'process': crew.process,
+             'agents': [agent.role for agent in crew.agents], 'tasks': len(crew.tasks),
+             'placeholders': sorted(crew.placeholders())}
+            for crew in crews
+        ], args.output, args.stdout)
+        return 0
+    for crew in crews:
+        print(f"{crew.id}  {crew.name}  ({len(crew.agents)} agents, {len(crew.tasks)} tasks, {crew.process})", file=args.stdout)
+    return 0
+
+def _print_event(event):
+    from run_history import describe_event
+    print(describe_event(event), file=sys.stderr)
+
+def cmd_run(args):
+    from run_executor import run_here
+    crew = find_crew(args.crew)
+    inputs = parse_inputs(args.input, args.inputs_file)
+    check_crew(crew, inputs)
+    handle = run_here(crew, inputs, parallel=args.parallel, width=args.width,
+                      on_event=_print_event if args.verbose else None)
+    write_json({
+        'run_id': handle.run_id,
+        'crew_id': crew.id,
+        'crew': crew.name,
+        'inputs': inputs,
+        'status': handle.status,
+        'seconds': round(handle.elapsed(), 3),
+        'output': handle.output,
+        'tasks_output': handle.tasks_output,
+        'steps': handle.steps,
+        'build_errors': handle.build_errors,
+        'error': handle.error,
+    }, args.output, args.stdout)
+    return 0 if handle.status == 'completed' else 1
+
+def cmd_batch(args):
+    from batch_runner import BatchRun, read_rows
+    crew = find_crew(args.crew)
+    rows = read_rows(args.inputs_file)
+    if rows:
+        check_crew(crew, rows[0])
+    batch = BatchRun(crew, rows, args.output, args.concurrency, parallel=args.parallel, width=args.width).start()
+    try:
+        while not batch.wait(args.progress_every):
+            stats = batch.stats()
+            print(f"{stats['skipped'] + stats['completed'] + stats['failed']}/{stats['rows']} rows done, "
+                  f"{stats['failed']} failed, {stats['cancelled']} cancelled, {stats['in_flight']} running, "
+                  f"{stats['rows_per_minute']:.1f} rows/min",
+                  file=sys.stderr)
+    except KeyboardInterrupt:
+        print("Stopping: cancelling the runs in flight, run the same command again to resume", file=sys.stderr)
+        batch.cancel()
+        batch.wait()
+    stats = batch.stats()
+    write_json(dict(stats, batch_id=batch.batch_id, status=batch.status, output=args.output, error=batch.error), None, args.stdout)
+    return 0 if batch.status == 'completed' and not stats['failed'] else 1
+
+def cmd_enqueue(args):
+    from job_queue import enqueue
+    crew = find_crew(args.crew)
+    inputs = parse_inputs(args.input, args.inputs_file)
+    check_crew(crew, inputs)
+    job_id = enqueue(crew, inputs, priority=args.priority, delay=args.delay, parallel=args.parallel, width=args.width)
+    write_json({'job_id': job_id, 'crew_id': crew.id, 'crew': crew.name, 'inputs': inputs, 'priority': args.priority}, None, args.stdout)
+    return 0
+
+def cmd_worker(args):
+    from job_queue import JobWorker
+    from run_executor import RUN_EXECUTOR
+    RUN_EXECUTOR.max_workers = max(RUN_EXECUTOR.max_workers, args.slots)
+    worker = JobWorker(slots=args.slots, lease_seconds=args.lease)
+    print(f"Worker {worker.worker_id} running up to {worker.slots} jobs, Ctrl+C to stop", file=sys.stderr)
+    worker.start()
+    try:
+        while worker.thread.is_alive():
+            worker.thread.join(1)
+    except KeyboardInterrupt:
+        print("Stopping: requeueing the jobs in flight", file=sys.stderr)
+    worker.stop()
+    return 0
+
+def build_parser():
+    from batch_runner import BATCH_CONCURRENCY
+    from job_queue import JOB_LEASE_SECONDS, JOB_WORKER_SLOTS
+    from task_graph import CREW_DAG_WIDTH
+    parser = argparse.ArgumentParser(prog='cli.py', description="Run crews stored in the CrewAI Studio database.")
+    parser.add_argument('--db', default=db_utils.DB_NAME, help="SQLite database file (default: %(default)s)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    list_parser = commands.add_parser('list', help="List the crews")
+    list_parser.add_argument('--json', action='store_true', help="Print JSON instead of one line per crew")
+    list_parser.add_argument('--output', help="Write JSON to this file")
+    list_parser.set_defaults(handler=cmd_list)
+
+    def add_crew_arguments(command_parser):
+        command_parser.add_argument('--crew', required=True, help="Crew name or id")
+        command_parser.add_argument('--parallel', action='store_true', help="Run independent tasks of a sequential crew in parallel")
+        command_parser.add_argument('--width', type=int, default=CREW_DAG_WIDTH, help="Tasks at a time with --parallel (default: %(default)s)")
+
+    run_parser = commands.add_parser('run', help="Kick off a crew once")
+    add_crew_arguments(run_parser)
+    run_parser.add_argument('--input', action='append', metavar='KEY=VALUE', help="Placeholder value, can be repeated")
+    run_parser.add_argument('--inputs-file', help="JSON object of placeholder values; --input overrides them")
+    run_parser.add_argument('--output', help="Write the JSON result to this file instead of stdout")
+    run_parser.add_argument('--verbose', action='store_true', help="Print task, tool and LLM call events to stderr")
+    run_parser.set_defaults(handler=cmd_run)
+
+    batch_parser = commands.add_parser('batch', help="Kick off a crew for every row of a CSV or JSONL file")
+    add_crew_arguments(batch_parser)
+    batch_parser.add_argument('--inputs-file', required=True, help="CSV with a column per placeholder, or JSONL")
+    batch_parser.add_argument('--output', required=True, help="JSONL results file; rows it has completed results for are skipped")
+    batch_parser.add_argument('--concurrency', type=int, default=BATCH_CONCURRENCY, help="Runs at a time (default: %(default)s)")
+    batch_parser.add_argument('--progress-every', type=float, default=10.0, metavar='SECONDS',
+                              help="Print progress to stderr this often (default: %(default)s)")
+    batch_parser.set_defaults(handler=cmd_batch)
+
+    enqueue_parser = commands.add_parser('enqueue', help="Add a kickoff to the job queue")
+    add_crew_arguments(enqueue_parser)
+    enqueue_parser.add_argument('--input', action='append', metavar='KEY=VALUE', help="Placeholder value, can be repeated")
+    enqueue_parser.add_argument('--inputs-file', help="JSON object of placeholder values; --input overrides them")
+    enqueue_parser.add_argument('--priority', type=int, default=0, help="Higher runs first (default: %(default)s)")
+    enqueue_parser.add_argument('--delay', type=float, default=0, metavar='SECONDS', help="Run no sooner than this")
+    enqueue_parser.set_defaults(handler=cmd_enqueue)
+
+    worker_parser = commands.add_parser('worker', help="Run queued and scheduled jobs until stopped")
+    worker_parser.add_argument('--slots', type=int, default=JOB_WORKER_SLOTS, help="Jobs at a time (default: %(default)s)")
+    worker_parser.add_argument('--lease', type=float, default=JOB_LEASE_SECONDS, metavar='SECONDS',
+                               help="Requeue a job when its worker has not renewed the lease for this long (default: %(default)s)")
+    worker_parser.set_defaults(handler=cmd_worker)
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, 'parallel', False):
+        from task_graph import dag_runner_supported
+        if not dag_runner_supported():
+            parser.error("--parallel needs a crewai version whose Task has execute_sync()")
+    load_dotenv()
+    if not os.path.exists(args.db):
+        parser.error(f"database {args.db} does not exist")
+    db_utils.DB_NAME = args.db
+    db_utils.initialize_db()
+    # Crews log to stdout when verbose, and so do the batch's worker processes:
+    # point file descriptor 1 at stderr and keep the real stdout for the results
+    sys.stdout.flush()
+    args.stdout = os.fdopen(os.dup(1), 'w', encoding='utf-8')
+    os.dup2(2, 1)
+    try:
+        return args.handler(args)
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    finally:
+        args.stdout.flush()
+        os.dup2(args.stdout.fileno(), 1)
+        db_utils.close_db_connection()
+
+if __name__ == '__main__':
+    sys.exit(main())
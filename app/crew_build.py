@@ -0,0 +1,107 @@
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from llms import llm_pool_stats
+
+CREW_BUILD_WORKERS = int(os.getenv('CREW_BUILD_WORKERS', '8'))
+
+class CrewBuildError(Exception):
+    """Some tools or agents of a crew could not be built.
+
+    errors is a list of (kind, label, exception), one per failing object;
+    agents that only failed because one of their tools did are not repeated.
+    """
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('; '.join(f"{kind} {label}: {error}" for kind, label, error in errors))
+
+class BuildContext:
+    """Memo for one crew build, so every MyAgent, MyTask and MyTool becomes exactly one crewai object.
+
+    Tasks, the crew and the manager all get the same crewai Agent instead of
+    building their own, and every tool (RAG tools embed their source on
+    construction) is created once. build_agents() constructs tools and
+    agents concurrently in a bounded thread pool. stats() reports what was
+    constructed and reused and a timeline of every construction.
+    """
+    def __init__(self, workers=CREW_BUILD_WORKERS):
+        self.workers = workers
+        self.objects = {}
+        self.built = {}
+        self.reused = {}
+        self.timeline = []
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.llm_stats = llm_pool_stats()
+
+    def get(self, kind, key, factory, label=None):
+        """The object memoized under (kind, key), calling factory once to create it.
+
+        Safe to call from several threads: a second caller for the same key
+        waits for the first one's result (or exception).
+        """
+        with self.lock:
+            future = self.objects.get((kind, key))
+            owner = future is None
+            if owner:
+                future = self.objects[kind, key] = Future()
+            else:
+                self.reused[kind] = self.reused.get(kind, 0) + 1
+        if owner:
+            start = time.perf_counter()
+            try:
+                future.set_result(factory())
+            except Exception as e:
+                future.set_exception(e)
+            end = time.perf_counter()
+            with self.lock:
+                self.built[kind] = self.built.get(kind, 0) + 1
+                self.timeline.append({
+                    'kind': kind, 'id': key, 'label': label or key,
+                    'start': start - self.started, 'seconds': end - start,
+                    'thread': threading.current_thread().name,
+                    'error': repr(future.exception()) if future.exception() else None,
+                })
+        return future.result()
+
+    def tool(self, tool):
+        return self.get('tool', tool.tool_id, tool.create_tool, label=tool.name)
+
+    def build_agents(self, agents, manager_agent=None):
+        """Construct the tools of agents, then the agents, in a pool of self.workers threads.
+
+        Tools are submitted first, so an agent never waits for a tool that
+        has not started. The manager agent is built under its own key, apart
+        from the crew's agents. Raises CrewBuildError listing every failed
+        tool and agent once all of them finished.
+        """
+        agents = [(agent, 'agent') for agent in {agent.id: agent for agent in agents}.values()]
+        if manager_agent:
+            agents.append((manager_agent, 'manager_agent'))
+        tools = list({tool.tool_id: tool for agent, _ in agents for tool in agent.tools}.values())
+        with ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix='crew-build') as pool:
+            tool_futures = [(tool, pool.submit(self.tool, tool)) for tool in tools]
+            agent_futures = [(agent, pool.submit(agent.get_crewai_agent, self, kind)) for agent, kind in agents]
+            wait([future for _, future in tool_futures + agent_futures])
+
+        errors = [('tool', tool.name, future.exception()) for tool, future in tool_futures if future.exception()]
+        tool_errors = {id(error) for _, _, error in errors}
+        errors += [
+            ('agent', agent.role, future.exception()) for agent, future in agent_futures
+            if future.exception() and id(future.exception()) not in tool_errors
+        ]
+        if errors:
+            raise CrewBuildError(errors)
+
+    def stats(self):
+        llm_stats = llm_pool_stats()
+        return {
+            'built': dict(self.built),
+            'reused': dict(self.reused),
+            'llm_clients_created': llm_stats['misses'] - self.llm_stats['misses'],
+            'llm_clients_reused': llm_stats['hits'] - self.llm_stats['hits'],
+            'seconds': time.perf_counter() - self.started,
+            'workers': self.workers,
+            'timeline': sorted(self.timeline, key=lambda entry: entry['start']),
+        }
@@ -0,0 +1,83 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+import db_utils
+from crew_build import BuildContext
+from llms import LLM_CONFIG, env_config
+
+CREW_CACHE_SIZE = int(os.getenv('CREW_CACHE_SIZE', '8'))
+
+def _llm_settings():
+    """API keys and base URLs the LLM clients are built with; a changed key must not reuse old clients."""
+    config = env_config()
+    names = sorted({provider[key] for provider in LLM_CONFIG.values() for key in ('api_key_env', 'base_url_env') if key in provider})
+    return {name: config.get(name) for name in names}
+
+def crew_fingerprint(crew, **kwargs):
+    """sha256 over everything get_crewai_crew(**kwargs) reads: the crew, its agents (including the
+    manager and the agents assigned to tasks), tasks, tools and the LLM settings."""
+    definition = {
+        'rows': db_utils.crew_rows(crew),
+        'llm_settings': _llm_settings(),
+        'kwargs': kwargs,
+    }
+    return hashlib.sha256(json.dumps(definition, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def _copyable(crewai_crew):
+    # crewai's own Crew.copy() copies agents and tasks (sharing LLMs and
+    # tools); versions without it only inherit pydantic's shallow copy,
+    # which would share task state between runs.
+    return getattr(type(crewai_crew).copy, '__module__', '').startswith('crewai')
+
+class CrewCache:
+    """LRU cache of built crewai crews, keyed by crew_fingerprint().
+
+    The cached crew is a template that is never run itself: checkout()
+    hands out a copy, so every run gets its own agents and tasks while
+    sharing the expensive parts (LLM clients, tools and their embeddings).
+    """
+    def __init__(self, max_entries=CREW_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.templates = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def checkout(self, crew, **kwargs):
+        """Return (crewai crew ready to run, info about how it was obtained)."""
+        start = time.perf_counter()
+        key = crew_fingerprint(crew, **kwargs)
+        with self.lock:
+            entry = self.templates.get(key)
+            if entry is not None:
+                self.templates.move_to_end(key)
+                self.hits += 1
+        if entry is not None:
+            template, build_stats = entry
+            return template.copy(), {'cached': True, 'build': build_stats, 'seconds': time.perf_counter() - start}
+
+        build = BuildContext()
+        template = crew.get_crewai_crew(build=build, **kwargs)
+        build_stats = build.stats()
+        with self.lock:
+            self.misses += 1
+            if _copyable(template) and self.max_entries > 0:
+                self.templates[key] = (template, build_stats)
+                self.templates.move_to_end(key)
+                while len(self.templates) > self.max_entries:
+                    self.templates.popitem(last=False)
+                    self.evictions += 1
+            else:
+                # Not cacheable: hand out the freshly built crew itself
+                return template, {'cached': False, 'build': build_stats, 'seconds': time.perf_counter() - start}
+        return template.copy(), {'cached': False, 'build': build_stats, 'seconds': time.perf_counter() - start}
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.templates), 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+CREW_CACHE = CrewCache()
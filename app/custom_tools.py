@@ -4,7 +4,6 @@ from crewai_tools import BaseTool
 import requests
 import importlib.util
 from pydantic.v1 import BaseModel, Field,root_validator, ValidationError
-import docker
 import base64
 
 class FixedCustomFileWriteToolInputSchema(BaseModel):
@@ -179,6 +178,7 @@ class CustomCodeInterpreterTool(BaseTool):
         """
         Verify if the Docker image is available
         """
+        import docker
         image_tag = "code-interpreter:latest"
         client = docker.from_env()
 
@@ -198,7 +198,7 @@ class CustomCodeInterpreterTool(BaseTool):
             )
 
     def _install_libraries(
-        self, container: docker.models.containers.Container, libraries: str
+        self, container: 'docker.models.containers.Container', libraries: str
     ) -> None:
         """
         Install missing libraries in the Docker container
@@ -212,7 +212,8 @@ class CustomCodeInterpreterTool(BaseTool):
                     print(install_result.output.decode("utf-8"))
             
 
-    def _get_existing_container(self, container_name: str) -> Optional[docker.models.containers.Container]:
+    def _get_existing_container(self, container_name: str) -> Optional['docker.models.containers.Container']:
+        import docker
         client = docker.from_env()
         try:
             existing_container = client.containers.get(container_name)
@@ -224,7 +225,8 @@ class CustomCodeInterpreterTool(BaseTool):
             pass
         return None
 
-    def _init_docker_container(self) -> docker.models.containers.Container:
+    def _init_docker_container(self) -> 'docker.models.containers.Container':
+        import docker
         client = docker.from_env()
         volumes = {}
         if self.workspace_dir:
@@ -1,68 +1,677 @@
 import sqlite3
 import os
 import json
-from my_tools import TOOL_CLASSES
+import gzip
+import io
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+import entity_codecs
 
 DB_NAME = 'crewai.db'
 
-def get_db_connection():
-    conn = sqlite3.connect(DB_NAME)
+# Codec used for new writes of the entities data column, see entity_codecs.
+# Every row records its own codec, so rows written with another one stay readable.
+DB_CODEC = os.getenv('CREWAI_DB_CODEC', 'json')
+
+# Pragmas applied to every connection. WAL lets readers and the crew-run
+# thread work alongside a writer, and synchronous=NORMAL only fsyncs on
+# checkpoints instead of on every commit.
+DB_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'foreign_keys': 'ON',
+    'temp_store': 'MEMORY',
+    'cache_size': -16000,
+    'mmap_size': 64 * 1024 * 1024,
+}
+
+_local = threading.local()
+_connections = []
+_connections_lock = threading.Lock()
+
+def _connect(db_name):
+    # Only the owning thread uses a connection, but the finalizer closing it may run elsewhere
+    conn = sqlite3.connect(db_name, timeout=DB_PRAGMAS['busy_timeout'] / 1000, check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    for pragma, value in DB_PRAGMAS.items():
+        conn.execute(f'PRAGMA {pragma}={value}')
     return conn
 
+def _release(conn, pid):
+    with _connections_lock:
+        if conn in _connections:
+            _connections.remove(conn)
+    # A connection inherited through fork belongs to the parent; leave it alone
+    if pid == os.getpid():
+        conn.close()
+
+class _ThreadConnection:
+    """The calling thread's connection. It lives in the thread-local storage,
+    so it is collected when the thread ends and the finalizer closes the
+    connection; Streamlit runs every rerun in a new thread."""
+    def __init__(self):
+        self.conn = _connect(DB_NAME)
+        self.db_name = DB_NAME
+        self.pid = os.getpid()
+        self.release = weakref.finalize(self, _release, self.conn, self.pid)
+
+def get_db_connection():
+    """Return the connection owned by the calling thread, opening it on first use.
+
+    Connections stay open for the lifetime of the thread so a rerun does not
+    pay the connect/pragma cost for every query. A connection is reopened
+    when DB_NAME changes or after a fork.
+    """
+    holder = getattr(_local, 'holder', None)
+    if holder is not None and (holder.db_name != DB_NAME or holder.pid != os.getpid()):
+        _local.holder = None
+        holder.release()
+        holder = None
+    if holder is None:
+        holder = _local.holder = _ThreadConnection()
+        with _connections_lock:
+            _connections.append(holder.conn)
+    return holder.conn
+
+def close_db_connection():
+    """Close the calling thread's connection, e.g. when a background thread finishes."""
+    holder = getattr(_local, 'holder', None)
+    if holder is not None:
+        _local.holder = None
+        holder.release()
+
+def close_all_connections():
+    """Close every connection opened by this process (shutdown, tests, switching DB_NAME)."""
+    with _connections_lock:
+        connections = list(_connections)
+        _connections.clear()
+    for conn in connections:
+        conn.close()
+    _local.holder = None
+
 def create_tables():
     conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS entities (
-            id TEXT PRIMARY KEY,
-            entity_type TEXT,
-            data TEXT
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS entities (
+                id TEXT PRIMARY KEY,
+                entity_type TEXT,
+                data TEXT
+            )
+        ''')
 
 def initialize_db():
     if not os.path.exists(DB_NAME):
         create_tables()
     else:
         conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT name FROM sqlite_master WHERE type="table" AND name="entities"')
+        cursor = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='entities'")
         table_exists = cursor.fetchone()
         if not table_exists:
             create_tables()
-        conn.close()
+    migrate()
+
+# Schema migrations, applied in order by migrate(). Each one is idempotent
+# and records its backfill progress in schema_migrations, so an interrupted
+# migration resumes where it stopped on the next start.
+MIGRATION_BATCH_SIZE = 500
+
+# References stored inside the entity data, mirrored into entity_links so
+# "tasks of crew X" or "agents using tool Y" are index lookups:
+# entity_type -> [(relation, data key)]
+ENTITY_LINKS = {
+    'agent': [('tool', 'tool_ids')],
+    'task': [
+        ('agent', 'agent_id'),
+        ('context', 'context_from_async_tasks_ids'),
+        ('context', 'context_from_sync_tasks_ids'),
+    ],
+    'crew': [
+        ('agent', 'agent_ids'),
+        ('task', 'task_ids'),
+        ('manager_agent', 'manager_agent_id'),
+    ],
+}
+
+def _table_columns(conn, table):
+    return [row['name'] for row in conn.execute(f'PRAGMA table_info({table})')]
+
+def _entity_links(entity_type, data):
+    links = []
+    for rel, key in ENTITY_LINKS.get(entity_type, []):
+        value = data.get(key)
+        if not value:
+            continue
+        target_ids = value if isinstance(value, list) else [value]
+        links.extend((rel, target_id, position) for position, target_id in enumerate(target_ids))
+    return links
+
+def _write_links(conn, entities):
+    """Replace the entity_links rows of every (entity_type, entity_id, data) in entities."""
+    conn.executemany('DELETE FROM entity_links WHERE src_id = ?', [(entity_id,) for _, entity_id, _ in entities])
+    conn.executemany('''
+        INSERT OR IGNORE INTO entity_links (src_id, rel, dst_id, position)
+        VALUES (?, ?, ?, ?)
+    ''', [
+        (entity_id, rel, dst_id, position)
+        for entity_type, entity_id, data in entities
+        for rel, dst_id, position in _entity_links(entity_type, data)
+    ])
+
+def _migrate_v1(conn):
+    """Indexed created_at column and the entity_links reference table."""
+    with conn:
+        if 'created_at' not in _table_columns(conn, 'entities'):
+            conn.execute('ALTER TABLE entities ADD COLUMN created_at TEXT')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_entities_type_created ON entities (entity_type, created_at, id)')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS entity_links (
+                src_id TEXT NOT NULL,
+                rel TEXT NOT NULL,
+                dst_id TEXT NOT NULL,
+                position INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (src_id, rel, dst_id)
+            ) WITHOUT ROWID
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_entity_links_dst ON entity_links (rel, dst_id)')
+
+    def backfill(rows):
+        entities = [(row['entity_type'], row['id'], _decode_row(row)) for row in rows]
+        conn.executemany(
+            'UPDATE entities SET created_at = ? WHERE id = ?',
+            [(data.get('created_at'), entity_id) for _, entity_id, data in entities]
+        )
+        _write_links(conn, entities)
+
+    _backfill(conn, 1, backfill)
+
+def _backfill(conn, version, backfill_batch):
+    """Run backfill_batch over the entities table in id order, one commit per batch."""
+    row = conn.execute('SELECT last_id FROM schema_migrations WHERE version = ?', (version,)).fetchone()
+    last_id = row['last_id'] if row else ''
+    while True:
+        rows = conn.execute(
+            'SELECT * FROM entities WHERE id > ? ORDER BY id LIMIT ?',
+            (last_id, MIGRATION_BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        with conn:
+            backfill_batch(rows)
+            last_id = rows[-1]['id']
+            conn.execute('''
+                INSERT INTO schema_migrations (version, last_id) VALUES (?, ?)
+                ON CONFLICT(version) DO UPDATE SET last_id = excluded.last_id
+            ''', (version, last_id))
+
+def _migrate_v2(conn):
+    """Run history: one row per kickoff in runs, one row per task in run_steps."""
+    with conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS runs (
+                id TEXT PRIMARY KEY,
+                crew_id TEXT NOT NULL,
+                crew_name TEXT,
+                status TEXT NOT NULL,
+                inputs TEXT,
+                output TEXT,
+                error TEXT,
+                started_at TEXT NOT NULL,
+                finished_at TEXT,
+                duration REAL,
+                llm_calls INTEGER,
+                prompt_tokens INTEGER,
+                completion_tokens INTEGER,
+                total_tokens INTEGER,
+                usage TEXT
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_runs_crew_started ON runs (crew_id, started_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_runs_started ON runs (started_at)')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS run_steps (
+                run_id TEXT NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+                position INTEGER NOT NULL,
+                task_id TEXT,
+                agent_role TEXT,
+                description TEXT,
+                output TEXT,
+                started_at TEXT,
+                finished_at TEXT,
+                duration REAL,
+                PRIMARY KEY (run_id, position)
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_run_steps_task ON run_steps (task_id)')
+
+# Full-text search over agents, tasks and run outputs. search_docs maps a
+# (doc_type, doc_id) pair to the rowid of its search_index row so documents
+# can be replaced through the primary key instead of scanning the index.
+SEARCH_FIELDS = {
+    'agent': ('role', ('goal', 'backstory')),
+    'task': ('description', ('expected_output',)),
+}
+
+def _fts5_available(conn):
+    try:
+        conn.execute('CREATE VIRTUAL TABLE temp._fts5_probe USING fts5(x)')
+        conn.execute('DROP TABLE temp._fts5_probe')
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+_search_enabled = {}
+
+def _search_index_enabled(conn):
+    if DB_NAME not in _search_enabled:
+        _search_enabled[DB_NAME] = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='search_index'"
+        ).fetchone() is not None
+    return _search_enabled[DB_NAME]
+
+def _search_document(entity_type, data):
+    title_field, body_fields = SEARCH_FIELDS[entity_type]
+    return data.get(title_field) or '', '\n'.join(data.get(field) or '' for field in body_fields)
+
+def _index_documents(conn, documents):
+    """Insert or replace (doc_type, doc_id, title, body) rows in the search index."""
+    if not documents or not _search_index_enabled(conn):
+        return
+    _unindex_documents(conn, [(doc_type, doc_id) for doc_type, doc_id, _, _ in documents])
+    for doc_type, doc_id, title, body in documents:
+        cursor = conn.execute('INSERT INTO search_docs (doc_type, doc_id) VALUES (?, ?)', (doc_type, doc_id))
+        conn.execute('INSERT INTO search_index (rowid, title, body) VALUES (?, ?, ?)', (cursor.lastrowid, title, body))
+
+def _unindex_documents(conn, documents):
+    if not documents or not _search_index_enabled(conn):
+        return
+    rowids = [
+        (row[0],) for doc_type, doc_id in documents
+        for row in conn.execute('SELECT rowid FROM search_docs WHERE doc_type = ? AND doc_id = ?', (doc_type, doc_id))
+    ]
+    conn.executemany('DELETE FROM search_index WHERE rowid = ?', rowids)
+    conn.executemany('DELETE FROM search_docs WHERE rowid = ?', rowids)
+
+def _index_entities(conn, entities):
+    _index_documents(conn, [
+        (entity_type, entity_id, *_search_document(entity_type, data))
+        for entity_type, entity_id, data in entities if entity_type in SEARCH_FIELDS
+    ])
+
+def _migrate_v3(conn):
+    """Full-text search index, skipped when the SQLite build has no FTS5."""
+    if not _fts5_available(conn):
+        return
+    with conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS search_docs (
+                rowid INTEGER PRIMARY KEY,
+                doc_type TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                UNIQUE (doc_type, doc_id)
+            )
+        ''')
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(title, body, tokenize='porter unicode61')")
+    _search_enabled.pop(DB_NAME, None)
+
+    def backfill(rows):
+        _index_entities(conn, [(row['entity_type'], row['id'], _decode_row(row)) for row in rows])
+
+    _backfill(conn, 3, backfill)
+    with conn:
+        for run in conn.execute('SELECT id, crew_name, output FROM runs WHERE output IS NOT NULL').fetchall():
+            _index_documents(conn, [('run', run['id'], run['crew_name'] or '', run['output'])])
+        for step in conn.execute('SELECT run_id, position, description, output FROM run_steps').fetchall():
+            _index_documents(conn, [('run_step', f"{step['run_id']}:{step['position']}", step['description'] or '', step['output'] or '')])
+
+def _migrate_v4(conn):
+    """Per-row codec tag for the entities data column."""
+    with conn:
+        if 'codec' not in _table_columns(conn, 'entities'):
+            conn.execute("ALTER TABLE entities ADD COLUMN codec TEXT NOT NULL DEFAULT 'json'")
+
+def _migrate_v5(conn):
+    """created_at is never NULL, so (created_at, id) row values order every entity."""
+    with conn:
+        conn.execute("UPDATE entities SET created_at = '' WHERE created_at IS NULL")
+
+def _migrate_v6(conn):
+    """Job queue and cron schedules. Times are Unix timestamps, so waits and leases are plain arithmetic."""
+    with conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                crew_id TEXT NOT NULL,
+                crew_name TEXT,
+                inputs TEXT NOT NULL,
+                options TEXT NOT NULL DEFAULT '{}',
+                priority INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'queued',
+                run_at REAL NOT NULL,
+                enqueued_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL DEFAULT 3,
+                worker TEXT,
+                lease_until REAL,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                run_id TEXT,
+                schedule_id TEXT,
+                error TEXT
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, run_at)')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS job_providers (
+                job_id TEXT NOT NULL,
+                provider TEXT NOT NULL,
+                PRIMARY KEY (job_id, provider)
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schedules (
+                id TEXT PRIMARY KEY,
+                crew_id TEXT NOT NULL,
+                cron TEXT NOT NULL,
+                inputs TEXT NOT NULL DEFAULT '{}',
+                options TEXT NOT NULL DEFAULT '{}',
+                priority INTEGER NOT NULL DEFAULT 0,
+                enabled INTEGER NOT NULL DEFAULT 1,
+                next_run_at REAL NOT NULL,
+                last_run_at REAL,
+                created_at TEXT
+            )
+        ''')
+
+def _migrate_v7(conn):
+    """Count entity writes in the database itself, so every process sees writes made by the others."""
+    with conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS entity_version (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                version INTEGER NOT NULL
+            )
+        ''')
+        conn.execute('INSERT OR IGNORE INTO entity_version (id, version) VALUES (0, 0)')
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS entities_{event.lower()}_version AFTER {event} ON entities
+                BEGIN UPDATE entity_version SET version = version + 1; END
+            ''')
+
+MIGRATIONS = [
+    (1, _migrate_v1),
+    (2, _migrate_v2),
+    (3, _migrate_v3),
+    (4, _migrate_v4),
+    (5, _migrate_v5),
+    (6, _migrate_v6),
+    (7, _migrate_v7),
+]
+
+def migrate():
+    """Bring the database schema up to the latest version."""
+    conn = get_db_connection()
+    with conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                last_id TEXT NOT NULL DEFAULT '',
+                completed_at TEXT
+            )
+        ''')
+    current_version = conn.execute('PRAGMA user_version').fetchone()[0]
+    for version, migration in MIGRATIONS:
+        if version <= current_version:
+            continue
+        migration(conn)
+        with _writing(conn):
+            conn.execute('''
+                INSERT INTO schema_migrations (version, completed_at) VALUES (?, datetime('now'))
+                ON CONFLICT(version) DO UPDATE SET completed_at = excluded.completed_at
+            ''', (version,))
+            conn.execute(f'PRAGMA user_version = {version}')
+        current_version = version
+
+def _decode_row(row):
+    return entity_codecs.decode(row['codec'] if 'codec' in row.keys() else None, row['data'])
+
+# entity_version.version is moved by a trigger on every entity write, in
+# the same transaction, by any process. The process counter is bumped after
+# every committed entity write here, which also covers the migrations that
+# rewrite entities before the triggers exist. The shared rows cache and each
+# session's objects are tagged with both and rebuilt only when either moves.
+_data_version = 0
+_data_version_lock = threading.Lock()
+
+def data_version():
+    """(stored entity version, process version). One single-row read per call."""
+    stored = get_db_connection().execute('SELECT version FROM entity_version').fetchone()[0]
+    return (stored, _data_version)
+
+def _bump_data_version():
+    global _data_version
+    with _data_version_lock:
+        _data_version += 1
+
+@contextmanager
+def _writing(conn):
+    """`with conn:` for entity writes. The version is bumped after the commit
+    so a concurrent reader can never cache pre-commit rows under the new version."""
+    try:
+        with conn:
+            yield
+    finally:
+        _bump_data_version()
+
+def _write_entities(conn, entities):
+    """Upsert a batch of (entity_type, entity_id, data) with one executemany."""
+    conn.executemany('''
+        INSERT INTO entities (id, entity_type, data, created_at, codec)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET
+            entity_type = excluded.entity_type,
+            data = excluded.data,
+            created_at = excluded.created_at,
+            codec = excluded.codec
+    ''', [
+        (entity_id, entity_type, entity_codecs.encode(DB_CODEC, data), data.get('created_at') or '', DB_CODEC)
+        for entity_type, entity_id, data in entities
+    ])
+    _write_links(conn, entities)
+    _index_entities(conn, entities)
+
+def _delete_entities(conn, entities):
+    """Delete a batch of (entity_type, entity_id) with one executemany."""
+    conn.executemany('''
+        DELETE FROM entities WHERE id = ? AND entity_type = ?
+    ''', [(entity_id, entity_type) for entity_type, entity_id in entities])
+    conn.executemany('''
+        DELETE FROM entity_links WHERE src_id = ? AND NOT EXISTS (SELECT 1 FROM entities WHERE id = ?)
+    ''', [(entity_id, entity_id) for _, entity_id in entities])
+    _unindex_documents(conn, [
+        (entity_type, entity_id) for entity_type, entity_id in entities
+        if entity_type in SEARCH_FIELDS and not conn.execute('SELECT 1 FROM entities WHERE id = ?', (entity_id,)).fetchone()
+    ])
+
+class _UnitOfWork:
+    def __init__(self):
+        self.pending = {}
+        self.persisted = []
+
+    def save(self, entity_type, entity_id, data):
+        self.pending.pop(entity_id, None)
+        self.pending[entity_id] = ('save', entity_type, data)
+
+    def delete(self, entity_type, entity_id):
+        self.pending.pop(entity_id, None)
+        self.pending[entity_id] = ('delete', entity_type, None)
+
+    def mark_persisted(self, entity, data):
+        """Mark a ChangeTracked entity clean once the unit is committed."""
+        self.persisted.append((entity, data))
+
+    def discard(self):
+        """Drop the buffered writes, leaving the entities as they were before the unit."""
+        self.pending = {}
+        self.persisted = []
+
+    def flush(self):
+        saves = [(entity_type, entity_id, data) for entity_id, (op, entity_type, data) in self.pending.items() if op == 'save']
+        deletes = [(entity_type, entity_id) for entity_id, (op, entity_type, _) in self.pending.items() if op == 'delete']
+        persisted = self.persisted
+        self.pending = {}
+        self.persisted = []
+        if saves or deletes:
+            conn = get_db_connection()
+            with _writing(conn):
+                if deletes:
+                    _delete_entities(conn, deletes)
+                if saves:
+                    _write_entities(conn, saves)
+        for entity, data in persisted:
+            entity.mark_persisted(data)
+
+@contextmanager
+def transaction():
+    """Collect save_*/delete_* calls and write them in a single commit on exit.
+
+    Nested transactions join the outermost one. Nothing is written if the
+    block raises, and the entities saved in it keep their change-tracking
+    state, so saving them again writes them. Only the last operation per
+    entity id is kept, so saving an entity twice in the block costs one row
+    write.
+    """
+    unit = getattr(_local, 'unit_of_work', None)
+    if unit is not None:
+        yield unit
+        return
+    unit = _local.unit_of_work = _UnitOfWork()
+    try:
+        yield unit
+        unit.flush()
+    except BaseException:
+        unit.discard()
+        raise
+    finally:
+        _local.unit_of_work = None
 
 def save_entity(entity_type, entity_id, data):
+    unit = getattr(_local, 'unit_of_work', None)
+    if unit is not None:
+        unit.save(entity_type, entity_id, data)
+        return
     conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT OR REPLACE INTO entities (id, entity_type, data)
-        VALUES (?, ?, ?)
-    ''', (entity_id, entity_type, json.dumps(data)))
-    conn.commit()
-    conn.close()
+    with _writing(conn):
+        _write_entities(conn, [(entity_type, entity_id, data)])
+
+def save_entity_fields(entity_type, entity_id, data, fields):
+    """Write only the given top-level fields of an existing entity.
+
+    entity_links are rewritten only when one of the fields holds references.
+    Falls back to a full save_entity when the row does not exist yet.
+    """
+    unit = getattr(_local, 'unit_of_work', None)
+    if unit is not None or DB_CODEC != 'json':
+        # Binary codecs cannot be patched in place, the row is re-encoded instead
+        save_entity(entity_type, entity_id, data)
+        return
+    conn = get_db_connection()
+    with _writing(conn):
+        cursor = conn.execute(
+            f"UPDATE entities SET data = json_set(data{', ?, json(?)' * len(fields)}), created_at = ? WHERE id = ? AND entity_type = ? AND codec = 'json'",
+            [param for field in fields for param in (f'$."{field}"', json.dumps(data[field]))]
+            + [data.get('created_at') or '', entity_id, entity_type]
+        )
+        if not cursor.rowcount:
+            _write_entities(conn, [(entity_type, entity_id, data)])
+        else:
+            if any(key in fields for _, key in ENTITY_LINKS.get(entity_type, [])):
+                _write_links(conn, [(entity_type, entity_id, data)])
+            if entity_type in SEARCH_FIELDS and set(fields) & {SEARCH_FIELDS[entity_type][0], *SEARCH_FIELDS[entity_type][1]}:
+                _index_entities(conn, [(entity_type, entity_id, data)])
+
+def _save_tracked(entity_type, entity_id, entity, data):
+    """Persist a ChangeTracked entity, skipping the write when nothing changed.
+
+    Returns True if anything was written.
+    """
+    changed = entity.changed_fields(data)
+    if changed == []:
+        return False
+    if changed is None or any(field not in data for field in changed):
+        save_entity(entity_type, entity_id, data)
+    else:
+        save_entity_fields(entity_type, entity_id, data, changed)
+    unit = getattr(_local, 'unit_of_work', None)
+    if unit is not None:
+        # Only buffered so far, the entity is clean once the unit commits
+        unit.mark_persisted(entity, data)
+    else:
+        entity.mark_persisted(data)
+    return True
 
 def load_entities(entity_type):
+    """All entities of entity_type in creation order, read straight off the (entity_type, created_at, id) index."""
+    conn = get_db_connection()
+    cursor = conn.execute('SELECT * FROM entities WHERE entity_type = ? ORDER BY created_at, id', (entity_type,))
+    return [(row['id'], _decode_row(row)) for row in cursor]
+
+def load_entities_page(entity_type, after=None, limit=100):
+    """One page of entities in creation order using keyset pagination.
+
+    after is the cursor returned with the previous page, None for the first
+    one. Returns (rows, cursor); cursor is None on the last page.
+    """
     conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM entities WHERE entity_type = ?', (entity_type,))
+    if after is None:
+        cursor = conn.execute(
+            'SELECT * FROM entities WHERE entity_type = ? ORDER BY created_at, id LIMIT ?',
+            (entity_type, limit)
+        )
+    else:
+        cursor = conn.execute(
+            'SELECT * FROM entities WHERE entity_type = ? AND (created_at, id) > (?, ?) ORDER BY created_at, id LIMIT ?',
+            (entity_type, after[0], after[1], limit)
+        )
     rows = cursor.fetchall()
-    conn.close()
-    return [(row['id'], json.loads(row['data'])) for row in rows]
+    next_cursor = (rows[-1]['created_at'], rows[-1]['id']) if len(rows) == limit else None
+    return [(row['id'], _decode_row(row)) for row in rows], next_cursor
+
+def load_referencing(entity_type, rel, target_id):
+    """Entities of entity_type that reference target_id, e.g. ('agent', 'tool', tool_id)."""
+    conn = get_db_connection()
+    cursor = conn.execute('''
+        SELECT e.id, e.data, e.codec FROM entity_links l
+        JOIN entities e ON e.id = l.src_id
+        WHERE l.rel = ? AND l.dst_id = ? AND e.entity_type = ?
+        ORDER BY e.created_at, e.id
+    ''', (rel, target_id, entity_type))
+    return [(row['id'], _decode_row(row)) for row in cursor]
+
+def load_referenced(source_id, rel):
+    """Entities referenced by source_id in their stored order, e.g. (crew_id, 'task')."""
+    conn = get_db_connection()
+    cursor = conn.execute('''
+        SELECT e.id, e.data, e.codec FROM entity_links l
+        JOIN entities e ON e.id = l.dst_id
+        WHERE l.src_id = ? AND l.rel = ?
+        ORDER BY l.position
+    ''', (source_id, rel))
+    return [(row['id'], _decode_row(row)) for row in cursor]
 
 def delete_entity(entity_type, entity_id):
+    unit = getattr(_local, 'unit_of_work', None)
+    if unit is not None:
+        unit.delete(entity_type, entity_id)
+        return
     conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        DELETE FROM entities WHERE id = ? AND entity_type = ?
-    ''', (entity_id, entity_type))
-    conn.commit()
-    conn.close()
+    with _writing(conn):
+        _delete_entities(conn, [(entity_type, entity_id)])
 
 def save_tools_state(enabled_tools):
     data = {
@@ -71,13 +680,15 @@ def save_tools_state(enabled_tools):
     save_entity('tools_state', 'enabled_tools', data)
 
 def load_tools_state():
-    rows = load_entities('tools_state')
+    return _build_tools_state(load_entities('tools_state'))
+
+def _build_tools_state(rows):
     if rows:
-        return rows[0][1].get('enabled_tools', {})
+        return dict(rows[0][1].get('enabled_tools', {}))
     return {}
 
-def save_agent(agent):
-    data = {
+def _agent_data(agent):
+    return {
         'created_at': agent.created_at,
         'role': agent.role,
         'backstory': agent.backstory,
@@ -90,26 +701,30 @@ def save_agent(agent):
         'max_iter': agent.max_iter,
         'tool_ids': [tool.tool_id for tool in agent.tools]  # Save tool IDs
     }
-    save_entity('agent', agent.id, data)
+
+def save_agent(agent):
+    return _save_tracked('agent', agent.id, agent, _agent_data(agent))
 
 def load_agents():
+    return load_snapshot().agents
+
+def _build_agents(rows, tools_dict):
     from my_agent import MyAgent
-    rows = load_entities('agent')
-    tools_dict = {tool.tool_id: tool for tool in load_tools()}
     agents = []
     for row in rows:
-        data = row[1]
+        data = dict(row[1])
         tool_ids = data.pop('tool_ids', [])
         agent = MyAgent(id=row[0], **data)
         agent.tools = [tools_dict[tool_id] for tool_id in tool_ids if tool_id in tools_dict]
+        agent.mark_persisted(_agent_data(agent))
         agents.append(agent)
-    return sorted(agents, key=lambda x: x.created_at)
+    return agents
 
 def delete_agent(agent_id):
     delete_entity('agent', agent_id)
 
-def save_task(task):
-    data = {
+def _task_data(task):
+    return {
         'description': task.description,
         'expected_output': task.expected_output,
         'async_execution': task.async_execution,
@@ -118,25 +733,34 @@ def save_task(task):
         'context_from_sync_tasks_ids': task.context_from_sync_tasks_ids,
         'created_at': task.created_at
     }
-    save_entity('task', task.id, data)
+
+def save_task(task):
+    return _save_tracked('task', task.id, task, _task_data(task))
 
 def load_tasks():
+    return load_snapshot().tasks
+
+def _build_tasks(rows, agents):
     from my_task import MyTask
-    rows = load_entities('task')
-    agents_dict = {agent.id: agent for agent in load_agents()}
+    agents_dict = {agent.id: agent for agent in agents}
+    default_agent = agents[0] if agents else None
     tasks = []
     for row in rows:
-        data = row[1]
+        data = dict(row[1])
         agent_id = data.pop('agent_id', None)
-        task = MyTask(id=row[0], agent=agents_dict.get(agent_id), **data)
+        for key in ('context_from_async_tasks_ids', 'context_from_sync_tasks_ids'):
+            if data.get(key):
+                data[key] = list(data[key])
+        task = MyTask(id=row[0], agent=agents_dict.get(agent_id) or default_agent, **data)
+        task.mark_persisted(_task_data(task))
         tasks.append(task)
-    return sorted(tasks, key=lambda x: x.created_at)
+    return tasks
 
 def delete_task(task_id):
     delete_entity('task', task_id)
 
-def save_crew(crew):
-    data = {
+def _crew_data(crew):
+    return {
         'name': crew.name,
         'process': crew.process,
         'verbose': crew.verbose,
@@ -150,13 +774,15 @@ def save_crew(crew):
         'manager_agent_id': crew.manager_agent.id if crew.manager_agent else None,
         'created_at': crew.created_at
     }
-    save_entity('crew', crew.id, data)
+
+def save_crew(crew):
+    return _save_tracked('crew', crew.id, crew, _crew_data(crew))
 
 def load_crews():
+    return load_snapshot().crews
+
+def _build_crews(rows, agents_dict, tasks_dict):
     from my_crew import MyCrew
-    rows = load_entities('crew')
-    agents_dict = {agent.id: agent for agent in load_agents()}
-    tasks_dict = {task.id: task for task in load_tasks()}
     crews = []
     for row in rows:
         data = row[1]
@@ -175,65 +801,615 @@ def load_crews():
         )
         crew.agents = [agents_dict[agent_id] for agent_id in data['agent_ids'] if agent_id in agents_dict]
         crew.tasks = [tasks_dict[task_id] for task_id in data['task_ids'] if task_id in tasks_dict]
+        crew.mark_persisted(_crew_data(crew))
         crews.append(crew)
-    return sorted(crews, key=lambda x: x.created_at)
+    return crews
 
 def delete_crew(crew_id):
     delete_entity('crew', crew_id)
 
-def save_tool(tool):
-    data = {
+def _tool_data(tool):
+    return {
         'name': tool.name,
         'description': tool.description,
         'parameters': tool.get_parameters()
     }
-    save_entity('tool', tool.tool_id, data)
+
+def save_tool(tool):
+    return _save_tracked('tool', tool.tool_id, tool, _tool_data(tool))
 
 def load_tools():
-    rows = load_entities('tool')
+    return _build_tools(load_entities('tool'))
+
+def _build_tools(rows):
+    """Tools checked against the static TOOL_METADATA catalog.
+
+    Rows naming a tool that no longer exists are skipped and parameters the
+    tool does not declare (left over from older versions) are dropped.
+    """
+    from my_tools import TOOL_CLASSES, TOOL_METADATA
     tools = []
     for row in rows:
         data = row[1]
-        tool_class = TOOL_CLASSES[data['name']]
-        tool = tool_class(tool_id=row[0])
-        tool.set_parameters(**data['parameters'])
+        metadata = TOOL_METADATA.get(data['name'])
+        if metadata is None:
+            print(f"Warning: Skipping tool {row[0]}, unknown tool {data['name']}")
+            continue
+        parameters = {key: value for key, value in (data.get('parameters') or {}).items() if key in metadata['parameters']}
+        tool = TOOL_CLASSES[data['name']](tool_id=row[0], **parameters)
+        tool.mark_persisted(_tool_data(tool))
         tools.append(tool)
     return tools
 
 def delete_tool(tool_id):
     delete_entity('tool', tool_id)
 
-def export_to_json(file_path):
+def start_run(run_id, crew_id, crew_name, inputs, started_at):
     conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM entities')
-    rows = cursor.fetchall()
-    conn.close()
+    with conn:
+        conn.execute('''
+            INSERT INTO runs (id, crew_id, crew_name, status, inputs, started_at)
+            VALUES (?, ?, ?, 'running', ?, ?)
+        ''', (run_id, crew_id, crew_name, json.dumps(inputs), started_at))
 
-    data = []
-    for row in rows:
-        entity = {
-            'id': row['id'],
-            'entity_type': row['entity_type'],
-            'data': json.loads(row['data'])
-        }
-        data.append(entity)
+def save_run_step(run_id, position, task_id, agent_role, description, output, started_at, finished_at, duration):
+    conn = get_db_connection()
+    with conn:
+        conn.execute('''
+            INSERT OR REPLACE INTO run_steps
+                (run_id, position, task_id, agent_role, description, output, started_at, finished_at, duration)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (run_id, position, task_id, agent_role, description, output, started_at, finished_at, duration))
+        _index_documents(conn, [('run_step', f'{run_id}:{position}', description or '', output or '')])
 
-    with open(file_path, 'w') as f:
-        json.dump(data, f, indent=4)
+def finish_run(run_id, status, finished_at, duration, output=None, error=None, usage=None):
+    usage = usage or {}
+    conn = get_db_connection()
+    with conn:
+        conn.execute('''
+            UPDATE runs SET status = ?, finished_at = ?, duration = ?, output = ?, error = ?,
+                llm_calls = ?, prompt_tokens = ?, completion_tokens = ?, total_tokens = ?, usage = ?
+            WHERE id = ?
+        ''', (status, finished_at, duration, output, error,
+              usage.get('successful_requests'), usage.get('prompt_tokens'),
+              usage.get('completion_tokens'), usage.get('total_tokens'),
+              json.dumps(usage), run_id))
+        if output:
+            crew_name = conn.execute('SELECT crew_name FROM runs WHERE id = ?', (run_id,)).fetchone()
+            _index_documents(conn, [('run', run_id, crew_name[0] if crew_name else '', output)])
 
-def import_from_json(file_path):
-    with open(file_path, 'r') as f:
-        data = json.load(f)
+def load_runs(crew_id=None, since=None, until=None, limit=100):
+    """Most recent runs first, optionally filtered by crew and an ISO started_at range."""
+    clauses, params = [], []
+    if crew_id:
+        clauses.append('crew_id = ?')
+        params.append(crew_id)
+    if since:
+        clauses.append('started_at >= ?')
+        params.append(since)
+    if until:
+        clauses.append('started_at < ?')
+        params.append(until)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    conn = get_db_connection()
+    cursor = conn.execute(f'SELECT * FROM runs {where} ORDER BY started_at DESC LIMIT ?', params + [limit])
+    return [dict(row) for row in cursor]
 
+def load_run_steps(run_id):
     conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    for entity in data:
-        cursor.execute('''
-            INSERT OR REPLACE INTO entities (id, entity_type, data)
-            VALUES (?, ?, ?)
-        ''', (entity['id'], entity['entity_type'], json.dumps(entity['data'])))
+    cursor = conn.execute('SELECT * FROM run_steps WHERE run_id = ? ORDER BY position', (run_id,))
+    return [dict(row) for row in cursor]
+
+def load_task_durations(task_ids, runs=20):
+    """Average duration in seconds of each task over its last `runs` completed runs, for tasks that have any."""
+    if not task_ids:
+        return {}
+    conn = get_db_connection()
+    cursor = conn.execute(f'''
+        SELECT task_id, AVG(duration) AS duration FROM (
+            SELECT s.task_id, s.duration,
+                ROW_NUMBER() OVER (PARTITION BY s.task_id ORDER BY r.started_at DESC) AS recent
+            FROM run_steps s JOIN runs r ON r.id = s.run_id
+            WHERE r.status = 'completed' AND s.duration IS NOT NULL
+                AND s.task_id IN ({', '.join('?' * len(task_ids))})
+        ) WHERE recent <= ? GROUP BY task_id
+    ''', list(task_ids) + [runs])
+    return {row['task_id']: row['duration'] for row in cursor}
+
+# Job queue. Workers in any process claim jobs inside BEGIN IMMEDIATE
+# transactions, so two of them can never take the same job or both take
+# the last free slot of a concurrency limit.
 
+@contextmanager
+def _immediate(conn):
+    """Transaction that takes the write lock up front, so nothing it read can change before it writes."""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield
+    except BaseException:
+        conn.rollback()
+        raise
     conn.commit()
-    conn.close()
\ No newline at end of file
+
+def _insert_job(conn, job_id, crew_id, crew_name, inputs, providers, priority, run_at, options, max_attempts, schedule_id, now):
+    conn.execute('''
+        INSERT INTO jobs (id, crew_id, crew_name, inputs, options, priority, run_at, enqueued_at, max_attempts, schedule_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (job_id, crew_id, crew_name, json.dumps(inputs), json.dumps(options or {}), priority,
+          run_at or now, now, max_attempts, schedule_id))
+    conn.executemany('INSERT OR IGNORE INTO job_providers (job_id, provider) VALUES (?, ?)',
+                     [(job_id, provider) for provider in providers])
+
+def enqueue_job(job_id, crew_id, crew_name, inputs, providers, priority=0, run_at=None, options=None, max_attempts=3, schedule_id=None):
+    """Queue a kickoff of crew_id. Higher priorities run first; run_at (Unix time) delays it."""
+    conn = get_db_connection()
+    with conn:
+        _insert_job(conn, job_id, crew_id, crew_name, inputs, providers, priority, run_at, options, max_attempts, schedule_id, time.time())
+
+def _expire_leases(conn, now):
+    """Requeue the running jobs whose worker stopped renewing its lease, or give up on them after max_attempts."""
+    conn.execute('''
+        UPDATE jobs SET status = CASE WHEN cancel_requested THEN 'cancelled' ELSE 'failed' END, finished_at = ?,
+            error = 'Lease of worker ' || worker || ' expired after ' || attempts || ' attempts'
+        WHERE status = 'running' AND lease_until < ? AND (cancel_requested OR attempts >= max_attempts)
+    ''', (now, now))
+    conn.execute('''
+        UPDATE jobs SET status = 'queued', worker = NULL, lease_until = NULL,
+            error = 'Lease of worker ' || worker || ' expired, requeued'
+        WHERE status = 'running' AND lease_until < ?
+    ''', (now,))
+
+def claim_job(worker, lease_seconds, crew_limit=None, provider_limit=None, scan=100):
+    """Take the next ready job for worker and lease it for lease_seconds; None if there is none.
+
+    Jobs are tried by priority, then run_at. A job is passed over while its
+    crew has crew_limit(crew_id) jobs running, or one of its providers has
+    provider_limit(provider) jobs running; a limit of 0 or None is no limit.
+    Expired leases are requeued first.
+    """
+    conn = get_db_connection()
+    now = time.time()
+    with _immediate(conn):
+        _expire_leases(conn, now)
+        running_crews = dict(conn.execute("SELECT crew_id, COUNT(*) FROM jobs WHERE status = 'running' GROUP BY crew_id").fetchall())
+        running_providers = dict(conn.execute('''
+            SELECT p.provider, COUNT(*) FROM job_providers p JOIN jobs j ON j.id = p.job_id
+            WHERE j.status = 'running' GROUP BY p.provider
+        ''').fetchall())
+        candidates = conn.execute('''
+            SELECT * FROM jobs WHERE status = 'queued' AND run_at <= ? ORDER BY priority DESC, run_at, id LIMIT ?
+        ''', (now, scan)).fetchall()
+        for job in candidates:
+            limit = crew_limit(job['crew_id']) if crew_limit else None
+            if limit and running_crews.get(job['crew_id'], 0) >= limit:
+                continue
+            providers = [row[0] for row in conn.execute('SELECT provider FROM job_providers WHERE job_id = ?', (job['id'],))]
+            if provider_limit and any(
+                provider_limit(provider) and running_providers.get(provider, 0) >= provider_limit(provider)
+                for provider in providers
+            ):
+                continue
+            conn.execute('''
+                UPDATE jobs SET status = 'running', worker = ?, lease_until = ?, started_at = ?, attempts = attempts + 1
+                WHERE id = ?
+            ''', (worker, now + lease_seconds, now, job['id']))
+            return dict(job, status='running', worker=worker, lease_until=now + lease_seconds, started_at=now,
+                        attempts=job['attempts'] + 1, inputs=json.loads(job['inputs']),
+                        options=json.loads(job['options']), providers=providers)
+    return None
+
+def set_job_run(job_id, run_id):
+    conn = get_db_connection()
+    with conn:
+        conn.execute('UPDATE jobs SET run_id = ? WHERE id = ?', (run_id, job_id))
+
+def renew_leases(worker, job_ids, lease_seconds):
+    """Extend worker's leases on job_ids. Returns (ids to cancel, ids whose lease was lost to expiry)."""
+    if not job_ids:
+        return [], []
+    conn = get_db_connection()
+    placeholders = ', '.join('?' * len(job_ids))
+    with conn:
+        conn.execute(f'''
+            UPDATE jobs SET lease_until = ? WHERE worker = ? AND status = 'running' AND id IN ({placeholders})
+        ''', [time.time() + lease_seconds, worker] + list(job_ids))
+        rows = conn.execute(f'''
+            SELECT id, worker, status, cancel_requested FROM jobs WHERE id IN ({placeholders})
+        ''', list(job_ids)).fetchall()
+    owned = {row['id']: row for row in rows if row['worker'] == worker and row['status'] == 'running'}
+    return [job_id for job_id, row in owned.items() if row['cancel_requested']], [job_id for job_id in job_ids if job_id not in owned]
+
+def finish_job(job_id, worker, status, error=None):
+    """Record the end of a job. False if worker no longer holds the job's lease, which then is not touched."""
+    conn = get_db_connection()
+    with conn:
+        cursor = conn.execute('''
+            UPDATE jobs SET status = ?, finished_at = ?, error = ?, lease_until = NULL
+            WHERE id = ? AND worker = ? AND status = 'running'
+        ''', (status, time.time(), error, job_id, worker))
+    return cursor.rowcount == 1
+
+def release_job(job_id, worker):
+    """Put a job worker is giving up on back in the queue, without counting the attempt."""
+    conn = get_db_connection()
+    with conn:
+        conn.execute('''
+            UPDATE jobs SET status = 'queued', worker = NULL, lease_until = NULL, attempts = attempts - 1
+            WHERE id = ? AND worker = ? AND status = 'running'
+        ''', (job_id, worker))
+
+def cancel_job(job_id):
+    """Cancel a queued job, or ask the worker of a running one to stop it."""
+    conn = get_db_connection()
+    with conn:
+        conn.execute("UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'", (time.time(), job_id))
+        conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+
+def load_jobs(statuses=None, limit=50):
+    """Most recently enqueued jobs first."""
+    where = f"WHERE status IN ({', '.join('?' * len(statuses))})" if statuses else ''
+    conn = get_db_connection()
+    cursor = conn.execute(f'SELECT * FROM jobs {where} ORDER BY enqueued_at DESC, id DESC LIMIT ?', list(statuses or []) + [limit])
+    return [dict(row) for row in cursor]
+
+def job_queue_stats(window=3600):
+    """Queue depth and how long the jobs started in the last `window` seconds waited past their run_at."""
+    conn = get_db_connection()
+    now = time.time()
+    depth = conn.execute('''
+        SELECT
+            SUM(status = 'queued' AND run_at <= :now) AS ready,
+            SUM(status = 'queued' AND run_at > :now) AS delayed,
+            SUM(status = 'running') AS running,
+            MIN(CASE WHEN status = 'queued' AND run_at <= :now THEN run_at END) AS oldest_ready
+        FROM jobs
+    ''', {'now': now}).fetchone()
+    waits = conn.execute('''
+        SELECT COUNT(*) AS started, AVG(started_at - run_at) AS avg_wait, MAX(started_at - run_at) AS max_wait,
+            SUM(status = 'completed') AS completed, SUM(status = 'failed') AS failed
+        FROM jobs WHERE started_at >= ?
+    ''', (now - window,)).fetchone()
+    return {
+        'ready': depth['ready'] or 0,
+        'delayed': depth['delayed'] or 0,
+        'running': depth['running'] or 0,
+        'oldest_wait': now - depth['oldest_ready'] if depth['oldest_ready'] is not None else None,
+        'window': window,
+        'started': waits['started'],
+        'avg_wait': waits['avg_wait'],
+        'max_wait': waits['max_wait'],
+        'completed': waits['completed'] or 0,
+        'failed': waits['failed'] or 0,
+    }
+
+def save_schedule(schedule_id, crew_id, cron, inputs, next_run_at, priority=0, options=None, enabled=True):
+    conn = get_db_connection()
+    with conn:
+        conn.execute('''
+            INSERT INTO schedules (id, crew_id, cron, inputs, options, priority, enabled, next_run_at, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))
+            ON CONFLICT(id) DO UPDATE SET crew_id = excluded.crew_id, cron = excluded.cron, inputs = excluded.inputs,
+                options = excluded.options, priority = excluded.priority, enabled = excluded.enabled,
+                next_run_at = excluded.next_run_at
+        ''', (schedule_id, crew_id, cron, json.dumps(inputs), json.dumps(options or {}), priority, int(enabled), next_run_at))
+
+def load_schedules(crew_id=None):
+    conn = get_db_connection()
+    if crew_id:
+        cursor = conn.execute('SELECT * FROM schedules WHERE crew_id = ? ORDER BY next_run_at', (crew_id,))
+    else:
+        cursor = conn.execute('SELECT * FROM schedules ORDER BY next_run_at')
+    return [dict(row) for row in cursor]
+
+def delete_schedule(schedule_id):
+    conn = get_db_connection()
+    with conn:
+        conn.execute('DELETE FROM schedules WHERE id = ?', (schedule_id,))
+
+def next_schedule_due():
+    """Unix time the next enabled schedule is due, or None."""
+    conn = get_db_connection()
+    return conn.execute('SELECT MIN(next_run_at) FROM schedules WHERE enabled').fetchone()[0]
+
+def enqueue_due_schedules(next_run_at, crews, new_job_id, max_attempts=3):
+    """Enqueue one job for every enabled schedule that is due and move it to its next run.
+
+    next_run_at(cron, after) is the next Unix time cron matches after `after`;
+    crews maps crew ids to (name, providers). A schedule that was due several
+    times while no worker ran is enqueued once. Returns the new job ids.
+    """
+    conn = get_db_connection()
+    now = time.time()
+    job_ids = []
+    with _immediate(conn):
+        for schedule in conn.execute('SELECT * FROM schedules WHERE enabled AND next_run_at <= ?', (now,)).fetchall():
+            conn.execute('UPDATE schedules SET next_run_at = ?, last_run_at = ? WHERE id = ?',
+                         (next_run_at(schedule['cron'], now), now, schedule['id']))
+            if schedule['crew_id'] not in crews:
+                continue  # the crew was deleted
+            name, providers = crews[schedule['crew_id']]
+            job_id = new_job_id()
+            _insert_job(conn, job_id, schedule['crew_id'], name, json.loads(schedule['inputs']), providers, schedule['priority'],
+                        schedule['next_run_at'], json.loads(schedule['options']), max_attempts, schedule['id'], now)
+            job_ids.append(job_id)
+    return job_ids
+
+def _fts_query(text):
+    """Turn free text into an FTS5 query: every word must match, the last one as a prefix."""
+    terms = ['"' + term.replace('"', '""') + '"' for term in text.split()]
+    if terms:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+def search(text, doc_types=None, limit=20):
+    """Ranked full-text hits for text over agents, tasks and run outputs.
+
+    Returns dicts with doc_type, doc_id, title, snippet and rank (lower is
+    better), best match first. doc_types restricts the kinds of document.
+    """
+    query = _fts_query(text)
+    if not query:
+        return []
+    conn = get_db_connection()
+    if not _search_index_enabled(conn):
+        return _search_fallback(conn, text, doc_types, limit)
+    type_filter, params = '', [query]
+    if doc_types:
+        type_filter = f"AND d.doc_type IN ({', '.join('?' * len(doc_types))})"
+        params.extend(doc_types)
+    cursor = conn.execute(f'''
+        SELECT d.doc_type, d.doc_id, search_index.title AS title,
+            snippet(search_index, -1, '**', '**', '…', 16) AS snippet,
+            bm25(search_index, 4.0, 1.0) AS rank
+        FROM search_index JOIN search_docs d ON d.rowid = search_index.rowid
+        WHERE search_index MATCH ? {type_filter}
+        ORDER BY rank LIMIT ?
+    ''', params + [limit])
+    return [dict(row) for row in cursor]
+
+def _search_fallback(conn, text, doc_types, limit):
+    """Substring search over agents and tasks for SQLite builds without FTS5."""
+    entity_types = [doc_type for doc_type in (doc_types or SEARCH_FIELDS) if doc_type in SEARCH_FIELDS]
+    hits = []
+    for entity_type in entity_types:
+        for entity_id, data in load_entities(entity_type):
+            title, body = _search_document(entity_type, data)
+            if text.lower() in f'{title}\n{body}'.lower():
+                hits.append({'doc_type': entity_type, 'doc_id': entity_id, 'title': title, 'snippet': body[:200], 'rank': 0.0})
+                if len(hits) >= limit:
+                    return hits
+    return hits
+
+def load_run_stats(since=None, until=None):
+    """Per-crew run count, durations and token usage of completed runs, slowest crews first."""
+    clauses, params = ["status = 'completed'"], []
+    if since:
+        clauses.append('started_at >= ?')
+        params.append(since)
+    if until:
+        clauses.append('started_at < ?')
+        params.append(until)
+    conn = get_db_connection()
+    cursor = conn.execute(f'''
+        SELECT crew_id, MAX(crew_name) AS crew_name, COUNT(*) AS runs,
+            AVG(duration) AS avg_duration, MAX(duration) AS max_duration,
+            AVG(llm_calls) AS avg_llm_calls, AVG(total_tokens) AS avg_total_tokens
+        FROM runs WHERE {' AND '.join(clauses)}
+        GROUP BY crew_id ORDER BY avg_duration DESC
+    ''', params)
+    return [dict(row) for row in cursor]
+
+class Snapshot:
+    """All entities of the store, decoded once and wired together.
+
+    Tools, agents, tasks and crews reference each other by identity: the
+    agent objects in `crews[i].agents` are the same objects as in `agents`.
+    `stats` reports how many queries and rows the load took, `data_version`
+    the data_version() the rows were read at.
+    """
+    def __init__(self, tools, agents, tasks, crews, enabled_tools, stats, data_version=None):
+        self.data_version = data_version
+        self.tools = tools
+        self.agents = agents
+        self.tasks = tasks
+        self.crews = crews
+        self.enabled_tools = enabled_tools
+        self.stats = stats
+
+def _read_rows():
+    conn = get_db_connection()
+    rows_by_type = {}
+    row_count = 0
+    for row in conn.execute('SELECT id, entity_type, data, codec FROM entities ORDER BY entity_type, created_at, id'):
+        rows_by_type.setdefault(row['entity_type'], []).append((row['id'], _decode_row(row)))
+        row_count += 1
+    return rows_by_type, {'queries': 1, 'rows': row_count}
+
+# ((DB_NAME, data_version), rows_by_type, row_count) shared by every
+# session of the process. The decoded rows are treated as read-only: the
+# builders copy the containers they hand to entity objects, so sessions
+# never see each other's unsaved edits.
+_shared_rows = None
+_shared_rows_lock = threading.Lock()
+
+def _read_shared_rows():
+    """Decoded rows for the current data version, read from SQLite only when it moved.
+
+    The version is read before the rows: a write committing in between
+    leaves newer rows under an older version, which only costs one extra
+    reload.
+    """
+    global _shared_rows
+    key = (DB_NAME, data_version())
+    cached = _shared_rows
+    if cached is None or cached[0] != key:
+        with _shared_rows_lock:
+            key = (DB_NAME, data_version())
+            cached = _shared_rows
+            if cached is None or cached[0] != key:
+                rows_by_type, stats = _read_rows()
+                _shared_rows = (key, rows_by_type, stats['rows'])
+                return key[1], rows_by_type, dict(stats, cached=False)
+    return key[1], cached[1], {'queries': 0, 'rows': cached[2], 'cached': True}
+
+def _build_snapshot(rows_by_type, stats, data_version=None):
+    tools = _build_tools(rows_by_type.get('tool', []))
+    agents = _build_agents(rows_by_type.get('agent', []), {tool.tool_id: tool for tool in tools})
+    tasks = _build_tasks(rows_by_type.get('task', []), agents)
+    crews = _build_crews(
+        rows_by_type.get('crew', []),
+        {agent.id: agent for agent in agents},
+        {task.id: task for task in tasks}
+    )
+    enabled_tools = _build_tools_state(rows_by_type.get('tools_state', []))
+    return Snapshot(tools, agents, tasks, crews, enabled_tools, stats, data_version)
+
+def crew_rows(crew):
+    """Rows of crew and of the agents (including the manager and the agents
+    assigned to tasks), tasks and tools it uses, as they are in memory, saved
+    or not. crew_from_rows() builds the crew back from them."""
+    agents = {agent.id: agent for agent in crew.agents}
+    agents.update({task.agent.id: task.agent for task in crew.tasks if task.agent})
+    if crew.manager_agent:
+        agents[crew.manager_agent.id] = crew.manager_agent
+    tools = {tool.tool_id: tool for agent in agents.values() for tool in agent.tools}
+    return {
+        'tool': [(tool_id, _tool_data(tool)) for tool_id, tool in tools.items()],
+        'agent': [(agent_id, _agent_data(agent)) for agent_id, agent in agents.items()],
+        'task': [(task.id, _task_data(task)) for task in crew.tasks],
+        'crew': [(crew.id, _crew_data(crew))],
+    }
+
+def crew_from_rows(rows_by_type):
+    return _build_snapshot(rows_by_type, {}).crews[0]
+
+def load_snapshot():
+    """Build fresh entity objects from the process-wide rows cache.
+
+    The table is scanned (once, decoding each row once) only when an entity
+    write, from this process or another, happened since the last scan;
+    otherwise only the objects are built.
+    """
+    start = time.perf_counter()
+    version, rows_by_type, stats = _read_shared_rows()
+    snapshot = _build_snapshot(rows_by_type, stats, version)
+    stats['seconds'] = time.perf_counter() - start
+    return snapshot
+
+EXPORT_BATCH_SIZE = 500
+
+def _open_export(file_path, mode):
+    if file_path.endswith('.gz'):
+        return gzip.open(file_path, mode + 't', encoding='utf-8')
+    return open(file_path, mode, encoding='utf-8')
+
+def export_to_json(file_path):
+    """Stream every entity to file_path as JSON Lines, gzip-compressed if the path ends in .gz.
+
+    Rows are written as the cursor yields them. Rows stored as JSON are
+    copied verbatim, rows in other codecs are decoded one at a time.
+    Returns the number of exported entities.
+    """
+    conn = get_db_connection()
+    count = 0
+    with _open_export(file_path, 'w') as f:
+        for row in conn.execute('SELECT id, entity_type, data, codec FROM entities ORDER BY id'):
+            data = row['data'] if row['codec'] == 'json' else json.dumps(_decode_row(row))
+            f.write(f'{{"id": {json.dumps(row["id"])}, "entity_type": {json.dumps(row["entity_type"])}, "data": {data}}}\n')
+            count += 1
+    return count
+
+def _peek(stream, size):
+    head = stream.read(size)
+    stream.seek(-len(head), io.SEEK_CUR)
+    return head
+
+def _open_import(source):
+    """Text stream over a path or binary stream, transparently un-gzipping it."""
+    stream = open(source, 'rb') if isinstance(source, (str, os.PathLike)) else source
+    if _peek(stream, 2) == b'\x1f\x8b':
+        stream = gzip.GzipFile(fileobj=stream)
+    return io.TextIOWrapper(stream, encoding='utf-8')
+
+def _iter_json_array(text, chunk_size=64 * 1024):
+    """Yield the elements of a JSON array one at a time without loading the whole document."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    eof = False
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = text.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+
+def _iter_export_entities(text):
+    first = text.read(1)
+    while first.isspace():
+        first = text.read(1)
+    if first == '[':  # Full export written by older versions
+        yield from _iter_json_array(text)
+    elif first:
+        yield json.loads(first + text.readline())
+        for line in text:
+            if line.strip():
+                yield json.loads(line)
+
+def is_full_export(stream):
+    """Tell a full database export (JSON Lines, gzip or legacy array) from a single crew export.
+
+    The stream position is left unchanged.
+    """
+    head = _peek(stream, 2)
+    if head == b'\x1f\x8b':
+        return True
+    start = stream.tell()
+    try:
+        line = stream.readline().strip()
+        if line.startswith(b'['):
+            return True
+        try:
+            return 'entity_type' in json.loads(line)
+        except ValueError:
+            return False
+    finally:
+        stream.seek(start)
+
+def import_from_json(source):
+    """Import a full export from a file path or a binary stream such as an upload.
+
+    Entities are parsed incrementally and written in batches of
+    EXPORT_BATCH_SIZE, one executemany commit per batch. Returns the number
+    of imported entities.
+    """
+    text = _open_import(source)
+    conn = get_db_connection()
+    count = 0
+    batch = []
+    try:
+        for entity in _iter_export_entities(text):
+            batch.append((entity['entity_type'], entity['id'], entity['data']))
+            if len(batch) >= EXPORT_BATCH_SIZE:
+                with _writing(conn):
+                    _write_entities(conn, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            with _writing(conn):
+                _write_entities(conn, batch)
+            count += len(batch)
+    finally:
+        if isinstance(source, (str, os.PathLike)):
+            text.close()
+        else:
+            text.detach()
+    return count
@@ -0,0 +1,79 @@
+import json
+import zlib
+
+# Optional faster/more compact backends. Every codec that needs one of them
+# is only registered when the package is installed.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+def _json_encode(data):
+    if orjson is not None:
+        return orjson.dumps(data).decode('utf-8')
+    return json.dumps(data)
+
+def _json_decode(value):
+    if isinstance(value, bytes):
+        value = value.decode('utf-8')
+    if orjson is not None:
+        return orjson.loads(value)
+    return json.loads(value)
+
+def _json_bytes(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data).encode('utf-8')
+
+CODECS = {
+    # Plain JSON text. Stays readable by SQLite's JSON functions, which the
+    # partial field updates rely on.
+    'json': (_json_encode, _json_decode),
+    'json+zlib': (
+        lambda data: zlib.compress(_json_bytes(data), ZLIB_LEVEL),
+        lambda value: _json_decode(zlib.decompress(value)),
+    ),
+}
+
+if msgpack is not None:
+    CODECS['msgpack'] = (
+        lambda data: msgpack.packb(data, use_bin_type=True),
+        lambda value: msgpack.unpackb(value, raw=False),
+    )
+    CODECS['msgpack+zlib'] = (
+        lambda data: zlib.compress(msgpack.packb(data, use_bin_type=True), ZLIB_LEVEL),
+        lambda value: msgpack.unpackb(zlib.decompress(value), raw=False),
+    )
+    if zstandard is not None:
+        CODECS['msgpack+zstd'] = (
+            lambda data: zstandard.compress(msgpack.packb(data, use_bin_type=True), ZSTD_LEVEL),
+            lambda value: msgpack.unpackb(zstandard.decompress(value), raw=False),
+        )
+
+def encode(codec, data):
+    try:
+        encoder, _ = CODECS[codec]
+    except KeyError:
+        raise ValueError(f"Codec {codec} is not available. Available codecs: {', '.join(CODECS)}")
+    return encoder(data)
+
+def decode(codec, value):
+    """Decode a stored value; rows written before codecs existed have no tag and are JSON."""
+    try:
+        _, decoder = CODECS[codec or 'json']
+    except KeyError:
+        raise ValueError(f"Row was written with codec {codec}, which is not available here")
+    return decoder(value)
@@ -0,0 +1,38 @@
+import threading
+from collections import deque
+
+class EventBus:
+    """Bounded log of events, each numbered with an increasing seq.
+
+    publish() never blocks: once maxlen events are held the oldest one is
+    dropped (and counted in dropped). Readers are not registered; each keeps
+    the seq of the last event it handled and asks for what came after it
+    with since() or wait(), so a slow or vanished reader costs nothing.
+    """
+    def __init__(self, maxlen=1000):
+        self.events = deque(maxlen=maxlen)
+        self.seq = 0
+        self.dropped = 0
+        self.condition = threading.Condition()
+
+    def publish(self, event):
+        with self.condition:
+            self.seq += 1
+            if len(self.events) == self.events.maxlen:
+                self.dropped += 1
+            self.events.append((self.seq, event))
+            self.condition.notify_all()
+            return self.seq
+
+    def since(self, seq=0):
+        """[(seq, event)] published after seq that are still held."""
+        with self.condition:
+            if seq >= self.seq:
+                return []
+            return [(event_seq, event) for event_seq, event in self.events if event_seq > seq]
+
+    def wait(self, seq=0, timeout=None):
+        """since(seq), waiting up to timeout seconds for something new to be published."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.seq > seq, timeout)
+        return self.since(seq)
@@ -0,0 +1,238 @@
+import itertools
+import os
+import queue
+import re
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+import db_utils
+from run_executor import RUN_EXECUTOR, RUN_WORKERS
+from task_graph import CREW_DAG_WIDTH
+from utils import new_id
+
+JOB_LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', '60'))
+JOB_POLL_SECONDS = float(os.getenv('JOB_POLL_SECONDS', '2'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+JOB_CREW_CONCURRENCY = int(os.getenv('JOB_CREW_CONCURRENCY', '1'))
+JOB_PROVIDER_CONCURRENCY = int(os.getenv('JOB_PROVIDER_CONCURRENCY', '0'))
+JOB_WORKER_SLOTS = int(os.getenv('JOB_WORKER_SLOTS', str(RUN_WORKERS)))
+JOB_APP_WORKER = str(os.getenv('JOB_APP_WORKER', 'true')).lower() in ['true', '1']
+
+class CronError(ValueError):
+    pass
+
+class Cron:
+    """A 5 field cron expression: minute, hour, day of month, month, day of week (0 or 7 is Sunday).
+
+    Fields take *, numbers, a-b ranges, comma lists and /step. As in cron,
+    when both day fields are restricted a day matching either one matches.
+    Times are local.
+    """
+    FIELDS = [('minute', 0, 59), ('hour', 0, 23), ('day of month', 1, 31), ('month', 1, 12), ('day of week', 0, 7)]
+
+    def __init__(self, expression):
+        self.expression = expression
+        fields = expression.split()
+        if len(fields) != 5:
+            raise CronError(f"{expression!r}: expected 5 fields (minute hour day-of-month month day-of-week), got {len(fields)}")
+        self.minutes, self.hours, self.days, self.months, self.weekdays = [
+            self._parse_field(text, name, low, high) for text, (name, low, high) in zip(fields, self.FIELDS)
+        ]
+        if 7 in self.weekdays:
+            self.weekdays = (self.weekdays - {7}) | {0}
+        self.any_day = fields[2].startswith('*')
+        self.any_weekday = fields[4].startswith('*')
+        self.next_after(time.time())  # fail now for expressions like "0 0 31 2 *"
+
+    def _parse_field(self, text, name, low, high):
+        values = set()
+        for part in text.split(','):
+            spec, slash, step = part.partition('/')
+            try:
+                step = int(step) if slash else 1
+                if spec == '*':
+                    start, end = low, high
+                elif '-' in spec:
+                    start, end = (int(value) for value in spec.split('-', 1))
+                else:
+                    start = int(spec)
+                    end = high if slash else start
+                if step < 1:
+                    raise ValueError(step)
+            except ValueError:
+                raise CronError(f"{self.expression!r}: invalid {name} {part!r}")
+            if not low <= start <= end <= high:
+                raise CronError(f"{self.expression!r}: {name} {part!r} is outside {low}-{high}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, moment):
+        day = moment.day in self.days
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        if not self.any_day and not self.any_weekday:
+            return day or weekday
+        return day and weekday
+
+    def next_after(self, timestamp):
+        """Unix time of the first matching minute after timestamp."""
+        moment = datetime.fromtimestamp(timestamp).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # Skip whole months, days and hours that cannot match
+        end = moment + timedelta(days=366 * 5)
+        while moment < end:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment.timestamp()
+        raise CronError(f"{self.expression!r} never matches")
+
+def next_cron_run(expression, after):
+    return Cron(expression).next_after(after)
+
+def crew_providers(crew):
+    """Providers of the LLMs a crew uses, the keys of the per-provider concurrency limits."""
+    models = [agent.llm_provider_model for agent in crew.agents]
+    models.append(crew.manager_llm)
+    if crew.manager_agent:
+        models.append(crew.manager_agent.llm_provider_model)
+    return sorted({model.split(':')[0].strip() for model in models if model})
+
+def crew_limit(crew_id):
+    return JOB_CREW_CONCURRENCY
+
+def provider_limit(provider):
+    """JOB_CONCURRENCY_<PROVIDER> (e.g. JOB_CONCURRENCY_OPENAI) if set, else JOB_PROVIDER_CONCURRENCY; 0 is no limit."""
+    name = re.sub(r'\W+', '_', provider).upper()
+    return int(os.getenv(f'JOB_CONCURRENCY_{name}', JOB_PROVIDER_CONCURRENCY))
+
+def _options(parallel, width, timeout):
+    return {'parallel': parallel, 'width': width, 'timeout': timeout}
+
+def enqueue(crew, inputs, priority=0, delay=0, parallel=False, width=CREW_DAG_WIDTH, timeout=None):
+    """Queue a kickoff of crew for a JobWorker; returns the job id."""
+    job_id = "J_" + new_id()
+    db_utils.enqueue_job(job_id, crew.id, crew.name, dict(inputs), crew_providers(crew), priority,
+                         time.time() + delay if delay else None, _options(parallel, width, timeout), JOB_MAX_ATTEMPTS)
+    return job_id
+
+def add_schedule(crew, cron, inputs, priority=0, parallel=False, width=CREW_DAG_WIDTH, timeout=None):
+    """Enqueue a kickoff of crew whenever cron matches; returns the schedule id. Raises CronError."""
+    schedule_id = "S_" + new_id()
+    db_utils.save_schedule(schedule_id, crew.id, cron, dict(inputs), next_cron_run(cron, time.time()), priority,
+                           _options(parallel, width, timeout))
+    return schedule_id
+
+_worker_numbers = itertools.count(1)
+
+class JobWorker:
+    """Pulls jobs from the queue and runs up to `slots` of them at a time in the run executor.
+
+    Several workers, in any number of processes, can share a database. A
+    claimed job is leased for lease_seconds, and the lease is renewed every
+    third of that while the run lasts. If the worker's process dies, the
+    job is requeued once the lease expires (up to JOB_MAX_ATTEMPTS times),
+    so a job runs at least once. Every poll also enqueues due schedules.
+    """
+    def __init__(self, slots=JOB_WORKER_SLOTS, worker_id=None, executor=RUN_EXECUTOR,
+                 lease_seconds=JOB_LEASE_SECONDS, poll_seconds=JOB_POLL_SECONDS):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{next(_worker_numbers)}"
+        self.slots = max(1, slots)
+        self.executor = executor
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.running = {}
+        self.finished = queue.Queue()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """Run the worker in a background thread."""
+        self.thread = threading.Thread(target=self.run, name=f'job-worker-{self.worker_id}', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop claiming jobs, cancel the runs in flight and put their jobs back in the queue."""
+        self.stopped.set()
+        self.finished.put(None)
+        if self.thread is not None:
+            self.thread.join()
+
+    def run(self):
+        next_heartbeat = time.monotonic() + self.lease_seconds / 3
+        try:
+            while not self.stopped.is_set():
+                self.enqueue_schedules()
+                self._fill()
+                try:
+                    job_id = self.finished.get(timeout=self.poll_seconds)
+                    while job_id is not None:
+                        self._record(job_id)
+                        job_id = self.finished.get_nowait()
+                except queue.Empty:
+                    pass
+                if time.monotonic() >= next_heartbeat:
+                    self._heartbeat()
+                    next_heartbeat = time.monotonic() + self.lease_seconds / 3
+        finally:
+            for job_id, (job, handle) in list(self.running.items()):
+                self.executor.cancel(handle.run_id)
+                db_utils.release_job(job_id, self.worker_id)
+            self.running.clear()
+            db_utils.close_db_connection()
+
+    def enqueue_schedules(self):
+        due = db_utils.next_schedule_due()
+        if due is None or due > time.time():
+            return []
+        crews = {crew.id: (crew.name, crew_providers(crew)) for crew in db_utils.load_crews()}
+        return db_utils.enqueue_due_schedules(next_cron_run, crews, lambda: "J_" + new_id(), JOB_MAX_ATTEMPTS)
+
+    def _crew(self, crew_id):
+        return next((crew for crew in db_utils.load_crews() if crew.id == crew_id), None)
+
+    def _fill(self):
+        while len(self.running) < self.slots and not self.stopped.is_set():
+            job = db_utils.claim_job(self.worker_id, self.lease_seconds, crew_limit, provider_limit)
+            if job is None:
+                return
+            crew = self._crew(job['crew_id'])
+            if crew is None:
+                db_utils.finish_job(job['id'], self.worker_id, 'failed', f"Crew {job['crew_id']} not found")
+                continue
+            options = job['options']
+            handle = self.executor.submit(crew, job['inputs'], parallel=options.get('parallel', False),
+                                          width=options.get('width', CREW_DAG_WIDTH), timeout=options.get('timeout'))
+            db_utils.set_job_run(job['id'], handle.run_id)
+            self.running[job['id']] = (job, handle)
+            handle.add_done_callback(lambda handle, job_id=job['id']: self.finished.put(job_id))
+
+    def _record(self, job_id):
+        job, handle = self.running.pop(job_id)
+        error = None if handle.status == 'completed' else handle.error
+        if not db_utils.finish_job(job_id, self.worker_id, handle.status, error):
+            print(f"Warning: job {job_id} finished {handle.status} after {self.worker_id} lost its lease")
+
+    def _heartbeat(self):
+        cancelled, lost = db_utils.renew_leases(self.worker_id, list(self.running), self.lease_seconds)
+        for job_id in cancelled + lost:
+            self.executor.cancel(self.running[job_id][1].run_id)
+
+_app_worker = None
+_app_worker_lock = threading.Lock()
+
+def start_app_worker():
+    """Start the app process's JobWorker once, unless JOB_APP_WORKER is off. Returns it, or None."""
+    global _app_worker
+    if not JOB_APP_WORKER:
+        return None
+    with _app_worker_lock:
+        if _app_worker is None:
+            _app_worker = JobWorker().start()
+    return _app_worker
@@ -1,17 +1,42 @@
 import os
-from langchain_openai import ChatOpenAI
-from langchain_groq import ChatGroq
-#from langchain_ollama import ChatOllama
-from langchain_anthropic import ChatAnthropic
-from crewai import LLM
-from dotenv import load_dotenv
-
-def create_openai_llm(model, temperature):
-    safe_pop_env_var('OPENAI_API_KEY')
-    safe_pop_env_var('OPENAI_API_BASE')
-    load_dotenv(override=True)
-    api_key = os.getenv('OPENAI_API_KEY')
-    api_base = os.getenv('OPENAI_API_BASE', 'https://api.openai.com/v1/')
+import json
+import threading
+import time
+import urllib.request
+from collections import ChainMap
+from dotenv import dotenv_values, find_dotenv
+from rate_limiter import RATE_LIMITER, instrument
+
+# The LLM client libraries (crewai, langchain_*) are imported inside the
+# factories: they are slow to import and only needed once a crew is built.
+
+_env_lock = threading.Lock()
+_env_snapshot = (None, None, {})  # (.env path, mtime, values)
+_env_reloads = 0
+
+def env_config():
+    """Settings for the LLM factories: .env values over os.environ.
+
+    .env is parsed again only when its modification time changes, so it
+    can still be edited while the app runs. os.environ is read live, which
+    keeps keys entered in the UI working.
+    """
+    global _env_snapshot, _env_reloads
+    path = find_dotenv(usecwd=True)
+    mtime = os.stat(path).st_mtime_ns if path else None
+    if _env_snapshot[:2] != (path, mtime):
+        with _env_lock:
+            if _env_snapshot[:2] != (path, mtime):
+                values = {key: value for key, value in dotenv_values(path).items() if value is not None} if path else {}
+                _env_snapshot = (path, mtime, values)
+                _env_reloads += 1
+                LLM_POOL.clear()
+    return ChainMap(_env_snapshot[2], os.environ)
+
+def create_openai_llm(model, temperature, config):
+    from crewai import LLM
+    api_key = config.get('OPENAI_API_KEY')
+    api_base = config.get('OPENAI_API_BASE', 'https://api.openai.com/v1/')
   
     # if model == "gpt-4o-mini":
     #     max_tokens = 16383
@@ -19,79 +44,276 @@ def create_openai_llm(model, temperature):
     #     max_tokens = 4095
     if api_key:
         #return ChatOpenAI(openai_api_key=api_key, openai_api_base=api_base, model_name=model, temperature=temperature, max_tokens=max_tokens)
-        return LLM(model=model, temperature=temperature, base_url=api_base)
+        return LLM(model=model, temperature=temperature, base_url=api_base, api_key=api_key)
     else:
         raise ValueError("OpenAI API key not set in .env file")
 
-def create_anthropic_llm(model, temperature):
-    api_key = os.getenv('ANTHROPIC_API_KEY')
+def create_anthropic_llm(model, temperature, config):
+    from langchain_anthropic import ChatAnthropic
+    api_key = config.get('ANTHROPIC_API_KEY')
     if api_key:
         return ChatAnthropic(anthropic_api_key=api_key, model_name=model, temperature=temperature,max_tokens=4095)
     else:
         raise ValueError("Anthropic API key not set in .env file")
 
-def create_groq_llm(model, temperature):
-    api_key = os.getenv('GROQ_API_KEY')
+def create_groq_llm(model, temperature, config):
+    from langchain_groq import ChatGroq
+    api_key = config.get('GROQ_API_KEY')
     if api_key:
 
         return ChatGroq(groq_api_key=api_key, model_name=model, temperature=temperature, max_tokens=4095)
     else:
         raise ValueError("Groq API key not set in .env file")
 
-def create_ollama_llm(model, temperature):
-    host = os.getenv('OLLAMA_HOST')
+def create_ollama_llm(model, temperature, config):
+    #from langchain_ollama import ChatOllama
+    from crewai import LLM
+    host = config.get('OLLAMA_HOST')
     if host:
         #return ChatOllama(base_url=host,model=model, temperature=temperature)
         return LLM(model=model, temperature=temperature, base_url=host)
     else:
         raise ValueError("Ollama Host is not set in .env file")    
 
-def create_lmstudio_llm(model, temperature):
-    api_base = os.getenv('LMSTUDIO_API_BASE')
-    os.environ["OPENAI_API_KEY"] = "lm-studio"
-    os.environ["OPENAI_API_BASE"] = api_base
+def create_lmstudio_llm(model, temperature, config):
+    from langchain_openai import ChatOpenAI
+    api_base = config.get('LMSTUDIO_API_BASE')
     if api_base:
+        if model != 'lms-default':
+            return ChatOpenAI(openai_api_key='lm-studio', openai_api_base=api_base, model_name=model, temperature=temperature, max_tokens=4095)
         return ChatOpenAI(openai_api_key='lm-studio', openai_api_base=api_base, temperature=temperature, max_tokens=4095)
     else:
         raise ValueError("LM Studio API base not set in .env file")
 
+class LLMPool:
+    """Thread-safe cache of LLM clients so agents with the same settings share one client (and its HTTP connections).
+
+    Clients of different keys are built concurrently; concurrent requests
+    for the same key wait for the first build instead of building twice.
+    """
+    def __init__(self):
+        self.clients = {}
+        self.building = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, factory):
+        with self.lock:
+            if key in self.clients:
+                self.hits += 1
+                return self.clients[key]
+            key_lock = self.building.setdefault(key, threading.Lock())
+        with key_lock:
+            with self.lock:
+                if key in self.clients:
+                    self.hits += 1
+                    return self.clients[key]
+            client = factory()
+            with self.lock:
+                self.clients[key] = client
+                self.misses += 1
+                self.building.pop(key, None)
+        return client
+
+    def clear(self):
+        with self.lock:
+            self.clients.clear()
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self.clients), 'env_reloads': _env_reloads}
+
+LLM_POOL = LLMPool()
+
+DISCOVERY_TIMEOUT = float(os.getenv('LLM_DISCOVERY_TIMEOUT', '2'))
+
+def _get_json(url):
+    with urllib.request.urlopen(url, timeout=DISCOVERY_TIMEOUT) as response:
+        return json.load(response)
+
+def discover_ollama_models():
+    """Models pulled into the local Ollama server, named the way litellm expects (ollama/<name>)."""
+    host = env_config().get('OLLAMA_HOST')
+    if not host:
+        return None
+    models = _get_json(host.rstrip('/') + '/api/tags').get('models', [])
+    return [name if name.startswith('ollama/') else f"ollama/{name}" for name in (model['name'] for model in models)]
+
+def discover_lmstudio_models():
+    """Models loaded in LM Studio, from its OpenAI compatible /models endpoint."""
+    api_base = env_config().get('LMSTUDIO_API_BASE')
+    if not api_base:
+        return None
+    return [model['id'] for model in _get_json(api_base.rstrip('/') + '/models').get('data', [])]
+
 LLM_CONFIG = {
     "OpenAI": {
         "models": ["gpt-4o","gpt-4o-mini","gpt-3.5-turbo", "gpt-4-turbo"],
-        "create_llm": create_openai_llm
+        "create_llm": create_openai_llm,
+        "api_key_env": "OPENAI_API_KEY",
+        "base_url_env": "OPENAI_API_BASE",
+        "rpm_env": "OPENAI_RPM",
+        "tpm_env": "OPENAI_TPM"
     },
     "Groq": {
         "models": ["groq/llama3-8b-8192","groq/llama3-70b-8192", "groq/mixtral-8x7b-32768"],
-        "create_llm": create_groq_llm
+        "create_llm": create_groq_llm,
+        "api_key_env": "GROQ_API_KEY",
+        "rpm_env": "GROQ_RPM",
+        "tpm_env": "GROQ_TPM"
     },
     "Ollama": {
         "models": os.getenv("OLLAMA_MODELS", "").split(',') if os.getenv("OLLAMA_MODELS") else [],
-        "create_llm": create_ollama_llm
+        "create_llm": create_ollama_llm,
+        "base_url_env": "OLLAMA_HOST",
+        "rpm_env": "OLLAMA_RPM",
+        "tpm_env": "OLLAMA_TPM",
+        "discover_models": discover_ollama_models
     },
     "Anthropic": {
         "models": ["claude-3-5-sonnet-20240620"],
-        "create_llm": create_anthropic_llm
+        "create_llm": create_anthropic_llm,
+        "api_key_env": "ANTHROPIC_API_KEY",
+        "rpm_env": "ANTHROPIC_RPM",
+        "tpm_env": "ANTHROPIC_TPM"
     },
     "LM Studio": {
         "models": ["lms-default"],
-        "create_llm": create_lmstudio_llm
+        "create_llm": create_lmstudio_llm,
+        "base_url_env": "LMSTUDIO_API_BASE",
+        "rpm_env": "LMSTUDIO_RPM",
+        "tpm_env": "LMSTUDIO_TPM",
+        "discover_models": discover_lmstudio_models
     }
 
 }
 
+class ModelCatalog:
+    """Cached "Provider: model" list with an index for O(1) lookups.
+
+    Providers with a "discover_models" function (local Ollama and LM Studio)
+    are queried in a background thread whenever the list is older than ttl;
+    the previous list is served meanwhile. Until a discovery succeeds, and
+    whenever it fails, a provider falls back to its configured "models".
+    Only the very first build waits for discovery, and at most first_wait
+    seconds, so agents saved with a discovered model are not reset to the
+    default on the first page draw.
+    """
+    def __init__(self, config, ttl=300, first_wait=0.5):
+        self.config = config
+        self.ttl = ttl
+        self.first_wait = first_wait
+        self.entries = []
+        self.index = {}
+        self.discovered = {}
+        self.refreshed_at = None
+        self.refreshing = None
+        self.lock = threading.Lock()
+
+    def _rebuild(self):
+        entries = [
+            f"{provider}: {model}"
+            for provider, config in self.config.items()
+            for model in (self.discovered.get(provider) or config["models"])
+        ]
+        self.entries = entries
+        self.index = {entry: position for position, entry in enumerate(entries)}
+
+    def _discover(self):
+        for provider, config in self.config.items():
+            discover = config.get("discover_models")
+            if discover is None:
+                continue
+            try:
+                models = discover()
+            except Exception as e:
+                print(f"Model discovery for {provider} failed: {e}")
+                models = None
+            if models is None:
+                # Not configured or unreachable: offer the configured "models" again
+                self.discovered.pop(provider, None)
+            else:
+                self.discovered[provider] = models
+        with self.lock:
+            self._rebuild()
+            self.refreshed_at = time.monotonic()
+            self.refreshing = None
+
+    def refresh(self):
+        """Start a background discovery unless one is already running. Returns the thread."""
+        with self.lock:
+            if self.refreshing is None:
+                self.refreshing = threading.Thread(target=self._discover, daemon=True)
+                self.refreshing.start()
+            return self.refreshing
+
+    def models(self):
+        if self.refreshed_at is None and not self.entries:
+            with self.lock:
+                if not self.entries:
+                    self._rebuild()
+            self.refresh().join(self.first_wait)
+        elif self.refreshed_at is not None and time.monotonic() - self.refreshed_at > self.ttl:
+            self.refresh()
+        return self.entries
+
+    def position(self, provider_and_model):
+        self.models()
+        return self.index.get(provider_and_model)
+
+MODEL_CATALOG = ModelCatalog(LLM_CONFIG, ttl=float(os.getenv('LLM_CATALOG_TTL', '300')))
+
 def llm_providers_and_models():
-    return [f"{provider}: {model}" for provider in LLM_CONFIG.keys() for model in LLM_CONFIG[provider]["models"]]
+    """All "Provider: model" choices. The returned list is shared, do not modify it."""
+    return MODEL_CATALOG.models()
+
+def llm_model_index(provider_and_model):
+    """Position of provider_and_model in llm_providers_and_models(), None if it is not offered."""
+    return MODEL_CATALOG.position(provider_and_model)
+
+def _per_minute(config, name):
+    value = config.get(name) if name else None
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        print(f"Warning: ignoring {name}={value!r}, not a number")
+        return None
+
+def rate_limit_for(provider, config):
+    """The RateLimit shared by every client of provider's key, with the <PROVIDER>_RPM / _TPM limits from config."""
+    provider_config = LLM_CONFIG[provider]
+    secret = config.get(provider_config.get("api_key_env", "")) or config.get(provider_config.get("base_url_env", ""))
+    return RATE_LIMITER.limit_for(
+        provider, secret,
+        rpm=_per_minute(config, provider_config.get("rpm_env")),
+        tpm=_per_minute(config, provider_config.get("tpm_env"))
+    )
 
 def create_llm(provider_and_model, temperature=0.1):
+    """Client for provider_and_model from LLM_POOL, built on first use.
+
+    The pool key holds everything the client is configured with: provider,
+    model, temperature, base URL and API key, so editing .env yields a new
+    client instead of a stale one. Every call of the client waits for the
+    rate limit of its provider key.
+    """
     provider, model = provider_and_model.split(": ")
-    create_llm_func = LLM_CONFIG.get(provider, {}).get("create_llm")
+    provider_config = LLM_CONFIG.get(provider, {})
+    create_llm_func = provider_config.get("create_llm")
     if create_llm_func:
-        return create_llm_func(model, temperature)
+        config = env_config()
+        key = (
+            provider, model, temperature,
+            config.get(provider_config.get("base_url_env", "")),
+            config.get(provider_config.get("api_key_env", ""))
+        )
+        limit = rate_limit_for(provider, config)
+        return LLM_POOL.get(key, lambda: instrument(create_llm_func(model, temperature, config), limit))
     else:
         raise ValueError(f"LLM provider {provider} is not recognized or not supported")
-      
-def safe_pop_env_var(key):
-    try:
-        os.environ.pop(key)
-    except KeyError:
-        pass
\ No newline at end of file
+
+def llm_pool_stats():
+    return LLM_POOL.stats()
\ No newline at end of file
@@ -1,186 +1,14 @@
-import streamlit as st
 import os
-import uuid
-
-# Remplacer l'import de utils par des fonctions locales
-def rnd_id():
-    """Générer un identifiant unique"""
-    return str(uuid.uuid4())
-
-def fix_columns_width(df):
-    """Placeholder pour fix_columns_width si nécessaire"""
-    return df
-
-from crewai import Agent
-from streamlit import session_state as ss
 from datetime import datetime
-from langchain_openai import ChatOpenAI
-from crewai_tools import SerperDevTool, WebsiteSearchTool, YoutubeVideoSearchTool
-
-# Fonctions de sauvegarde et suppression d'agent factices
-def save_agent(agent):
-    """Placeholder pour sauvegarder un agent"""
-    pass
-
-def delete_agent(agent_id):
-    """Placeholder pour supprimer un agent"""
-    pass
-
-# Fonction de création de LLM factice
-def create_llm(provider, model):
-    """Placeholder pour créer un modèle de langage"""
-    return ChatOpenAI(temperature=0.7)
-
-# Dictionnaire des fournisseurs et modèles de LLM
-llm_providers_and_models = {
-    "OpenAI": ["gpt-3.5-turbo", "gpt-4"]
-}
-
-class ResearcherAgent(Agent):
-    def __init__(self, topic=None):
-        # Vérifier et gérer l'absence de clé API OpenAI
-        if 'OPENAI_API_KEY' not in os.environ or not os.environ['OPENAI_API_KEY']:
-            st.warning("⚠️ Clé API OpenAI non configurée. Certaines fonctionnalités seront limitées.")
-            
-            # Demander la clé API à l'utilisateur si elle n'est pas définie
-            openai_api_key = st.text_input(
-                "🔑 Veuillez entrer votre clé API OpenAI", 
-                type="password",
-                help="Vous pouvez obtenir une clé API sur https://platform.openai.com/account/api-keys"
-            )
-            
-            if openai_api_key:
-                os.environ['OPENAI_API_KEY'] = openai_api_key
-            else:
-                # Utiliser un agent simulé sans LLM si pas de clé API
-                st.warning("Fonctionnement en mode démo limité sans clé API OpenAI")
-        
-        # Initialiser le LLM avec gestion d'erreur
-        try:
-            llm = ChatOpenAI(
-                model_name="gpt-3.5-turbo", 
-                temperature=0.7,
-                api_key=os.environ.get('OPENAI_API_KEY')
-            )
-        except Exception as e:
-            st.error(f"Erreur d'initialisation du modèle LLM : {e}")
-            llm = None
-        
-        # Initialisation de l'agent avec gestion des outils
-        super().__init__(
-            role='Intelligent Research Agent',
-            goal='Perform comprehensive and intelligent research on a given topic',
-            backstory='An advanced AI agent specialized in gathering, filtering, and synthesizing information from diverse sources',
-            verbose=True,
-            allow_delegation=True,
-            llm=llm  # Passer le LLM initialisé
-        )
-        
-        # Utiliser un attribut personnalisé pour le topic
-        self._topic = topic
-        
-        # Initialiser les outils avec gestion d'erreur
-        self.tools = []
-        try:
-            self.tools.append(SerperDevTool())
-        except Exception as e:
-            st.warning(f"Impossible d'initialiser SerperDevTool : {e}")
-        
-        try:
-            self.tools.append(WebsiteSearchTool())
-        except Exception as e:
-            st.warning(f"Impossible d'initialiser WebsiteSearchTool : {e}")
-        
-        try:
-            self.tools.append(YoutubeVideoSearchTool())
-        except Exception as e:
-            st.warning(f"Impossible d'initialiser YoutubeVideoSearchTool : {e}")
-    
-    @property
-    def topic(self):
-        return self._topic
-    
-    @topic.setter
-    def topic(self, value):
-        self._topic = value
-
-    def preliminary_research(self, topic, max_total_sources=15, research_rounds=1):
-        """
-        Effectue une recherche préliminaire sur un sujet donné
-        
-        Args:
-            topic (str): Le sujet de recherche
-            max_total_sources (int): Nombre maximum de sources
-            research_rounds (int): Nombre de rounds de recherche
-        
-        Returns:
-            dict: Résultats de la recherche préliminaire
-        """
-        # Simulation de la recherche de sources
-        return {
-            'total_sources': 10,
-            'sources': {
-                'web': [
-                    'Article scientifique sur l\'IA',
-                    'Blog technologique sur les tendances émergentes',
-                    'Rapport de recherche académique'
-                ],
-                'youtube': [
-                    'Vidéo de conférence sur l\'intelligence artificielle',
-                    'Tutoriel technique sur les dernières avancées'
-                ],
-                'academic': [
-                    'Publication de recherche de Stanford',
-                    'Étude comparative des modèles de machine learning'
-                ]
-            }
-        }
-    
-    def research_topic(self, topic):
-        """
-        Effectue une recherche approfondie sur un sujet
-        
-        Args:
-            topic (str): Le sujet de recherche
-        
-        Returns:
-            str: Résumé de la recherche détaillé et nuancé
-        """
-        # Liste de perspectives différentes pour un même sujet
-        perspectives = {
-            "Intelligence Artificielle": [
-                "Avancées technologiques et éthiques",
-                "Impact économique et social",
-                "Développements récents en apprentissage profond",
-                "Défis et limites actuels de l'IA"
-            ],
-            "Changement Climatique": [
-                "Solutions technologiques innovantes",
-                "Impacts géopolitiques et économiques",
-                "Stratégies de réduction des émissions",
-                "Adaptation et résilience des écosystèmes"
-            ],
-            "Santé Numérique": [
-                "Technologies émergentes de diagnostic",
-                "Intelligence artificielle en médecine personnalisée", 
-                "Éthique et confidentialité des données de santé",
-                "Télémédecine et accessibilité des soins"
-            ]
-        }
-        
-        # Sélectionner une perspective aléatoire si le sujet est prédéfini
-        import random
-        
-        if topic in perspectives:
-            perspective = random.choice(perspectives[topic])
-            return f"Recherche approfondie sur {topic} : {perspective}"
-        else:
-            # Pour les sujets non prédéfinis, générer une description générique
-            return f"Analyse multidimensionnelle du sujet : {topic}"
+from db_utils import save_agent, delete_agent
+from utils import rnd_id, new_id, fix_columns_width, ss, st
+from tracking import ChangeTracked
+from llms import llm_providers_and_models, llm_model_index, create_llm
+from crew_build import BuildContext
 
-class MyAgent:
+class MyAgent(ChangeTracked):
     def __init__(self, id=None, role=None, backstory=None, goal=None, temperature=None, allow_delegation=False, verbose=False, cache= None, llm_provider_model=None, max_iter=None, created_at=None, tools=None):
-        self.id = id or "A_" + rnd_id()
+        self.id = id or "A_" + new_id()
         self.role = role or "Senior Researcher"
         self.backstory = backstory or "Driven by curiosity, you're at the forefront of innovation, eager to explore and share knowledge that could change the world."
         self.goal = goal or "Uncover groundbreaking technologies in AI"
@@ -204,20 +32,26 @@ class MyAgent:
     def edit(self, value):
         ss[self.edit_key] = value
 
-    def get_crewai_agent(self) -> Agent:
-            llm = create_llm(self.llm_provider_model, temperature=self.temperature)
-            tools = [tool.create_tool() for tool in self.tools]
-            return Agent(
-                role=self.role,
-                backstory=self.backstory,
-                goal=self.goal,
-                allow_delegation=self.allow_delegation,
-                verbose=self.verbose,
-                max_iter=self.max_iter,
-                cache=self.cache,
-                tools=tools,
-                llm=llm
-            )
+    def get_crewai_agent(self, build=None, kind='agent') -> 'Agent':
+            from crewai import Agent
+            build = build or BuildContext()
+
+            def create():
+                llm = create_llm(self.llm_provider_model, temperature=self.temperature)
+                tools = [build.tool(tool) for tool in self.tools]
+                return Agent(
+                    role=self.role,
+                    backstory=self.backstory,
+                    goal=self.goal,
+                    allow_delegation=self.allow_delegation,
+                    verbose=self.verbose,
+                    max_iter=self.max_iter,
+                    cache=self.cache,
+                    tools=tools,
+                    llm=llm
+                )
+            # A crew's manager is built as its own instance (kind 'manager_agent'), even if it is also one of the crew's agents
+            return build.get(kind, self.id, create, label=self.role)
 
     def delete(self):
         ss.agents = [agent for agent in ss.agents if agent.id != self.id]
@@ -237,9 +71,8 @@ class MyAgent:
         return True
 
     def validate_llm_provider_model(self):
-        available_models = llm_providers_and_models()
-        if self.llm_provider_model not in available_models:
-            self.llm_provider_model = available_models[0]
+        if llm_model_index(self.llm_provider_model) is None:
+            self.llm_provider_model = llm_providers_and_models()[0]
 
     def draw(self, key=None):
         self.validate_llm_provider_model()
@@ -253,7 +86,7 @@ class MyAgent:
                     self.allow_delegation = st.checkbox("Allow delegation", value=self.allow_delegation)
                     self.verbose = st.checkbox("Verbose", value=self.verbose)
                     self.cache = st.checkbox("Cache", value=self.cache)
-                    self.llm_provider_model = st.selectbox("LLM Provider and Model", options=llm_providers_and_models(), index=llm_providers_and_models().index(self.llm_provider_model))
+                    self.llm_provider_model = st.selectbox("LLM Provider and Model", options=llm_providers_and_models(), index=llm_model_index(self.llm_provider_model))
                     self.temperature = st.slider("Temperature", value=self.temperature, min_value=0.0, max_value=1.0)
                     self.max_iter = st.number_input("Max Iterations", value=self.max_iter, min_value=1, max_value=100)
                     enabled_tools = [tool for tool in ss.tools]
@@ -268,7 +101,7 @@ class MyAgent:
                         self.tools = [tool for tool in enabled_tools if self.get_tool_display_name(tool) in selected_tools]
                         self.set_editable(False)
         else:
-            fix_columns_width(None)
+            fix_columns_width()
             with st.expander(expander_title, expanded=False):
                 st.markdown(f"**Role:** {self.role}")
                 st.markdown(f"**Backstory:** {self.backstory}")
@@ -1,18 +1,24 @@
-from crewai import Crew, Process
-import streamlit as st
-from utils import rnd_id, fix_columns_width
-from streamlit import session_state as ss
+import re
+from utils import rnd_id, new_id, fix_columns_width, ss, st
 from datetime import datetime
-from llms import llm_providers_and_models, create_llm
+from llms import llm_providers_and_models, llm_model_index, create_llm
 import db_utils
+from tracking import ChangeTracked
+from crew_build import BuildContext
+from task_graph import TaskGraph, CycleError
 
-class MyCrew:
+# Values of crewai.Process. Kept as plain strings so this module imports
+# without crewai; get_crewai_crew converts them back.
+PROCESS_SEQUENTIAL = 'sequential'
+PROCESS_HIERARCHICAL = 'hierarchical'
+
+class MyCrew(ChangeTracked):
     def __init__(self, id=None, name=None, agents=None, tasks=None, process=None, cache=None,max_rpm=None, verbose=None, manager_llm=None, manager_agent=None, created_at=None, memory=None, planning=None):
-        self.id = id or "C_" + rnd_id()
+        self.id = id or "C_" + new_id()
         self.name = name or "Crew 1"
         self.agents = agents or []
         self.tasks = tasks or []
-        self.process = process or Process.sequential
+        self.process = process or PROCESS_SEQUENTIAL
         self.verbose = bool(verbose) if verbose is not None else True
         self.manager_llm = manager_llm
         self.manager_agent = manager_agent
@@ -36,50 +42,49 @@ class MyCrew:
     def edit(self, value):
         ss[self.edit_key] = value
 
-    def get_crewai_crew(self, *args, **kwargs) -> Crew:
-        crewai_agents = [agent.get_crewai_agent() for agent in self.agents]
+    def task_graph(self):
+        return TaskGraph(self.tasks)
 
-        # Create a dictionary to hold the Task objects
-        task_objects = {}
+    def ordered_tasks(self):
+        """The crew's tasks in execution order: every task after the tasks it takes context from."""
+        graph = self.task_graph()
+        return [graph.tasks[task_id] for task_id in graph.order()]
 
-        def create_task(task):
-            if task.id in task_objects:
-                return task_objects[task.id]
+    def placeholders(self):
+        """Names of the {placeholder} fields in the texts of the crew's tasks and agents, which kickoff inputs fill in."""
+        texts = [text for task in self.tasks for text in (task.description, task.expected_output)]
+        texts += [text for agent in self.agents for text in (agent.role, agent.backstory, agent.goal)]
+        return {name for text in texts for name in re.findall(r'\{(.*?)\}', text or '')}
 
-            context_tasks = []
-            if task.async_execution or task.context_from_async_tasks_ids or task.context_from_sync_tasks_ids:
-                for context_task_id in (task.context_from_async_tasks_ids or []) + (task.context_from_sync_tasks_ids or []):
-                    if context_task_id not in task_objects:
-                        context_task = next((t for t in self.tasks if t.id == context_task_id), None)
-                        if context_task:
-                            context_tasks.append(create_task(context_task))
-                        else:
-                            print(f"Warning: Context task with id {context_task_id} not found for task {task.id}")
-                    else:
-                        context_tasks.append(task_objects[context_task_id])
+    def get_crewai_crew(self, *args, build=None, **kwargs) -> 'Crew':
+        """Build the crewai Crew. Pass a BuildContext as build to read its stats() afterwards."""
+        from crewai import Crew, Process
+        build = build or BuildContext()
+        # Construct every agent (and its tools) up front, concurrently
+        build.build_agents(self.agents + [task.agent for task in self.tasks if task.agent], self.manager_agent)
+        crewai_agents = [agent.get_crewai_agent(build) for agent in self.agents]
+        graph = self.task_graph()
+        crewai_tasks_by_id = {}
 
+        def create_task(task):
+            context_tasks = [crewai_tasks_by_id[context_task_id] for context_task_id in graph.dependencies[task.id]]
             # Only pass context if it's an async task or if specific context is defined
             if task.async_execution or context_tasks:
-                crewai_task = task.get_crewai_task(context_from_async_tasks=context_tasks)
-            else:
-                crewai_task = task.get_crewai_task()
-
-            task_objects[task.id] = crewai_task
-            return crewai_task
+                return task.get_crewai_task(context_from_async_tasks=context_tasks, build=build)
+            return task.get_crewai_task(build=build)
 
-        # Create all tasks, resolving dependencies recursively
-        for task in self.tasks:
-            create_task(task)
-
-        # Collect the final list of tasks in the original order
-        crewai_tasks = [task_objects[task.id] for task in self.tasks]
+        # Create the tasks in dependency order, so context tasks always exist first
+        for task_id in graph.order():
+            task = graph.tasks[task_id]
+            crewai_tasks_by_id[task_id] = build.get('task', task_id, lambda: create_task(task))
+        crewai_tasks = list(crewai_tasks_by_id.values())
 
         if self.manager_llm:
             return Crew(
                 agents=crewai_agents,
                 tasks=crewai_tasks,
                 cache=self.cache,
-                process=self.process,
+                process=Process(self.process),
                 max_rpm=self.max_rpm,
                 verbose=self.verbose,
                 manager_llm=create_llm(self.manager_llm),
@@ -92,10 +97,10 @@ class MyCrew:
                 agents=crewai_agents,
                 tasks=crewai_tasks,
                 cache=self.cache,
-                process=self.process,
+                process=Process(self.process),
                 max_rpm=self.max_rpm,
                 verbose=self.verbose,
-                manager_agent=self.manager_agent.get_crewai_agent(),
+                manager_agent=self.manager_agent.get_crewai_agent(build, kind='manager_agent'),
                 memory=self.memory,
                 planning=self.planning,
                 *args, **kwargs
@@ -104,7 +109,7 @@ class MyCrew:
         agents=crewai_agents,
         tasks=crewai_tasks,
         cache=self.cache,
-        process=self.process,
+        process=Process(self.process),
         max_rpm=self.max_rpm,
         verbose=self.verbose,
         memory=self.memory,
@@ -184,15 +189,20 @@ class MyCrew:
             return False
         if any([not task.is_valid(show_warning=show_warning) for task in self.tasks]):
             return False
-        if self.process == Process.hierarchical and not (self.manager_llm or self.manager_agent):
+        try:
+            self.task_graph().order()
+        except CycleError as e:
+            if show_warning:
+                st.warning(f"Crew {self.name}: {e}")
+            return False
+        if self.process == PROCESS_HIERARCHICAL and not (self.manager_llm or self.manager_agent):
             if show_warning:
                 st.warning(f"Crew {self.name} has no manager agent or manager llm set for hierarchical process")
             return False
         return True
 
     def validate_manager_llm(self):
-        available_models = llm_providers_and_models()
-        if self.manager_llm and self.manager_llm not in available_models:
+        if self.manager_llm and llm_model_index(self.manager_llm) is None:
             self.manager_llm = None
 
     def draw(self,expanded=False, buttons=True):
@@ -212,15 +222,15 @@ class MyCrew:
         if self.edit:
             with st.container(border=True):
                 st.text_input("Name (just id, it doesn't affect anything)", value=self.name, key=name_key, on_change=self.update_name)
-                st.selectbox("Process", options=[Process.sequential, Process.hierarchical], index=[Process.sequential, Process.hierarchical].index(self.process), key=process_key, on_change=self.update_process)
+                st.selectbox("Process", options=[PROCESS_SEQUENTIAL, PROCESS_HIERARCHICAL], index=[PROCESS_SEQUENTIAL, PROCESS_HIERARCHICAL].index(self.process), key=process_key, on_change=self.update_process)
                 st.multiselect("Agents", options=[agent.role for agent in ss.agents], default=[agent.role for agent in self.agents], key=agents_key, on_change=self.update_agents)                
                 # Filter tasks by selected agents
                 available_tasks = [task for task in ss.tasks if task.agent and task.agent.id in [agent.id for agent in self.agents]]
                 available_task_ids = [task.id for task in available_tasks]
                 default_task_ids = [task.id for task in self.tasks if task.id in available_task_ids]             
                 st.multiselect("Tasks", options=available_task_ids, default=default_task_ids, format_func=lambda x: next(task.description for task in ss.tasks if task.id == x), key=tasks_key, on_change=self.update_tasks)                
-                st.selectbox("Manager LLM", options=["None"] + llm_providers_and_models(), index=0 if self.manager_llm is None else llm_providers_and_models().index(self.manager_llm) + 1, key=manager_llm_key, on_change=self.update_manager_llm, disabled=(self.process != Process.hierarchical))
-                st.selectbox("Manager Agent", options=["None"] + [agent.role for agent in ss.agents], index=0 if self.manager_agent is None else [agent.role for agent in ss.agents].index(self.manager_agent.role) + 1, key=manager_agent_key, on_change=self.update_manager_agent, disabled=(self.process != Process.hierarchical))
+                st.selectbox("Manager LLM", options=["None"] + llm_providers_and_models(), index=0 if self.manager_llm is None else llm_model_index(self.manager_llm) + 1, key=manager_llm_key, on_change=self.update_manager_llm, disabled=(self.process != PROCESS_HIERARCHICAL))
+                st.selectbox("Manager Agent", options=["None"] + [agent.role for agent in ss.agents], index=0 if self.manager_agent is None else [agent.role for agent in ss.agents].index(self.manager_agent.role) + 1, key=manager_agent_key, on_change=self.update_manager_agent, disabled=(self.process != PROCESS_HIERARCHICAL))
                 st.checkbox("Verbose", value=self.verbose, key=verbose_key, on_change=self.update_verbose)
                 st.checkbox("Memory", value=self.memory, key=memory_key, on_change=self.update_memory)
                 st.checkbox("Cache", value=self.cache, key=cache_key, on_change=self.update_cache)
@@ -232,7 +242,7 @@ class MyCrew:
             expander_title = f"Crew: {self.name}" if self.is_valid() else f"❗ Crew: {self.name}"
             with st.expander(expander_title, expanded=expanded):
                 st.markdown(f"**Process:** {self.process}")
-                if self.process == Process.hierarchical:
+                if self.process == PROCESS_HIERARCHICAL:
                     st.markdown(f"**Manager LLM:** {self.manager_llm}")
                     st.markdown(f"**Manager Agent:** {self.manager_agent.role if self.manager_agent else 'None'}")
                 st.markdown(f"**Verbose:** {self.verbose}")
@@ -1,16 +1,14 @@
-from crewai import Task
-import streamlit as st
-from utils import rnd_id, fix_columns_width
-from streamlit import session_state as ss
+from utils import rnd_id, new_id, fix_columns_width, ss, st
 from db_utils import save_task, delete_task
 from datetime import datetime
+from tracking import ChangeTracked
 
-class MyTask:
+class MyTask(ChangeTracked):
     def __init__(self, id=None, description=None, expected_output=None, agent=None, async_execution=None, created_at=None, context_from_async_tasks_ids=None, context_from_sync_tasks_ids=None, **kwargs):
-        self.id = id or "T_" + rnd_id()
+        self.id = id or "T_" + new_id()
         self.description = description or "Identify the next big trend in AI. Focus on identifying pros and cons and the overall narrative."
         self.expected_output = expected_output or "A comprehensive 3 paragraphs long report on the latest AI trends."
-        self.agent = agent or ss.agents[0] if ss.agents else None
+        self.agent = agent or (ss.agents[0] if ss.get('agents') else None)
         self.async_execution = async_execution or False
         self.context_from_async_tasks_ids = context_from_async_tasks_ids or None
         self.context_from_sync_tasks_ids = context_from_sync_tasks_ids or None
@@ -27,7 +25,9 @@ class MyTask:
     def edit(self, value):
         ss[self.edit_key] = value
 
-    def get_crewai_task(self, context_from_async_tasks=None, context_from_sync_tasks=None) -> Task:
+    def get_crewai_task(self, context_from_async_tasks=None, context_from_sync_tasks=None, build=None) -> 'Task':
+        """build is the BuildContext of the crew being built; the task's agent is taken from it."""
+        from crewai import Task
         context = []
         if context_from_async_tasks:
             context.extend(context_from_async_tasks)
@@ -35,9 +35,9 @@ class MyTask:
             context.extend(context_from_sync_tasks)
         
         if context:
-            return Task(description=self.description, expected_output=self.expected_output, async_execution=self.async_execution, agent=self.agent.get_crewai_agent(), context=context)
+            return Task(description=self.description, expected_output=self.expected_output, async_execution=self.async_execution, agent=self.agent.get_crewai_agent(build), context=context)
         else:
-            return Task(description=self.description, expected_output=self.expected_output, async_execution=self.async_execution, agent=self.agent.get_crewai_agent())
+            return Task(description=self.description, expected_output=self.expected_output, async_execution=self.async_execution, agent=self.agent.get_crewai_agent(build))
 
     def delete(self):
         ss.tasks = [task for task in ss.tasks if task.id != self.id]
@@ -1,19 +1,36 @@
-import streamlit as st
 import os
-from utils import rnd_id
-from crewai_tools import CodeInterpreterTool,ScrapeElementFromWebsiteTool,TXTSearchTool,SeleniumScrapingTool,PGSearchTool,PDFSearchTool,MDXSearchTool,JSONSearchTool,GithubSearchTool,EXASearchTool,DOCXSearchTool,CSVSearchTool,ScrapeWebsiteTool, FileReadTool, DirectorySearchTool, DirectoryReadTool, CodeDocsSearchTool, YoutubeVideoSearchTool,SerperDevTool,YoutubeChannelSearchTool,WebsiteSearchTool
-from custom_tools import CustomApiTool,CustomFileWriteTool,CustomCodeInterpreterTool
-from langchain_community.tools import YahooFinanceNewsTool
+from utils import new_id, st
 from abc import ABC, abstractmethod
 from typing import Optional, Any, Dict, Union, List
+from tracking import ChangeTracked
+
+class MyTool(ChangeTracked, ABC):
+    """Base class of the tools agents can use.
+
+    Subclasses declare their name, description and parameters as class
+    attributes, so the tool catalog can be read without creating instances
+    or importing the backing library; create_tool imports it on first use.
+    """
+    name = None
+    description = None
+    # Module the backing tool class (named like the tool) is imported from
+    tool_module = 'crewai_tools'
+    # {parameter name: {'mandatory': bool, 'default': value}}
+    parameters_metadata = {}
+
+    def __init__(self, tool_id=None, **kwargs):
+        self.tool_id = tool_id or new_id()
+        self.parameters = {param_name: metadata.get('default') for param_name, metadata in self.parameters_metadata.items()}
+        self.parameters.update(kwargs)
 
-class MyTool(ABC):
-    def __init__(self, tool_id, name, description, parameters, **kwargs):
-        self.tool_id = tool_id or rnd_id()
-        self.name = name
-        self.description = description
-        self.parameters = kwargs
-        self.parameters_metadata = parameters
+    @classmethod
+    def metadata(cls):
+        return {
+            'name': cls.name,
+            'description': cls.description,
+            'module': cls.tool_module,
+            'parameters': {param_name: dict(metadata) for param_name, metadata in cls.parameters_metadata.items()}
+        }
 
     def get_parameters(self):
         return self.parameters
@@ -29,7 +46,7 @@ class MyTool(ABC):
 
     def is_valid(self,show_warning=False):
         for param_name, metadata in self.parameters_metadata.items():
-            if metadata['mandatory'] and not self.parameters.get(param_name):
+            if metadata.get('mandatory') and not self.parameters.get(param_name):
                 if show_warning:
                     st.warning(f"Parameter '{param_name}' is mandatory for tool '{self.name}'")
                 return False
@@ -41,141 +58,154 @@ class MyTool(ABC):
         pass
 
 class MyScrapeWebsiteTool(MyTool):
-    def __init__(self, tool_id=None, website_url=None):
-        parameters = {
-            'website_url': {'mandatory': False}
-        }
-        super().__init__(tool_id, 'ScrapeWebsiteTool', "A tool that can be used to read website content.", parameters, website_url=website_url)
+    name = 'ScrapeWebsiteTool'
+    description = "A tool that can be used to read website content."
+    parameters_metadata = {
+        'website_url': {'mandatory': False}
+    }
 
     def create_tool(self, config: Optional[Dict[str, Any]] = None) -> Any:
+        from crewai_tools import ScrapeWebsiteTool
         return ScrapeWebsiteTool(self.parameters.get('website_url') if self.parameters.get('website_url') else None)
 
 class MyFileReadTool(MyTool):
-    def __init__(self, tool_id=None, file_path=None):
-        parameters = {
-            'file_path': {'mandatory': False}
-        }
-        super().__init__(tool_id, 'FileReadTool', "A tool that can be used to read a file's content.", parameters, file_path=file_path)
+    name = 'FileReadTool'
+    description = "A tool that can be used to read a file's content."
+    parameters_metadata = {
+        'file_path': {'mandatory': False}
+    }
 
     def create_tool(self, config: Optional[Dict[str, Any]] = None) -> Any:
+        from crewai_tools import FileReadTool
         return FileReadTool(self.parameters.get('file_path') if self.parameters.get('file_path') else None)
 
 class MyDirectorySearchTool(MyTool):
-    def __init__(self, tool_id=None, directory=None):
-        parameters = {
-            'directory': {'mandatory': False}
-        }
-        super().__init__(tool_id, 'DirectorySearchTool', "A tool that can be used to semantic search a query from a directory's content.", parameters, directory_path=directory)
+    name = 'DirectorySearchTool'
+    description = "A tool that can be used to semantic search a query from a directory's content."
+    parameters_metadata = {
+        'directory': {'mandatory': False}
+    }
 
     def create_tool(self, config: Optional[Dict[str, Any]] = None) -> Any:
+        from crewai_tools import DirectorySearchTool
         return DirectorySearchTool(self.parameters.get('directory') if self.parameters.get('directory') else None)
 
 class MyDirectoryReadTool(MyTool):
-    def __init__(self, tool_id=None, directory_contents=None):
-        parameters = {
-            'directory_contents': {'mandatory': True}
-        }
-        super().__init__(tool_id, 'DirectoryReadTool', "Use the tool to list the contents of the specified directory", parameters, directory_contents=directory_contents)
+    name = 'DirectoryReadTool'
+    description = "Use the tool to list the contents of the specified directory"
+    parameters_metadata = {
+        'directory_contents': {'mandatory': True}
+    }
 
     def create_tool(self, config: Optional[Dict[str, Any]] = None) -> Any:
+        from crewai_tools import DirectoryReadTool
         return DirectoryReadTool(self.parameters.get('directory_contents'))
 
 class MyCodeDocsSearchTool(MyTool):
-    def __init__(self, tool_id=None, code_docs=None):
-        parameters = {
-            'code_docs': {'mandatory': False}
-        }
-        super().__init__(tool_id, 'CodeDocsSearchTool', "A tool that can be used to search through code documentation.", parameters, code_docs=code_docs)
+    name = 'CodeDocsSearchTool'
+    description = "A tool that can be used to search through code documentation."
+    parameters_metadata = {
+        'code_docs': {'mandatory': False}
+    }
 
     def create_tool(self, config: Optional[Dict[str, Any]] = None) -> Any:
+        from crewai_tools import CodeDocsSearchTool
         return CodeDocsSearchTool(self.parameters.get('code_docs') if self.parameters.get('code_docs') else None)
 
 class MyYoutubeVideoSearchTool(MyTool):
-    def __init__(self, tool_id=None, youtube_video_url=None):
-        parameters = {
-            'youtube_video_url': {'mandatory': False}
-        }
-        super().__init__(tool_id, 'YoutubeVideoSearchTool', "A tool that can be used to semantic search a query from a Youtube Video content.", parameters, youtube_video_url=youtube_video_url)
+    name = 'YoutubeVideoSearchTool'
+    description = "A tool that can be used to semantic search a query from a Youtube Video content."
+    parameters_metadata = {
+        'youtube_video_url': {'mandatory': False}
+    }
 
     def create_tool(self, config: Optional[Dict[str, Any]] = None) -> Any:
+        from crewai_tools import YoutubeVideoSearchTool
         return YoutubeVideoSearchTool(self.parameters.get('youtube_video_url') if self.parameters.get('youtube_video_url') else None)
 
 class MySerperDevTool(MyTool):
-    def __init__(self, tool_id=None, SERPER_API_KEY: Optional[str] = None):
-        parameters = {
-            'SERPER_API_KEY': SERPER_API_KEY
-        }
-        super().__init__(tool_id, 'SerperDevTool', "A tool that can be used to search the internet with a search_query", parameters)
+    name = 'SerperDevTool'
+    description = "A tool that can be used to search the internet with a search_query"
+    parameters_metadata = {
+        'SERPER_API_KEY': {'mandatory': False}
+    }
 
     def create_tool(self, config: Optional[Dict[str, Any]] = None) -> Any:
+        from crewai_tools import SerperDevTool
         api_key = self.parameters.get('SERPER_API_KEY')
         if api_key:
             os.environ['SERPER_API_KEY'] = api_key
         return SerperDevTool()
 
 class MyYoutubeChannelSearchTool(MyTool):
-    def __init__(self, tool_id=None, youtube_channel_handle=None):
-        parameters = {
-            'youtube_channel_handle': {'mandatory': False}
-        }
-        super().__init__(tool_id, 'YoutubeChannelSearchTool', "A tool that can be used to semantic search a query from a Youtube Channels content. Channel can be added as @channel", parameters, youtube_channel_handle=youtube_channel_handle)
+    name = 'YoutubeChannelSearchTool'
+    description = "A tool that can be used to semantic search a query from a Youtube Channels content. Channel can be added as @channel"
+    parameters_metadata = {
+        'youtube_channel_handle': {'mandatory': False}
+    }
 
     def create_tool(self, config: Optional[Dict[str, Any]] = None) -> Any:
+        from crewai_tools import YoutubeChannelSearchTool
         return YoutubeChannelSearchTool(self.parameters.get('youtube_channel_handle') if self.parameters.get('youtube_channel_handle') else None)
 
 class MyWebsiteSearchTool(MyTool):
-    def __init__(self, tool_id=None, website=None):
-        parameters = {
-            'website': {'mandatory': False}
-        }
-        super().__init__(tool_id, 'WebsiteSearchTool', "A tool that can be used to semantic search a query from a specific URL content.", parameters, website=website)
+    name = 'WebsiteSearchTool'
+    description = "A tool that can be used to semantic search a query from a specific URL content."
+    parameters_metadata = {
+        'website': {'mandatory': False}
+    }
 
     def create_tool(self, config: Optional[Dict[str, Any]] = None) -> Any:
+        from crewai_tools import WebsiteSearchTool
         return WebsiteSearchTool(self.parameters.get('website') if self.parameters.get('website') else None)
 
 class MyCSVSearchTool(MyTool):
-    def __init__(self, tool_id=None, csv=None):
-        parameters = {
-            'csv': {'mandatory': False}
-        }
-        super().__init__(tool_id, 'CSVSearchTool', "A tool that can be used to semantic search a query from a CSV's content.", parameters, csv=csv)
+    name = 'CSVSearchTool'
+    description = "A tool that can be used to semantic search a query from a CSV's content."
+    parameters_metadata = {
+        'csv': {'mandatory': False}
+    }
 
     def create_tool(self, config: Optional[Dict[str, Any]] = None) -> Any:
+        from crewai_tools import CSVSearchTool
         return CSVSearchTool(csv=self.parameters.get('csv') if self.parameters.get('csv') else None)
 
 class MyDocxSearchTool(MyTool):
-    def __init__(self, tool_id=None, docx=None):
-        parameters = {
-            'docx': {'mandatory': False}
-        }
-        super().__init__(tool_id, 'DOCXSearchTool', "A tool that can be used to semantic search a query from a DOCX's content.", parameters, docx=docx)
+    name = 'DOCXSearchTool'
+    description = "A tool that can be used to semantic search a query from a DOCX's content."
+    parameters_metadata = {
+        'docx': {'mandatory': False}
+    }
 
     def create_tool(self, config: Optional[Dict[str, Any]] = None) -> Any:
+        from crewai_tools import DOCXSearchTool
         return DOCXSearchTool(docx=self.parameters.get('docx') if self.parameters.get('docx') else None)
 
 class MyEXASearchTool(MyTool):
-    def __init__(self, tool_id=None, EXA_API_KEY: Optional[str] = None):
-        parameters = {
-            'EXA_API_KEY': EXA_API_KEY
-        }
-        super().__init__(tool_id, 'EXASearchTool', "A tool that can be used to search the internet from a search_query", parameters)
+    name = 'EXASearchTool'
+    description = "A tool that can be used to search the internet from a search_query"
+    parameters_metadata = {
+        'EXA_API_KEY': {'mandatory': False}
+    }
 
     def create_tool(self, config: Optional[Dict[str, Any]] = None) -> Any:
+        from crewai_tools import EXASearchTool
         api_key = self.parameters.get('EXA_API_KEY')
         if api_key:
             os.environ['EXA_API_KEY'] = api_key
         return EXASearchTool()
 
 class MyGithubSearchTool(MyTool):
-    def __init__(self, tool_id=None, github_repo=None, gh_token=None, content_types=None):
-        parameters = {
-            'github_repo': github_repo,
-            'gh_token': gh_token,
-            'content_types': content_types
-        }
-        super().__init__(tool_id, 'GithubSearchTool', "A tool that can be used to semantic search a query from a Github repository's content. Valid content_types: code,repo,pr,issue (comma separated)", parameters)
+    name = 'GithubSearchTool'
+    description = "A tool that can be used to semantic search a query from a Github repository's content. Valid content_types: code,repo,pr,issue (comma separated)"
+    parameters_metadata = {
+        'github_repo': {'mandatory': False},
+        'gh_token': {'mandatory': False},
+        'content_types': {'mandatory': False}
+    }
 
     def create_tool(self, config: Optional[Dict[str, Any]] = None) -> Any:
+        from crewai_tools import GithubSearchTool
         content_types_str = self.parameters.get('content_types', '')
         content_types_list = content_types_str.split(',') if content_types_str else None
         
@@ -186,48 +216,48 @@ class MyGithubSearchTool(MyTool):
         )
 
 class MyJSONSearchTool(MyTool):
-    def __init__(self, tool_id=None, json_path=None):
-        parameters = {
-            'json_path': {'mandatory': False}
-        }
-        super().__init__(tool_id, 'JSONSearchTool', "A tool that can be used to semantic search a query from a JSON's content.", parameters, json_path=json_path)
+    name = 'JSONSearchTool'
+    description = "A tool that can be used to semantic search a query from a JSON's content."
+    parameters_metadata = {
+        'json_path': {'mandatory': False}
+    }
 
     def create_tool(self, config: Optional[Dict[str, Any]] = None) -> Any:
+        from crewai_tools import JSONSearchTool
         return JSONSearchTool(json_path=self.parameters.get('json_path') if self.parameters.get('json_path') else None)
 
 class MyMDXSearchTool(MyTool):
-    def __init__(self, tool_id=None, mdx=None):
-        parameters = {
-            'mdx': {'mandatory': False}
-        }
-        super().__init__(tool_id, 'MDXSearchTool', "A tool that can be used to semantic search a query from a MDX's content.", parameters, mdx=mdx)
+    name = 'MDXSearchTool'
+    description = "A tool that can be used to semantic search a query from a MDX's content."
+    parameters_metadata = {
+        'mdx': {'mandatory': False}
+    }
 
     def create_tool(self, config: Optional[Dict[str, Any]] = None) -> Any:
+        from crewai_tools import MDXSearchTool
         return MDXSearchTool(mdx=self.parameters.get('mdx') if self.parameters.get('mdx') else None)
 
 class MyPDFSearchTool(MyTool):
-    def __init__(self, tool_id=None, pdf=None):
-        parameters = {
-            'pdf': {'mandatory': False}
-        }
-        super().__init__(tool_id, 'PDFSearchTool', "A tool that can be used to semantic search a query from a PDF's content.", parameters, pdf=pdf)
+    name = 'PDFSearchTool'
+    description = "A tool that can be used to semantic search a query from a PDF's content."
+    parameters_metadata = {
+        'pdf': {'mandatory': False}
+    }
 
     def create_tool(self, config: Optional[Dict[str, Any]] = None) -> Any:
+        from crewai_tools import PDFSearchTool
         return PDFSearchTool(self.parameters.get('pdf') if self.parameters.get('pdf') else None)
 
 class MyPGSearchTool(MyTool):
-    def __init__(self, tool_id=None, db_uri=None, table_name: str = ''):
-        parameters = {
-            'db_uri': {'mandatory': True},
-            'table_name': {'mandatory': False, 'default': ''}
-        }
-        super().__init__(tool_id, 'PGSearchTool', "A tool that can be used to semantic search a query from a database table's content.", parameters)
-        if db_uri:
-            self.parameters['db_uri'] = db_uri
-        if table_name:
-            self.parameters['table_name'] = table_name
+    name = 'PGSearchTool'
+    description = "A tool that can be used to semantic search a query from a database table's content."
+    parameters_metadata = {
+        'db_uri': {'mandatory': True},
+        'table_name': {'mandatory': False, 'default': ''}
+    }
 
     def create_tool(self, config: Optional[Dict[str, Any]] = None) -> Any:
+        from crewai_tools import PGSearchTool
         db_uri = self.parameters.get('db_uri')
         if not db_uri:
             raise ValueError("db_uri is required")
@@ -235,23 +265,16 @@ class MyPGSearchTool(MyTool):
         return PGSearchTool(db_uri=db_uri, table_name=table_name)
 
 class MySeleniumScrapingTool(MyTool):
-    def __init__(self, tool_id=None, website_url=None, cookie=None, wait_time=None):
-        parameters = {
-            'website_url': {'mandatory': True},
-            'cookie': {'mandatory': False},
-            'wait_time': {'mandatory': False}
-        }
-        super().__init__(
-            tool_id, 
-            'SeleniumScrapingTool', 
-            "A tool that can be used to scrape websites with Selenium. Useful for dynamic websites that require JavaScript.", 
-            parameters,
-            website_url=website_url, 
-            cookie=cookie, 
-            wait_time=wait_time
-        )
+    name = 'SeleniumScrapingTool'
+    description = "A tool that can be used to scrape websites with Selenium. Useful for dynamic websites that require JavaScript."
+    parameters_metadata = {
+        'website_url': {'mandatory': True},
+        'cookie': {'mandatory': False},
+        'wait_time': {'mandatory': False}
+    }
 
     def create_tool(self, config: Optional[Dict[str, Any]] = None) -> Any:
+        from crewai_tools import SeleniumScrapingTool
         cookie_str = self.parameters.get('cookie', '')
         cookie_dict = {}
         if cookie_str:
@@ -270,30 +293,27 @@ class MySeleniumScrapingTool(MyTool):
         )
 
 class MyTXTSearchTool(MyTool):
-    def __init__(self, tool_id=None, txt=None):
-        parameters = {
-            'txt': {'mandatory': False}
-        }
-        super().__init__(tool_id, 'TXTSearchTool', "A tool that can be used to semantic search a query from a TXT's content.", parameters, txt=txt)
+    name = 'TXTSearchTool'
+    description = "A tool that can be used to semantic search a query from a TXT's content."
+    parameters_metadata = {
+        'txt': {'mandatory': False}
+    }
 
     def create_tool(self, config: Optional[Dict[str, Any]] = None) -> Any:
+        from crewai_tools import TXTSearchTool
         return TXTSearchTool(self.parameters.get('txt'))
 
 class MyScrapeElementFromWebsiteTool(MyTool):
-    def __init__(self, tool_id=None, website_url=None, css_element=None, cookie=None):
-        parameters = {
-            'website_url': website_url,
-            'css_element': css_element,
-            'cookie': cookie
-        }
-        super().__init__(
-            tool_id,
-            'ScrapeElementFromWebsiteTool',
-            "A tool that can be used to read a specific part of website content. CSS elements are separated by comma, cookies in format {key:value},{key:value}",
-            parameters
-        )
+    name = 'ScrapeElementFromWebsiteTool'
+    description = "A tool that can be used to read a specific part of website content. CSS elements are separated by comma, cookies in format {key:value},{key:value}"
+    parameters_metadata = {
+        'website_url': {'mandatory': False},
+        'css_element': {'mandatory': False},
+        'cookie': {'mandatory': False}
+    }
 
     def create_tool(self, config: Optional[Dict[str, Any]] = None) -> Any:
+        from crewai_tools import ScrapeElementFromWebsiteTool
         css_element_str = self.parameters.get('css_element', '')
         css_elements = css_element_str.split(',') if css_element_str else None
 
@@ -315,23 +335,26 @@ class MyScrapeElementFromWebsiteTool(MyTool):
         )
 
 class MyYahooFinanceNewsTool(MyTool):
-    def __init__(self, tool_id=None):
-        parameters = {}
-        super().__init__(tool_id, 'YahooFinanceNewsTool', "A tool that can be used to search Yahoo Finance News.", parameters)
+    name = 'YahooFinanceNewsTool'
+    description = "A tool that can be used to search Yahoo Finance News."
+    tool_module = 'langchain_community.tools'
 
     def create_tool(self, config: Optional[Dict[str, Any]] = None) -> Any:
+        from langchain_community.tools import YahooFinanceNewsTool
         return YahooFinanceNewsTool()
 
 class MyCustomApiTool(MyTool):
-    def __init__(self, tool_id=None, base_url=None, headers=None, query_params=None):
-        parameters = {
-            'base_url': base_url,
-            'headers': headers,
-            'query_params': query_params
-        }
-        super().__init__(tool_id, 'CustomApiTool', "A tool that can be used to make API calls with customizable parameters.", parameters)
+    name = 'CustomApiTool'
+    description = "A tool that can be used to make API calls with customizable parameters."
+    tool_module = 'custom_tools'
+    parameters_metadata = {
+        'base_url': {'mandatory': False},
+        'headers': {'mandatory': False},
+        'query_params': {'mandatory': False}
+    }
 
     def create_tool(self, config: Optional[Dict[str, Any]] = None) -> Any:
+        from custom_tools import CustomApiTool
         headers_str = self.parameters.get('headers')
         headers_dict = None
         if headers_str:
@@ -355,14 +378,16 @@ class MyCustomApiTool(MyTool):
         )
 
 class MyCustomFileWriteTool(MyTool):
-    def __init__(self, tool_id=None, base_folder: str = 'workspace', filename=None):
-        parameters = {
-            'base_folder': base_folder,
-            'filename': filename
-        }
-        super().__init__(tool_id, 'CustomFileWriteTool', "A tool that can be used to write a file to a specific folder.", parameters)
+    name = 'CustomFileWriteTool'
+    description = "A tool that can be used to write a file to a specific folder."
+    tool_module = 'custom_tools'
+    parameters_metadata = {
+        'base_folder': {'mandatory': False, 'default': 'workspace'},
+        'filename': {'mandatory': False}
+    }
 
     def create_tool(self, config: Optional[Dict[str, Any]] = None) -> Any:
+        from custom_tools import CustomFileWriteTool
         base_folder = self.parameters.get('base_folder', 'workspace')
         return CustomFileWriteTool(
             base_folder=base_folder,
@@ -370,21 +395,23 @@ class MyCustomFileWriteTool(MyTool):
         )
 
 class MyCodeInterpreterTool(MyTool):
-    def __init__(self, tool_id=None):
-        parameters = {}
-        super().__init__(tool_id, 'CodeInterpreterTool', "This tool is used to give the Agent the ability to run code (Python3) from the code generated by the Agent itself. The code is executed in a sandboxed environment, so it is safe to run any code. Docker required.", parameters)
+    name = 'CodeInterpreterTool'
+    description = "This tool is used to give the Agent the ability to run code (Python3) from the code generated by the Agent itself. The code is executed in a sandboxed environment, so it is safe to run any code. Docker required."
 
     def create_tool(self, config: Optional[Dict[str, Any]] = None) -> Any:
+        from crewai_tools import CodeInterpreterTool
         return CodeInterpreterTool()
 
 class MyCustomCodeInterpreterTool(MyTool):
-    def __init__(self, tool_id=None,workspace_dir=None):
-        parameters = {
-            'workspace_dir': workspace_dir
-        }
-        super().__init__(tool_id, 'CustomCodeInterpreterTool', "This tool is used to give the Agent the ability to run code (Python3) from the code generated by the Agent itself. The code is executed in a sandboxed environment, so it is safe to run any code. Worskpace folder is shared. Docker required.", parameters, workspace_dir=workspace_dir)
+    name = 'CustomCodeInterpreterTool'
+    description = "This tool is used to give the Agent the ability to run code (Python3) from the code generated by the Agent itself. The code is executed in a sandboxed environment, so it is safe to run any code. Worskpace folder is shared. Docker required."
+    tool_module = 'custom_tools'
+    parameters_metadata = {
+        'workspace_dir': {'mandatory': False}
+    }
 
     def create_tool(self, config: Optional[Dict[str, Any]] = None) -> Any:
+        from custom_tools import CustomCodeInterpreterTool
         return CustomCodeInterpreterTool(workspace_dir=self.parameters.get('workspace_dir') if self.parameters.get('workspace_dir') else "workspace")
 
 # Register all tools here
@@ -416,4 +443,7 @@ TOOL_CLASSES = {
     'MDXSearchTool': MyMDXSearchTool,
     'PDFSearchTool': MyPDFSearchTool,
     'PGSearchTool': MyPGSearchTool    
-}
\ No newline at end of file
+}
+
+# Static catalog built from the class attributes: {name: MyTool.metadata()}
+TOOL_METADATA = {name: tool_class.metadata() for name, tool_class in TOOL_CLASSES.items()}
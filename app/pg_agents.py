@@ -2,6 +2,7 @@ import streamlit as st
 from streamlit import session_state as ss
 from my_agent import MyAgent
 import db_utils
+from utils import draw_search
 
 class PageAgents:
     def __init__(self):
@@ -13,11 +14,12 @@ class PageAgents:
             ss.agents = [MyAgent]
         ss.agents.append(agent)
         agent.edit = True
-        db_utils.save_agent(agent)  # Save agent to database
+        with db_utils.transaction():
+            db_utils.save_agent(agent)  # Save agent to database
 
-        if crew:
-            crew.agents.append(agent)
-            db_utils.save_crew(crew)
+            if crew:
+                crew.agents.append(agent)
+                db_utils.save_crew(crew)
 
         return agent
 
@@ -30,6 +32,9 @@ class PageAgents:
             if 'crews' not in ss:
                 ss.crews = db_utils.load_crews()  # Load crews from database
 
+            if draw_search('agent', ss.agents, "Words from the role, goal or backstory"):
+                return
+
             # Dictionary to track agent assignment
             agent_assignment = {agent.id: [] for agent in ss.agents}
 
@@ -1,12 +1,24 @@
 import re
+import json
+import os
 import streamlit as st
 from streamlit import session_state as ss
-import threading
-import ctypes
-import queue
 import time
-import traceback
-import os
+from datetime import datetime
+import db_utils
+from my_crew import PROCESS_SEQUENTIAL
+from task_graph import CREW_DAG_WIDTH, CycleError, dag_runner_supported
+from rate_limiter import rate_limiter_stats
+from run_executor import RUN_EXECUTOR
+from run_history import describe_event
+from batch_runner import BATCH_CONCURRENCY, BATCH_DIR, BatchRun, parse_rows
+from job_queue import CronError, add_schedule, enqueue, start_app_worker
+
+RUN_EVENTS_SHOWN = 50
+
+# st.fragment reruns only the runs while they progress; older Streamlit has
+# it as experimental_fragment, or not at all
+fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None)
 
 class PageCrewRun:
     def __init__(self):
@@ -16,12 +28,12 @@ class PageCrewRun:
     @staticmethod
     def maintain_session_state():
         defaults = {
-            'crew_thread': None,
-            'result': None,
-            'running': False,
-            'message_queue': queue.Queue(),
+            'runs': [],
+            'batches': [],
             'selected_crew_name': None,
-            'placeholders': {}
+            'placeholders': {},
+            'dag_parallel': False,
+            'dag_width': CREW_DAG_WIDTH,
         }
         for key, value in defaults.items():
             if key not in ss:
@@ -45,19 +57,6 @@ class PageCrewRun:
         
         return placeholders
 
-    def run_crew(self, crewai_crew, inputs, message_queue):
-        if (str(os.getenv('AGENTOPS_ENABLED')).lower() in ['true', '1']) and not ss.get('agentops_failed', False):
-            import agentops
-            agentops.start_session()
-        try:
-            result = crewai_crew.kickoff(inputs=inputs)
-            message_queue.put({"result": result})
-        except Exception as e:
-            if (str(os.getenv('AGENTOPS_ENABLED')).lower() in ['true', '1']) and not ss.get('agentops_failed', False):                       
-                agentops.end_session()
-            stack_trace = traceback.format_exc()
-            message_queue.put({"result": f"Error running crew: {str(e)}", "stack_trace": stack_trace})
-
     def get_mycrew_by_name(self, crewname):
         return next((crew for crew in ss.crews if crew.name == crewname), None)
 
@@ -70,8 +69,7 @@ class PageCrewRun:
                 ss.placeholders[placeholder_key] = st.text_input(
                     label=placeholder,
                     key=placeholder_key,
-                    value=ss.placeholders.get(placeholder_key, ''),
-                    disabled=ss.running
+                    value=ss.placeholders.get(placeholder_key, '')
                 )
 
     def draw_crews(self):
@@ -87,8 +85,7 @@ class PageCrewRun:
         selected_crew_name = st.selectbox(
             label="Select crew to run",
             options=[crew.name for crew in ss.crews],
-            index=0 if ss.selected_crew_name is None else [crew.name for crew in ss.crews].index(ss.selected_crew_name) if ss.selected_crew_name in [crew.name for crew in ss.crews] else 0,
-            disabled=ss.running
+            index=0 if ss.selected_crew_name is None else [crew.name for crew in ss.crews].index(ss.selected_crew_name) if ss.selected_crew_name in [crew.name for crew in ss.crews] else 0
         )
 
         if selected_crew_name != ss.selected_crew_name:
@@ -103,73 +100,303 @@ class PageCrewRun:
             
             if not selected_crew.is_valid(show_warning=True):
                 st.error("Selected crew is not valid. Please fix the issues.")
+            self.draw_parallel_options(selected_crew)
             self.control_buttons(selected_crew)
+            self.draw_batch_form(selected_crew)
+
+    @staticmethod
+    def draw_build_info(info):
+        stats = info['build']
+        if info['cached']:
+            st.caption(f"Started from the cached crew, copied in {info['seconds'] * 1000:.0f} ms")
+            return
+        built = ', '.join(f"{count} {kind}s" for kind, count in stats['built'].items())
+        reused = sum(stats['reused'].values())
+        st.caption(f"Build: {built} constructed, {reused} reused, "
+                   f"LLM clients {stats['llm_clients_created']} created / {stats['llm_clients_reused']} reused, "
+                   f"{stats['seconds']:.2f}s with {stats['workers']} workers")
+        with st.expander("Build timeline", expanded=False):
+            st.dataframe([
+                {
+                    'Object': f"{entry['kind']}: {entry['label']}",
+                    'Start (s)': round(entry['start'], 3),
+                    'Duration (s)': round(entry['seconds'], 3),
+                    'Thread': entry['thread'],
+                    'Error': entry['error'],
+                }
+                for entry in stats['timeline']
+            ], use_container_width=True)
+
+    def draw_parallel_options(self, crew):
+        if not dag_runner_supported():
+            ss.dag_parallel = False
+            return
+        sequential = crew.process == PROCESS_SEQUENTIAL
+        col1, col2 = st.columns(2)
+        with col1:
+            st.checkbox("Run independent tasks in parallel", key='dag_parallel', disabled=not sequential,
+                        help="Only for sequential crews. Tasks get the output of their context tasks only, not of the previous task.")
+        with col2:
+            st.number_input("Tasks at a time", min_value=1, max_value=16, key='dag_width', disabled=not sequential)
+        if not sequential:
+            return
+        try:
+            graph = crew.task_graph()
+            durations = db_utils.load_task_durations(list(graph.tasks))
+            estimate = graph.estimate(durations, ss.dag_width)
+        except CycleError:
+            return  # is_valid() already warned
+        path = len(estimate['critical_path'])
+        if durations:
+            st.caption(f"Predicted parallel run: {estimate['parallel']:.0f}s vs {estimate['sequential']:.0f}s sequential "
+                       f"({estimate['speedup']:.1f}x), critical path {path} tasks / {estimate['critical_path_seconds']:.0f}s, "
+                       f"from the average task durations of past runs")
+        else:
+            st.caption(f"Predicted parallel speedup: {estimate['speedup']:.1f}x, critical path {path} of {len(graph.tasks)} tasks "
+                       f"(assuming equal task durations until the crew has completed runs)")
+
+    @staticmethod
+    def current_inputs():
+        return {key.split('_')[1]: value for key, value in ss.placeholders.items()}
 
     def control_buttons(self, selected_crew):
-        if st.button('Run crew!', disabled=not selected_crew.is_valid() or ss.running):
-            inputs = {key.split('_')[1]: value for key, value in ss.placeholders.items()}
-            ss.result = None            
+        if st.button('Run crew!', disabled=not selected_crew.is_valid()):
+            parallel = ss.dag_parallel and selected_crew.process == PROCESS_SEQUENTIAL
+            ss.runs.append(RUN_EXECUTOR.submit(selected_crew, self.current_inputs(), parallel=parallel, width=ss.dag_width))
+            st.rerun()
+        executor = RUN_EXECUTOR.stats()
+        st.caption(f"Workers: {executor['busy']} of {executor['max_workers']} busy, {executor['queued']} runs queued")
+
+    def draw_batch_form(self, crew):
+        with st.expander("Batch run", expanded=False):
+            uploaded = st.file_uploader("Inputs, one run per row: CSV with a column per placeholder, or JSONL",
+                                        type=['csv', 'jsonl'], key='batch_inputs')
+            if uploaded is None:
+                return
             try:
-                crew = selected_crew.get_crewai_crew(full_output=True)
-            except Exception as e:
-                st.exception(e)
-                traceback.print_exc()
+                rows = parse_rows(uploaded.getvalue().decode('utf-8-sig'), 'csv' if uploaded.name.lower().endswith('.csv') else 'jsonl')
+            except ValueError as e:
+                st.error(f"Could not read {uploaded.name}: {e}")
                 return
+            columns = {key for row in rows for key in row}
+            missing = self.get_placeholders_from_crew(crew) - columns
+            st.caption(f"{len(rows)} rows, columns: {', '.join(sorted(columns))}")
+            if missing:
+                st.warning(f"No column for placeholders: {', '.join(sorted(missing))}")
+            concurrency = st.number_input("Runs at a time", min_value=1, max_value=64, value=BATCH_CONCURRENCY, key='batch_concurrency',
+                                          help=f"Runs beyond the {RUN_EXECUTOR.max_workers} worker processes wait in the executor's queue")
+            default_path = os.path.join(BATCH_DIR, re.sub(r'[^\w-]+', '_', crew.name) + '.jsonl')
+            output_path = st.text_input("Results file (JSONL)", value=default_path, key='batch_output',
+                                        help="Rows this file already has a completed result for are skipped, so running again resumes the batch")
+            if st.button("Run batch", disabled=not rows or not crew.is_valid()):
+                parallel = ss.dag_parallel and crew.process == PROCESS_SEQUENTIAL
+                ss.batches.append(BatchRun(crew, rows, output_path, concurrency, parallel=parallel, width=ss.dag_width).start())
+                st.rerun()
 
-            ss.running = True
-            ss.crew_thread = threading.Thread(
-                target=self.run_crew,
-                kwargs={
-                    "crewai_crew": crew,
-                    "inputs": inputs,
-                    "message_queue": ss.message_queue
-                }
-            )
-            ss.crew_thread.start()
-            ss.result = None
-            ss.running = True            
-            st.rerun()
+    def draw_batch(self, batch):
+        stats = batch.stats()
+        with st.container(border=True):
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                st.markdown(f"**Batch of {batch.crew.name}**: {batch.status} ({stats['seconds']:.0f}s) → `{batch.output_path}`")
+            with col2:
+                if batch.active:
+                    st.button('Stop batch', key=f'stop_{batch.batch_id}', on_click=batch.cancel)
+            done = stats['skipped'] + stats['completed'] + stats['failed']
+            st.progress(done / stats['rows'] if stats['rows'] else 1.0,
+                        text=f"{done} of {stats['rows']} rows done ({stats['skipped']} from earlier runs), "
+                             f"{stats['failed']} failed, {stats['cancelled']} cancelled, {stats['in_flight']} running")
+            if stats['latency_avg'] is not None:
+                st.caption(f"{stats['rows_per_minute']:.1f} rows/min · latency avg {stats['latency_avg']:.1f}s, "
+                           f"p50 {stats['latency_p50']:.1f}s, p95 {stats['latency_p95']:.1f}s, max {stats['latency_max']:.1f}s · "
+                           f"run time avg {stats['run_seconds_avg']:.1f}s")
+            if batch.error:
+                st.error(batch.error)
+
+    def draw_run(self, handle):
+        with st.container(border=True):
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                st.markdown(f"**{handle.crew_name}**: {handle.status} ({handle.elapsed():.0f}s)"
+                            + (" · parallel" if handle.parallel else ""))
+            with col2:
+                if handle.active:
+                    st.button('Stop crew!', key=f'stop_{handle.run_id}', on_click=RUN_EXECUTOR.cancel, args=(handle.run_id,))
+            if handle.build_info:
+                self.draw_build_info(handle.build_info)
+            for kind, label, error in handle.build_errors:
+                st.error(f"Could not build {kind} {label}: {error}")
+            for step in handle.steps:
+                st.markdown(f"✓ {step['position'] + 1}. {step['description'][:120]} ({step['agent_role']}, {step['duration']:.1f}s)")
+            for event in sorted(handle.running_tasks.values(), key=lambda event: event['position']):
+                st.markdown(f"▶ {event['position'] + 1}. {event['description'][:120]} ({event['agent_role']}, "
+                            f"{time.time() - event['time']:.0f}s)")
+            self.draw_events(handle)
+            if handle.status == 'completed':
+                st.expander("Final output", expanded=True).write(handle.output)
+                if handle.tasks_output:
+                    st.expander("Full output", expanded=False).write(handle.tasks_output)
+            elif handle.error and not handle.build_errors:
+                st.error(handle.error)
 
-        if st.button('Stop crew!', disabled=not ss.running):
-            self.force_stop_thread(ss.crew_thread)
-            ss.message_queue.queue.clear()
-            ss.running = False
-            ss.crew_thread = None
-            ss.result = None
-            st.success("Crew stopped successfully.")
+    def draw_events(self, handle):
+        events = handle.bus.since(0)
+        if len(events) <= 1:
+            return
+        with st.expander(f"Events ({handle.bus.seq})", expanded=False):
+            if handle.bus.dropped:
+                st.caption(f"{handle.bus.dropped} older events dropped")
+            st.text('\n'.join(
+                f"{datetime.fromtimestamp(event['time']).strftime('%H:%M:%S')}  {describe_event(event)}"
+                for _, event in events[-RUN_EVENTS_SHOWN:]
+            ))
+
+    def draw_runs(self, was_active=False):
+        if any(not item.active for item in ss.runs + ss.batches):
+            if st.button("Clear finished runs"):
+                ss.runs = [handle for handle in ss.runs if handle.active]
+                ss.batches = [batch for batch in ss.batches if batch.active]
+                st.rerun()
+        for batch in reversed(ss.batches):
+            self.draw_batch(batch)
+        for handle in reversed(ss.runs):
+            self.draw_run(handle)
+        if was_active and not any(item.active for item in ss.runs + ss.batches):
+            # Stop the fragment's timer and refresh the run history
             st.rerun()
 
     def display_result(self):
-        if ss.result is not None:
-            if isinstance(ss.result, dict):
-                if 'final_output' in ss.result["result"]: #old version of crewai
-                    st.expander("Final output", expanded=True).write(ss.result["result"]['final_output'])
-                elif hasattr(ss.result["result"], 'raw'):  #new version of crewai
-                    st.expander("Final output", expanded=True).write(ss.result['result'].raw)  
-                st.expander("Full output", expanded=False).write(ss.result)
-            else:
-                st.error(ss.result)
-        elif ss.running and ss.crew_thread is not None:
+        if not ss.runs and not ss.batches:
+            return
+        active = any(item.active for item in ss.runs + ss.batches)
+        if fragment is not None:
+            # Redraw just the runs every second while one is active; the rest of the page stays put
+            fragment(self.draw_runs, run_every=1 if active else None)(active)
+            return
+        self.draw_runs()
+        if active:
             with st.spinner("Running crew..."):
-                while ss.running:
-                    time.sleep(1)
-                    if not ss.message_queue.empty():
-                        ss.result = ss.message_queue.get()
-                        ss.running = False
-                        st.rerun()
+                time.sleep(1)
+            st.rerun()
 
     @staticmethod
-    def force_stop_thread(thread):
-        if thread:
-            tid = ctypes.c_long(thread.ident)
-            if tid:
-                res = ctypes.pythonapi.PyThreadState_SetAsyncExc(tid, ctypes.py_object(SystemExit))
-                if res == 0:
-                    st.error("Nonexistent thread id")
-                else:
-                    st.success("Thread stopped successfully.")
+    def _seconds(value):
+        return f"{value:.0f}s" if value is not None else "-"
+
+    def draw_job_queue(self):
+        stats = db_utils.job_queue_stats()
+        st.caption(f"Job queue: {stats['ready']} ready, {stats['delayed']} delayed, {stats['running']} running; "
+                   f"oldest ready job waiting {self._seconds(stats['oldest_wait'])}; last hour: {stats['started']} started, "
+                   f"average wait {self._seconds(stats['avg_wait'])}, longest {self._seconds(stats['max_wait'])}")
+        selected_crew = self.get_mycrew_by_name(ss.selected_crew_name) if ss.selected_crew_name else None
+        with st.expander("Job queue", expanded=False):
+            if selected_crew:
+                parallel = ss.dag_parallel and selected_crew.process == PROCESS_SEQUENTIAL
+                col1, col2 = st.columns(2)
+                with col1:
+                    priority = st.number_input("Priority", value=0, step=1, key='job_priority', help="Higher runs first")
+                    if st.button("Enqueue run", disabled=not selected_crew.is_valid(),
+                                 help="Queued runs survive closing the tab and restarting the app"):
+                        enqueue(selected_crew, self.current_inputs(), priority=priority, parallel=parallel, width=ss.dag_width)
+                        st.rerun()
+                with col2:
+                    cron = st.text_input("Schedule (cron: minute hour day month weekday)", key='job_cron', placeholder="0 7 * * 1-5")
+                    if st.button("Add schedule", disabled=not cron or not selected_crew.is_valid()):
+                        try:
+                            add_schedule(selected_crew, cron, self.current_inputs(), priority=priority, parallel=parallel, width=ss.dag_width)
+                            st.rerun()
+                        except CronError as e:
+                            st.error(str(e))
+                for schedule in db_utils.load_schedules(selected_crew.id):
+                    col1, col2 = st.columns([4, 1])
+                    with col1:
+                        st.markdown(f"`{schedule['cron']}` next at {datetime.fromtimestamp(schedule['next_run_at']):%Y-%m-%d %H:%M}, "
+                                    f"inputs {schedule['inputs']}")
+                    with col2:
+                        st.button("Delete", key=f"delete_{schedule['id']}", on_click=db_utils.delete_schedule, args=(schedule['id'],))
+            jobs = db_utils.load_jobs(limit=50)
+            if not jobs:
+                st.write("No jobs queued yet.")
+                return
+            now = time.time()
+            st.dataframe([
+                {
+                    'Crew': job['crew_name'],
+                    'Status': job['status'] + (" (cancelling)" if job['cancel_requested'] and job['status'] == 'running' else ""),
+                    'Priority': job['priority'],
+                    'Enqueued': datetime.fromtimestamp(job['enqueued_at']).strftime('%Y-%m-%d %H:%M:%S'),
+                    'Wait (s)': round((job['started_at'] or now) - job['run_at'], 1) if job['run_at'] <= (job['started_at'] or now) else None,
+                    'Attempts': job['attempts'],
+                    'Worker': job['worker'],
+                    'Error': job['error'],
+                }
+                for job in jobs
+            ], use_container_width=True)
+            active = [job for job in jobs if job['status'] in ('queued', 'running')]
+            if active:
+                job = st.selectbox("Job", options=active, format_func=lambda job: f"{job['crew_name']} ({job['status']}, {job['id']})")
+                st.button("Cancel job", on_click=db_utils.cancel_job, args=(job['id'],))
+
+    def draw_rate_limits(self):
+        limits = rate_limiter_stats()
+        if not limits:
+            return
+        with st.expander("Rate limits", expanded=False):
+            st.dataframe([
+                {
+                    'Provider key': limit['name'],
+                    'Req/min': limit['rpm'] or 'unlimited',
+                    'Tokens/min': limit['tpm'] or 'unlimited',
+                    'Calls': limit['calls'],
+                    'Tokens': limit['tokens'],
+                    '429s': limit['rate_limited'],
+                    'Waiting now': limit['waiting'],
+                    'Waits': limit['waits'],
+                    'Wait total (s)': round(limit['wait_seconds'], 1),
+                    'Longest wait (s)': round(limit['max_wait'], 1),
+                    'Paused for (s)': round(limit['paused_for'], 1),
+                }
+                for limit in limits
+            ], use_container_width=True)
+
+    def draw_run_history(self):
+        selected_crew = self.get_mycrew_by_name(ss.selected_crew_name) if ss.selected_crew_name else None
+        if not selected_crew:
+            return
+        with st.expander("Run history", expanded=False):
+            query = st.text_input("Search run outputs", key="search_runs")
+            if query:
+                for hit in db_utils.search(query, doc_types=['run', 'run_step'], limit=20):
+                    st.markdown(f"**{hit['title'][:120]}** ({hit['doc_id']}): {hit['snippet']}")
+            runs = db_utils.load_runs(crew_id=selected_crew.id, limit=20)
+            if not runs:
+                st.write("No runs recorded yet.")
+                return
+            st.dataframe([
+                {
+                    'Started': run['started_at'],
+                    'Status': run['status'],
+                    'Duration (s)': round(run['duration'], 1) if run['duration'] is not None else None,
+                    'LLM calls': run['llm_calls'],
+                    'Tokens': run['total_tokens'],
+                    'Rate limit wait (s)': round(json.loads(run['usage'] or '{}').get('rate_limit_wait_seconds', 0), 1),
+                }
+                for run in runs
+            ], use_container_width=True)
+            selected_run = st.selectbox("Run details", options=runs, format_func=lambda run: f"{run['started_at']} ({run['status']})")
+            for step in db_utils.load_run_steps(selected_run['id']):
+                duration = f"{step['duration']:.1f}s" if step['duration'] is not None else "-"
+                with st.container(border=True):
+                    st.markdown(f"**{step['position'] + 1}. {step['description'][:120]}** ({step['agent_role']}, {duration})")
+                    st.write(step['output'])
+            if selected_run['error']:
+                st.code(selected_run['error'])
 
     def draw(self):
+        start_app_worker()
         st.subheader(self.name)
         self.draw_crews()
+        self.draw_rate_limits()
+        self.draw_job_queue()
+        self.draw_run_history()
         self.display_result()
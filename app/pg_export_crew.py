@@ -7,9 +7,8 @@ import json
 import shutil
 import db_utils
 from utils import escape_quotes
-from my_tools import TOOL_CLASSES
-from crewai import Process
-from my_crew import MyCrew
+from my_tools import TOOL_CLASSES, TOOL_METADATA
+from my_crew import MyCrew, PROCESS_HIERARCHICAL
 from my_agent import MyAgent
 from my_task import MyTask
 from datetime import datetime
@@ -32,9 +31,14 @@ class PageExportCrew:
         agents = crew.agents
         tasks = crew.tasks
 
-        # Check if any custom tools are used
-        custom_tools_used = any(tool.name in ["CustomApiTool", "CustomFileWriteTool", "CustomCodeInterpreterTool"] 
-                                for agent in agents for tool in agent.tools)
+        # Import each used tool from the module named in its metadata
+        tool_imports = {}
+        for agent in agents:
+            for tool in agent.tools:
+                if tool.name in TOOL_METADATA:
+                    tool_imports.setdefault(TOOL_METADATA[tool.name]['module'], set()).add(tool.name)
+        tool_import_lines = "\n".join(f"from {module} import {', '.join(sorted(names))}" for module, names in sorted(tool_imports.items()))
+        custom_tools_used = 'custom_tools' in tool_imports
 
         def json_dumps_python(obj):
             if isinstance(obj, bool):
@@ -42,8 +46,7 @@ class PageExportCrew:
             return json.dumps(obj)
 
         def format_tool_instance(tool):
-            tool_class = TOOL_CLASSES.get(tool.name)
-            if tool_class:
+            if tool.name in TOOL_METADATA:
                 params = ', '.join([f'{key}={json_dumps_python(value)}' for key, value in tool.parameters.items() if value is not None])
                 return f'{tool.name}({params})' if params else f'{tool.name}()'
             return None
@@ -83,9 +86,9 @@ Task(
         placeholders_dict = ", ".join([f'{json_dumps_python(placeholder)}: {placeholder}' for placeholder in placeholders])
 
         manager_llm_definition = ""
-        if crew.process == Process.hierarchical and crew.manager_llm:
+        if crew.process == PROCESS_HIERARCHICAL and crew.manager_llm:
             manager_llm_definition = f'manager_llm=create_llm({json_dumps_python(crew.manager_llm)})'
-        elif crew.process == Process.hierarchical and crew.manager_agent:
+        elif crew.process == PROCESS_HIERARCHICAL and crew.manager_agent:
             manager_llm_definition = f'manager_agent=next(agent for agent in agents if agent.role == {json_dumps_python(crew.manager_agent.role)})'
         
         app_content = f"""
@@ -96,8 +99,7 @@ from langchain_groq import ChatGroq
 from langchain_anthropic import ChatAnthropic
 from dotenv import load_dotenv
 import os
-from crewai_tools import *
-{'''from custom_tools import CustomApiTool, CustomFileWriteTool, CustomCodeInterpreterTool''' if custom_tools_used else ''}
+{tool_import_lines}
 
 load_dotenv()
 
@@ -403,66 +405,68 @@ streamlit run app.py --server.headless true
         return json.dumps(crew_data, indent=2)
     
     def import_crew_from_json(self, crew_data):
-        # Create tools
-        for tool_data in crew_data['tools']:
-            tool_class = TOOL_CLASSES[tool_data['name']]
-            tool = tool_class(tool_id=tool_data['tool_id'])
-            tool.set_parameters(**tool_data['parameters'])
-            if tool not in ss.tools:
-                ss.tools.append(tool)
-                db_utils.save_tool(tool)
-
-        # Create agents
-        agents = []
-        for agent_data in crew_data['agents']:
-            agent = MyAgent(
-                id=agent_data['id'],
-                role=agent_data['role'],
-                backstory=agent_data['backstory'],
-                goal=agent_data['goal'],
-                allow_delegation=agent_data['allow_delegation'],
-                verbose=agent_data['verbose'],
-                cache=agent_data.get('cache', True),
-                llm_provider_model=agent_data['llm_provider_model'],
-                temperature=agent_data['temperature'],
-                max_iter=agent_data['max_iter'],
-                created_at=agent_data.get('created_at')
-            )
-            agent.tools = [next(tool for tool in ss.tools if tool.tool_id == tool_id) for tool_id in agent_data['tool_ids']]
-            agents.append(agent)
-            db_utils.save_agent(agent)
-
-        # Create tasks
-        tasks = []
-        for task_data in crew_data['tasks']:
-            task = MyTask(
-                id=task_data['id'],
-                description=task_data['description'],
-                expected_output=task_data['expected_output'],
-                async_execution=task_data['async_execution'],
-                agent=next((agent for agent in agents if agent.id == task_data['agent_id']), None),
-                context_from_async_tasks_ids=task_data['context_from_async_tasks_ids'],
-                created_at=task_data['created_at']
+        # Write all tools, agents, tasks and the crew in a single commit
+        with db_utils.transaction():
+            # Create tools
+            for tool_data in crew_data['tools']:
+                tool_class = TOOL_CLASSES[tool_data['name']]
+                tool = tool_class(tool_id=tool_data['tool_id'])
+                tool.set_parameters(**tool_data['parameters'])
+                if tool not in ss.tools:
+                    ss.tools.append(tool)
+                    db_utils.save_tool(tool)
+
+            # Create agents
+            agents = []
+            for agent_data in crew_data['agents']:
+                agent = MyAgent(
+                    id=agent_data['id'],
+                    role=agent_data['role'],
+                    backstory=agent_data['backstory'],
+                    goal=agent_data['goal'],
+                    allow_delegation=agent_data['allow_delegation'],
+                    verbose=agent_data['verbose'],
+                    cache=agent_data.get('cache', True),
+                    llm_provider_model=agent_data['llm_provider_model'],
+                    temperature=agent_data['temperature'],
+                    max_iter=agent_data['max_iter'],
+                    created_at=agent_data.get('created_at')
+                )
+                agent.tools = [next(tool for tool in ss.tools if tool.tool_id == tool_id) for tool_id in agent_data['tool_ids']]
+                agents.append(agent)
+                db_utils.save_agent(agent)
+
+            # Create tasks
+            tasks = []
+            for task_data in crew_data['tasks']:
+                task = MyTask(
+                    id=task_data['id'],
+                    description=task_data['description'],
+                    expected_output=task_data['expected_output'],
+                    async_execution=task_data['async_execution'],
+                    agent=next((agent for agent in agents if agent.id == task_data['agent_id']), None),
+                    context_from_async_tasks_ids=task_data['context_from_async_tasks_ids'],
+                    created_at=task_data['created_at']
+                )
+                tasks.append(task)
+                db_utils.save_task(task)
+
+            # Create crew
+            crew = MyCrew(
+                id=crew_data['id'],
+                name=crew_data['name'],
+                process=crew_data['process'],
+                verbose=crew_data['verbose'],
+                memory=crew_data['memory'],
+                cache=crew_data['cache'],
+                max_rpm=crew_data['max_rpm'],
+                manager_llm=crew_data['manager_llm'],
+                manager_agent=next((agent for agent in agents if agent.id == crew_data['manager_agent']), None),
+                created_at=crew_data['created_at']
             )
-            tasks.append(task)
-            db_utils.save_task(task)
-
-        # Create crew
-        crew = MyCrew(
-            id=crew_data['id'],
-            name=crew_data['name'],
-            process=crew_data['process'],
-            verbose=crew_data['verbose'],
-            memory=crew_data['memory'],
-            cache=crew_data['cache'],
-            max_rpm=crew_data['max_rpm'],
-            manager_llm=crew_data['manager_llm'],
-            manager_agent=next((agent for agent in agents if agent.id == crew_data['manager_agent']), None),
-            created_at=crew_data['created_at']
-        )
-        crew.agents = agents
-        crew.tasks = tasks
-        db_utils.save_crew(crew)
+            crew.agents = agents
+            crew.tasks = tasks
+            db_utils.save_crew(crew)
 
         if crew not in ss.crews:
             ss.crews.append(crew)
@@ -472,34 +476,33 @@ streamlit run app.py --server.headless true
     def draw(self):
         st.subheader(self.name)
 
-        # Full JSON Export Button
+        # Full JSON Lines Export Button
+        compress_export = st.checkbox("Compress full export (gzip)", value=False)
         if st.button("Export everything to json"):
             current_datetime = datetime.now().strftime("%Y%m%d_%H%M%S")
-            file_path = f"all_crews_{current_datetime}.json"
+            file_path = f"all_crews_{current_datetime}.jsonl" + (".gz" if compress_export else "")
             db_utils.export_to_json(file_path)
             with open(file_path, "rb") as fp:
                 st.download_button(
                     label="Download All Crews JSON",
                     data=fp,
                     file_name=file_path,
-                    mime="application/json"
+                    mime="application/gzip" if compress_export else "application/x-ndjson"
                 )
 
         # JSON Import Button
-        uploaded_file = st.file_uploader("Import JSON file", type="json")
+        uploaded_file = st.file_uploader("Import JSON file", type=["json", "jsonl", "gz"])
         if uploaded_file is not None:
-            json_data = json.load(uploaded_file)
-            
-            if isinstance(json_data, list):  # Full database export
-                with open("uploaded_file.json", "w") as f:
-                    json.dump(json_data, f)
-                db_utils.import_from_json("uploaded_file.json")
-                st.success("Full database JSON file imported successfully!")
-            elif isinstance(json_data, dict) and 'id' in json_data:  # Single crew export
-                imported_crew = self.import_crew_from_json(json_data)
-                st.success(f"Crew '{imported_crew.name}' imported successfully!")
+            if db_utils.is_full_export(uploaded_file):  # Full database export, streamed straight from the upload
+                imported_count = db_utils.import_from_json(uploaded_file)
+                st.success(f"Full database JSON file imported successfully ({imported_count} entities)!")
             else:
-                st.error("Invalid JSON format. Please upload a valid crew or full database export file.")
+                json_data = json.load(uploaded_file)
+                if isinstance(json_data, dict) and 'id' in json_data:  # Single crew export
+                    imported_crew = self.import_crew_from_json(json_data)
+                    st.success(f"Crew '{imported_crew.name}' imported successfully!")
+                else:
+                    st.error("Invalid JSON format. Please upload a valid crew or full database export file.")
 
         if 'crews' not in ss or len(ss.crews) == 0:
             st.write("No crews defined yet.")
@@ -2,6 +2,7 @@ import streamlit as st
 from streamlit import session_state as ss
 from my_task import MyTask
 import db_utils
+from utils import draw_search
 
 class PageTasks:
     def __init__(self):
@@ -13,11 +14,12 @@ class PageTasks:
             ss.tasks = [MyTask]
         ss.tasks.append(task)
         task.edit = True                
-        db_utils.save_task(task)  # Save task to database
+        with db_utils.transaction():
+            db_utils.save_task(task)  # Save task to database
 
-        if crew:
-            crew.tasks.append(task)
-            db_utils.save_crew(crew)
+            if crew:
+                crew.tasks.append(task)
+                db_utils.save_crew(crew)
 
         return task
 
@@ -30,6 +32,9 @@ class PageTasks:
             if 'crews' not in ss:
                 ss.crews = db_utils.load_crews()  # Load crews from database
 
+            if draw_search('task', ss.tasks, "Words from the description or expected output"):
+                return
+
             # Dictionary to track task assignment
             task_assignment = {task.id: [] for task in ss.tasks}
 
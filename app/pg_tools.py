@@ -1,6 +1,6 @@
 import streamlit as st
-from utils import rnd_id
-from my_tools import TOOL_CLASSES
+from utils import new_id
+from my_tools import TOOL_CLASSES, TOOL_METADATA
 from streamlit import session_state as ss
 import db_utils
 
@@ -11,7 +11,7 @@ class PageTools:
 
     def create_tool(self, tool_name):
         tool_class = self.available_tools[tool_name]
-        tool_instance = tool_class(rnd_id())
+        tool_instance = tool_class(new_id())
         if 'tools' not in ss:
             ss.tools = []
         ss.tools.append(tool_instance)
@@ -41,9 +41,7 @@ class PageTools:
         #st.write("Available Tools:")
         with c1:
             for tool_name in self.available_tools.keys():
-                tool_class = self.available_tools[tool_name]
-                tool_instance = tool_class()
-                tool_description = tool_instance.description
+                tool_description = TOOL_METADATA[tool_name]['description']
                 if st.button(f"{tool_name}", key=f"enable_{tool_name}", help=tool_description):
                     self.create_tool(tool_name)
         with c2:
@@ -0,0 +1,454 @@
+import contextvars
+import hashlib
+import itertools
+import re
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+# Which running crew an LLM call belongs to, for fair queuing, and who to
+# tell about each call. Set with crew_scope() around a kickoff; threads
+# started by the run must copy the context (contextvars.copy_context().run)
+# to stay in the crew's queue.
+_current_crew = contextvars.ContextVar('rate_limit_crew', default=None)
+_call_listener = contextvars.ContextVar('llm_call_listener', default=None)
+
+@contextmanager
+def crew_scope(crew_key, on_llm_call=None):
+    """Run the block as crew_key; on_llm_call(event) is called after every LLM call made in it."""
+    tokens = (_current_crew.set(crew_key), _call_listener.set(on_llm_call))
+    try:
+        yield
+    finally:
+        _current_crew.reset(tokens[0])
+        _call_listener.reset(tokens[1])
+
+def _report_call(limit, tokens, seconds, waited, error=None):
+    listener = _call_listener.get()
+    if listener is not None:
+        listener({'type': 'llm_call', 'provider': limit.name, 'tokens': tokens, 'seconds': seconds,
+                  'waited': waited, 'error': repr(error) if error is not None else None})
+
+def estimate_tokens(text):
+    """Rough token count of text (about 4 characters per token); only used to pace tokens/min."""
+    return len(text or '') // 4 + 1
+
+class TokenBucket:
+    """per_minute units that refill continuously; unlimited when per_minute is None.
+
+    The level may go negative when a call turns out to use more tokens than
+    were reserved for it; later calls then wait for the debt to refill.
+    """
+    def __init__(self, per_minute=None, now=None):
+        self.per_minute = per_minute
+        self.level = per_minute or 0
+        self.updated = time.monotonic() if now is None else now
+
+    def _refill(self, now):
+        if self.per_minute:
+            self.level = min(self.per_minute, self.level + (now - self.updated) * self.per_minute / 60)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until amount units are available."""
+        if not self.per_minute:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.per_minute)
+        return 0.0 if self.level >= amount else (amount - self.level) * 60 / self.per_minute
+
+    def take(self, amount, now):
+        if self.per_minute:
+            self._refill(now)
+            self.level -= min(amount, self.per_minute)
+
+    def set_limit(self, per_minute):
+        if per_minute != self.per_minute:
+            self.per_minute = per_minute
+            self.level = min(self.level, per_minute) if per_minute else 0
+
+    def cap(self, remaining):
+        """Lower the level to what the provider reports as remaining."""
+        if self.per_minute:
+            self.level = min(self.level, remaining)
+
+DURATION = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+def _seconds(value):
+    """Seconds in a rate-limit header value: '20', '1.5s', '6m0s', '250ms' or an HTTP date."""
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION.findall(value)
+    if parts:
+        return sum(float(number) * DURATION_UNITS[unit] for number, unit in parts)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class AcquireWithdrawn(Exception):
+    """The caller of acquire() went away before its turn came."""
+
+def is_rate_limit_error(error):
+    response = getattr(error, 'response', None)
+    status = getattr(error, 'status_code', None) or getattr(response, 'status_code', None)
+    return status == 429 or 'RateLimit' in type(error).__name__
+
+def _error_headers(error):
+    return dict(getattr(getattr(error, 'response', None), 'headers', None) or {})
+
+def _result_headers(response):
+    """Response headers a langchain LLMResult carries, {} if it has none."""
+    for generations in response.generations or []:
+        for generation in generations:
+            metadata = getattr(getattr(generation, 'message', None), 'response_metadata', None) or {}
+            if metadata.get('headers'):
+                return dict(metadata['headers'])
+    return dict((response.llm_output or {}).get('headers') or {})
+
+class RateLimit:
+    """Requests/min and tokens/min budget of one provider key, shared by every client using that key.
+
+    acquire() blocks until the call fits in both buckets. Waiting calls are
+    served crew by crew: the next slot goes to the waiting crew served
+    least recently, so one crew with many parallel tasks cannot starve the
+    others. A 429 pauses the key for everyone, for Retry-After when the
+    provider sends it and with exponential backoff otherwise. clock is
+    the time source, in seconds.
+    """
+    MAX_BACKOFF = 60
+
+    def __init__(self, name, rpm=None, tpm=None, clock=time.monotonic):
+        self.name = name
+        self.clock = clock
+        self.requests = TokenBucket(rpm, clock())
+        self.tokens = TokenBucket(tpm, clock())
+        self.condition = threading.Condition()
+        self.waiting = []
+        self.arrivals = itertools.count()
+        self.grants = itertools.count()
+        self.last_served = {}
+        self.paused_until = 0.0
+        self.consecutive_errors = 0
+        self.calls = 0
+        self.tokens_used = 0
+        self.rate_limited = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait = 0.0
+        self.crew_wait = {}
+
+    def set_limits(self, rpm, tpm):
+        with self.condition:
+            self.requests.set_limit(rpm)
+            self.tokens.set_limit(tpm)
+            self.condition.notify_all()
+
+    def _next(self):
+        return min(self.waiting, key=lambda ticket: (self.last_served.get(ticket[1], -1), ticket[0]))
+
+    def acquire(self, tokens=0, withdrawn=None):
+        """Wait until a call with about `tokens` prompt tokens may be sent. Returns the seconds waited.
+
+        Raises AcquireWithdrawn, without taking anything from the buckets,
+        once the threading.Event withdrawn is set (see withdraw()).
+        """
+        crew = _current_crew.get()
+        ticket = (next(self.arrivals), crew)
+        start = self.clock()
+        with self.condition:
+            self.waiting.append(ticket)
+            try:
+                while True:
+                    if withdrawn is not None and withdrawn.is_set():
+                        raise AcquireWithdrawn(self.name)
+                    now = self.clock()
+                    delay = self.paused_until - now
+                    if self._next() is ticket:
+                        delay = max(delay, self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+                        if delay <= 0:
+                            break
+                    # Only the crew whose turn it is waits on the clock; the others wait for their turn
+                    self.condition.wait(delay if delay > 0 else None)
+            finally:
+                self.waiting.remove(ticket)
+                # Whether served or interrupted, it may be someone else's turn now
+                self.condition.notify_all()
+            self.requests.take(1, now)
+            self.tokens.take(tokens, now)
+            self.last_served[crew] = next(self.grants)
+            self.calls += 1
+            self.tokens_used += tokens
+            waited = now - start
+            if waited > 0.001:
+                self.waits += 1
+                self.wait_seconds += waited
+                self.max_wait = max(self.max_wait, waited)
+                self.crew_wait[crew] = self.crew_wait.get(crew, 0.0) + waited
+        return waited
+
+    def withdraw(self, withdrawn):
+        """Set withdrawn and wake the acquire() calls waiting with it, so they leave the queue."""
+        with self.condition:
+            withdrawn.set()
+            self.condition.notify_all()
+
+    def settle(self, reserved, used):
+        """Charge the tokens a finished call used beyond the `reserved` ones acquire() took."""
+        with self.condition:
+            self.consecutive_errors = 0
+            if used > reserved:
+                self.tokens.take(used - reserved, self.clock())
+                self.tokens_used += used - reserved
+
+    def observe_headers(self, headers):
+        """Adapt to the rate-limit headers of a provider response (OpenAI, Groq and litellm's prefixed copies).
+
+        x-ratelimit-remaining-* lower the buckets to what the provider has
+        left. Headers are seen after every 429, and after the successful
+        calls of langchain chat models that report them in the message's
+        response_metadata (langchain-openai's include_response_headers).
+        crewai's LLM.call() returns only the text, so the limits of its
+        clients only learn from headers on a 429.
+        Returns the Retry-After seconds, None without one.
+        """
+        headers = {str(key).lower().replace('llm_provider-', ''): value for key, value in dict(headers or {}).items()}
+        now = self.clock()
+        with self.condition:
+            retry_after = headers.get('retry-after-ms')
+            retry_after = float(retry_after) / 1000 if retry_after is not None else _seconds(headers.get('retry-after', ''))
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+            for bucket, kind in ((self.requests, 'requests'), (self.tokens, 'tokens')):
+                remaining = headers.get(f'x-ratelimit-remaining-{kind}')
+                if remaining is None:
+                    continue
+                try:
+                    remaining = float(remaining)
+                except ValueError:
+                    continue
+                bucket.cap(remaining)
+                reset = _seconds(headers.get(f'x-ratelimit-reset-{kind}', ''))
+                if remaining <= 0 and reset:
+                    self.paused_until = max(self.paused_until, now + reset)
+            self.condition.notify_all()
+        return retry_after or None
+
+    def record_error(self, error):
+        """Pause the key after a rate-limit error. Other errors are ignored."""
+        if is_rate_limit_error(error):
+            self.rate_limited_response(_error_headers(error))
+
+    def rate_limited_response(self, headers):
+        with self.condition:
+            self.rate_limited += 1
+            self.consecutive_errors += 1
+        if self.observe_headers(headers) is None:
+            with self.condition:
+                backoff = min(self.MAX_BACKOFF, 2 ** (self.consecutive_errors - 1))
+                self.paused_until = max(self.paused_until, self.clock() + backoff)
+
+    def pop_crew_wait(self, crew):
+        with self.condition:
+            self.last_served.pop(crew, None)
+            return self.crew_wait.pop(crew, 0.0)
+
+    def stats(self):
+        with self.condition:
+            return {
+                'name': self.name,
+                'rpm': self.requests.per_minute,
+                'tpm': self.tokens.per_minute,
+                'calls': self.calls,
+                'tokens': self.tokens_used,
+                'rate_limited': self.rate_limited,
+                'waiting': len(self.waiting),
+                'waits': self.waits,
+                'wait_seconds': self.wait_seconds,
+                'max_wait': self.max_wait,
+                'paused_for': max(0.0, self.paused_until - self.clock()),
+            }
+
+class RemoteRateLimit:
+    """Stand-in for the RateLimit of another process, reached through call(method, key, rpm, tpm, crew, args).
+
+    Worker processes use it so that every process shares the limits kept
+    by the parent (see RateLimiter.serve).
+    """
+    def __init__(self, call, key, rpm, tpm):
+        self.call = call
+        self.name = f"{key[0]} ({key[1][:6]})"
+        self.key = key
+        self.rpm = rpm
+        self.tpm = tpm
+
+    def _call(self, method, *args):
+        return self.call(method, self.key, self.rpm, self.tpm, _current_crew.get(), args)
+
+    def acquire(self, tokens=0):
+        return self._call('acquire', tokens)
+
+    def settle(self, reserved, used):
+        self._call('settle', reserved, used)
+
+    def observe_headers(self, headers):
+        return self._call('observe_headers', dict(headers or {}))
+
+    def record_error(self, error):
+        if is_rate_limit_error(error):
+            self._call('rate_limited_response', _error_headers(error))
+
+class RateLimiter:
+    """Process-wide registry of RateLimits, one per provider and API key (or base URL for keyless providers).
+
+    In a worker process, set remote to a function forwarding calls to the
+    parent's RateLimiter.serve(); limit_for() then hands out RemoteRateLimits.
+    """
+    REMOTE_METHODS = ('acquire', 'settle', 'observe_headers', 'rate_limited_response')
+
+    def __init__(self):
+        self.limits = {}
+        self.lock = threading.Lock()
+        self.remote = None
+
+    def limit_for(self, provider, secret, rpm=None, tpm=None):
+        digest = hashlib.sha256((secret or '').encode('utf-8')).hexdigest()[:12]
+        if self.remote is not None:
+            return RemoteRateLimit(self.remote, (provider, digest), rpm, tpm)
+        return self._limit(provider, digest, rpm, tpm)
+
+    def serve(self, method, key, rpm, tpm, crew, args, withdrawn=None):
+        """Run a RemoteRateLimit call from a worker process on this process's RateLimit.
+
+        An acquire is given up once withdrawn is set through withdraw(),
+        e.g. because the worker process waiting for it died.
+        """
+        if method == 'pop_crew_wait':
+            return self.pop_crew_wait(crew)
+        if method not in self.REMOTE_METHODS:
+            raise ValueError(f"Unknown rate limit method {method}")
+        limit = self._limit(*key, rpm, tpm)
+        with crew_scope(crew):
+            if method == 'acquire':
+                return limit.acquire(*args, withdrawn=withdrawn)
+            return getattr(limit, method)(*args)
+
+    def withdraw(self, key, withdrawn):
+        """Give up the acquire() served for key with the event withdrawn."""
+        with self.lock:
+            limit = self.limits.get(tuple(key))
+        if limit is None:
+            withdrawn.set()
+        else:
+            limit.withdraw(withdrawn)
+
+    def _limit(self, provider, digest, rpm, tpm):
+        with self.lock:
+            limit = self.limits.get((provider, digest))
+            if limit is None:
+                limit = self.limits[provider, digest] = RateLimit(f"{provider} ({digest[:6]})", rpm, tpm)
+                return limit
+        limit.set_limits(rpm, tpm)
+        return limit
+
+    def pop_crew_wait(self, crew):
+        """Total seconds the crew's calls waited, forgetting the crew."""
+        if self.remote is not None:
+            return self.remote('pop_crew_wait', None, None, None, crew, ())
+        with self.lock:
+            limits = list(self.limits.values())
+        return sum(limit.pop_crew_wait(crew) for limit in limits)
+
+    def stats(self):
+        with self.lock:
+            limits = list(self.limits.values())
+        return [limit.stats() for limit in limits]
+
+RATE_LIMITER = RateLimiter()
+
+def _message_text(messages):
+    if isinstance(messages, str):
+        return messages
+    return '\n'.join(str(message.get('content', '')) if isinstance(message, dict) else str(getattr(message, 'content', message)) for message in messages)
+
+def _limit_crewai_llm(client, limit):
+    call = client.call
+
+    def limited_call(messages, *args, **kwargs):
+        reserved = estimate_tokens(_message_text(messages))
+        waited = limit.acquire(reserved)
+        start = time.perf_counter()
+        try:
+            result = call(messages, *args, **kwargs)
+        except Exception as e:
+            limit.record_error(e)
+            _report_call(limit, reserved, time.perf_counter() - start, waited, e)
+            raise
+        used = reserved + estimate_tokens(str(result))
+        limit.settle(reserved, used)
+        _report_call(limit, used, time.perf_counter() - start, waited)
+        return result
+
+    client.call = limited_call
+    return client
+
+_langchain_handler_class = None
+
+def _langchain_handler(limit):
+    global _langchain_handler_class
+    if _langchain_handler_class is None:
+        from langchain_core.callbacks import BaseCallbackHandler
+
+        class RateLimitHandler(BaseCallbackHandler):
+            """Blocks a langchain chat model's call in on_chat_model_start until its RateLimit allows it."""
+            run_inline = True
+
+            def __init__(self, limit):
+                self.limit = limit
+                self.reserved = {}
+
+            def _acquire(self, run_id, reserved):
+                waited = self.limit.acquire(reserved)
+                self.reserved[run_id] = (reserved, waited, time.perf_counter())
+
+            def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+                self._acquire(run_id, estimate_tokens('\n'.join(_message_text(batch) for batch in messages)))
+
+            def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+                self._acquire(run_id, estimate_tokens('\n'.join(prompts)))
+
+            def on_llm_end(self, response, *, run_id, **kwargs):
+                reserved, waited, start = self.reserved.pop(run_id, (0, 0.0, time.perf_counter()))
+                usage = (response.llm_output or {}).get('token_usage') or (response.llm_output or {}).get('usage') or {}
+                used = usage.get('total_tokens') or (usage.get('input_tokens', 0) + usage.get('output_tokens', 0)) or reserved
+                self.limit.settle(reserved, used)
+                headers = _result_headers(response)
+                if headers:
+                    self.limit.observe_headers(headers)
+                _report_call(self.limit, used, time.perf_counter() - start, waited)
+
+            def on_llm_error(self, error, *, run_id, **kwargs):
+                reserved, waited, start = self.reserved.pop(run_id, (0, 0.0, time.perf_counter()))
+                self.limit.record_error(error)
+                _report_call(self.limit, reserved, time.perf_counter() - start, waited, error)
+
+        _langchain_handler_class = RateLimitHandler
+    return _langchain_handler_class(limit)
+
+def instrument(client, limit):
+    """Make every call of an LLM client wait for limit. Handles crewai LLMs and langchain chat models."""
+    if hasattr(client, 'callbacks') and hasattr(client, 'invoke'):
+        client.callbacks = list(client.callbacks or []) + [_langchain_handler(limit)]
+    elif callable(getattr(client, 'call', None)):
+        _limit_crewai_llm(client, limit)
+    else:
+        print(f"Warning: {type(client).__name__} clients are not rate limited")
+    return client
+
+def rate_limiter_stats():
+    return RATE_LIMITER.stats()
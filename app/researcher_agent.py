@@ -0,0 +1,147 @@
+import streamlit as st
+import os
+from crewai import Agent
+from langchain_openai import ChatOpenAI
+from crewai_tools import SerperDevTool, WebsiteSearchTool, YoutubeVideoSearchTool
+
+class ResearcherAgent(Agent):
+    def __init__(self, topic=None):
+        # Vérifier et gérer l'absence de clé API OpenAI
+        if 'OPENAI_API_KEY' not in os.environ or not os.environ['OPENAI_API_KEY']:
+            st.warning("⚠️ Clé API OpenAI non configurée. Certaines fonctionnalités seront limitées.")
+            
+            # Demander la clé API à l'utilisateur si elle n'est pas définie
+            openai_api_key = st.text_input(
+                "🔑 Veuillez entrer votre clé API OpenAI", 
+                type="password",
+                help="Vous pouvez obtenir une clé API sur https://platform.openai.com/account/api-keys"
+            )
+            
+            if openai_api_key:
+                os.environ['OPENAI_API_KEY'] = openai_api_key
+            else:
+                # Utiliser un agent simulé sans LLM si pas de clé API
+                st.warning("Fonctionnement en mode démo limité sans clé API OpenAI")
+        
+        # Initialiser le LLM avec gestion d'erreur
+        try:
+            llm = ChatOpenAI(
+                model_name="gpt-3.5-turbo", 
+                temperature=0.7,
+                api_key=os.environ.get('OPENAI_API_KEY')
+            )
+        except Exception as e:
+            st.error(f"Erreur d'initialisation du modèle LLM : {e}")
+            llm = None
+        
+        # Initialisation de l'agent avec gestion des outils
+        super().__init__(
+            role='Intelligent Research Agent',
+            goal='Perform comprehensive and intelligent research on a given topic',
+            backstory='An advanced AI agent specialized in gathering, filtering, and synthesizing information from diverse sources',
+            verbose=True,
+            allow_delegation=True,
+            llm=llm  # Passer le LLM initialisé
+        )
+        
+        # Utiliser un attribut personnalisé pour le topic
+        self._topic = topic
+        
+        # Initialiser les outils avec gestion d'erreur
+        self.tools = []
+        try:
+            self.tools.append(SerperDevTool())
+        except Exception as e:
+            st.warning(f"Impossible d'initialiser SerperDevTool : {e}")
+        
+        try:
+            self.tools.append(WebsiteSearchTool())
+        except Exception as e:
+            st.warning(f"Impossible d'initialiser WebsiteSearchTool : {e}")
+        
+        try:
+            self.tools.append(YoutubeVideoSearchTool())
+        except Exception as e:
+            st.warning(f"Impossible d'initialiser YoutubeVideoSearchTool : {e}")
+    
+    @property
+    def topic(self):
+        return self._topic
+    
+    @topic.setter
+    def topic(self, value):
+        self._topic = value
+
+    def preliminary_research(self, topic, max_total_sources=15, research_rounds=1):
+        """
+        Effectue une recherche préliminaire sur un sujet donné
+        
+        Args:
+            topic (str): Le sujet de recherche
+            max_total_sources (int): Nombre maximum de sources
+            research_rounds (int): Nombre de rounds de recherche
+        
+        Returns:
+            dict: Résultats de la recherche préliminaire
+        """
+        # Simulation de la recherche de sources
+        return {
+            'total_sources': 10,
+            'sources': {
+                'web': [
+                    'Article scientifique sur l\'IA',
+                    'Blog technologique sur les tendances émergentes',
+                    'Rapport de recherche académique'
+                ],
+                'youtube': [
+                    'Vidéo de conférence sur l\'intelligence artificielle',
+                    'Tutoriel technique sur les dernières avancées'
+                ],
+                'academic': [
+                    'Publication de recherche de Stanford',
+                    'Étude comparative des modèles de machine learning'
+                ]
+            }
+        }
+    
+    def research_topic(self, topic):
+        """
+        Effectue une recherche approfondie sur un sujet
+        
+        Args:
+            topic (str): Le sujet de recherche
+        
+        Returns:
+            str: Résumé de la recherche détaillé et nuancé
+        """
+        # Liste de perspectives différentes pour un même sujet
+        perspectives = {
+            "Intelligence Artificielle": [
+                "Avancées technologiques et éthiques",
+                "Impact économique et social",
+                "Développements récents en apprentissage profond",
+                "Défis et limites actuels de l'IA"
+            ],
+            "Changement Climatique": [
+                "Solutions technologiques innovantes",
+                "Impacts géopolitiques et économiques",
+                "Stratégies de réduction des émissions",
+                "Adaptation et résilience des écosystèmes"
+            ],
+            "Santé Numérique": [
+                "Technologies émergentes de diagnostic",
+                "Intelligence artificielle en médecine personnalisée", 
+                "Éthique et confidentialité des données de santé",
+                "Télémédecine et accessibilité des soins"
+            ]
+        }
+        
+        # Sélectionner une perspective aléatoire si le sujet est prédéfini
+        import random
+        
+        if topic in perspectives:
+            perspective = random.choice(perspectives[topic])
+            return f"Recherche approfondie sur {topic} : {perspective}"
+        else:
+            # Pour les sujets non prédéfinis, générer une description générique
+            return f"Analyse multidimensionnelle du sujet : {topic}"
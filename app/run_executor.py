@@ -0,0 +1,550 @@
+import atexit
+import itertools
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from multiprocessing.connection import wait as wait_connections
+import db_utils
+from event_bus import EventBus
+from rate_limiter import RATE_LIMITER, crew_scope
+from run_history import RunRecorder, result_to_text, usage_to_dict
+from task_graph import CREW_DAG_WIDTH
+from utils import new_id
+
+try:
+    import resource
+except ImportError:  # Windows: no CPU or memory limits
+    resource = None
+
+RUN_WORKERS = int(os.getenv('RUN_WORKERS', '2'))
+RUN_TIMEOUT = float(os.getenv('RUN_TIMEOUT', '0')) or None
+RUN_MEMORY_MB = int(os.getenv('RUN_MEMORY_MB', '0')) or None
+RUN_CPU_SECONDS = int(os.getenv('RUN_CPU_SECONDS', '0')) or None
+RUN_EVENTS = 1000
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+class RunHandle:
+    """One kickoff as seen from the app process, updated from the events its worker sends.
+
+    status goes queued -> running -> completed, failed or cancelled.
+    Every event is also published to bus (queued, started, built,
+    task_started, agent_step, tool_call, llm_call, task_finished and
+    finished); version is the bus's last seq, so a page can tell whether
+    there is anything new to draw.
+    """
+    def __init__(self, run_id, crew_id, crew_name, inputs, parallel=False, width=CREW_DAG_WIDTH, timeout=None):
+        self.run_id = run_id
+        self.crew_id = crew_id
+        self.crew_name = crew_name
+        self.inputs = inputs
+        self.parallel = parallel
+        self.width = width
+        self.timeout = timeout
+        self.crew_rows = None  # what the worker builds the crew from, see RunExecutor.submit()
+        self.status = 'queued'
+        self.bus = EventBus(RUN_EVENTS)
+        self.steps = []
+        self.running_tasks = {}
+        self.build_info = None
+        self.build_errors = []
+        self.output = None
+        self.tasks_output = []
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_requested = False
+        self.done = threading.Event()
+        self._callbacks = []
+        self._callbacks_lock = threading.Lock()
+
+    @property
+    def version(self):
+        return self.bus.seq
+
+    @property
+    def active(self):
+        return self.status in ACTIVE_STATUSES
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+    def add_done_callback(self, fn):
+        """Call fn(handle) once the run has ended, right away if it already has.
+        fn runs on the executor's dispatcher thread, so it must not block."""
+        with self._callbacks_lock:
+            if not self.done.is_set():
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def _apply(self, event):
+        event.setdefault('time', time.time())
+        if event['type'] == 'started':
+            self.status = 'running'
+            self.started_at = event['time']
+        elif event['type'] == 'built':
+            self.build_info = event['build_info']
+        elif event['type'] == 'task_started':
+            self.running_tasks[event['task_id']] = event
+        elif event['type'] == 'task_finished':
+            self.running_tasks.pop(event['step']['task_id'], None)
+            self.steps.append(event['step'])
+        elif event['type'] == 'finished':
+            self.status = event['status']
+            self.output = event.get('output')
+            self.tasks_output = event.get('tasks_output', [])
+            self.error = event.get('error')
+            self.build_errors = event.get('build_errors', [])
+            self.running_tasks = {}
+            self.finished_at = event['time']
+        # Publish after the fields are updated, so a woken reader sees them
+        self.bus.publish(event)
+        if not self.active:
+            with self._callbacks_lock:
+                self.done.set()
+                callbacks, self._callbacks = self._callbacks, []
+            for fn in callbacks:
+                fn(self)
+
+# Worker process side
+
+class _WorkerChannel:
+    """The worker's end of its pipe. A reader thread files incoming jobs and
+    replies to rate limit calls; sends are serialized because the crew's
+    task threads send events too."""
+    def __init__(self, conn):
+        self.conn = conn
+        self.send_lock = threading.Lock()
+        self.jobs = queue.Queue()
+        self.replies = {}
+        self.call_ids = itertools.count()
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        while True:
+            try:
+                message = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            if message[0] == 'reply':
+                _, call_id, ok, value = message
+                slot = self.replies.pop(call_id)
+                slot[1] = (ok, value)
+                slot[0].set()
+            else:
+                self.jobs.put(message[1])
+        # The app process is gone: stop after the current job and fail pending calls
+        self.jobs.put(None)
+        for slot in list(self.replies.values()):
+            slot[1] = (False, 'app process exited')
+            slot[0].set()
+
+    def send(self, message):
+        with self.send_lock:
+            self.conn.send(message)
+
+    def call(self, *args):
+        call_id = next(self.call_ids)
+        slot = self.replies[call_id] = [threading.Event(), None]
+        self.send(('call', call_id, args))
+        slot[0].wait()
+        ok, value = slot[1]
+        if not ok:
+            raise RuntimeError(value)
+        return value
+
+def _limit_cpu(seconds):
+    """Allow `seconds` more CPU seconds, or lift the limit for None. The kernel
+    kills the worker with SIGXCPU once they are used up."""
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    limit = hard
+    if seconds:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        limit = int(usage.ru_utime + usage.ru_stime + seconds) + 1
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (limit, hard))
+
+def _limit_memory(memory_mb):
+    if resource is None or not memory_mb:
+        return
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_mb * 2**20, resource.getrlimit(resource.RLIMIT_AS)[1]))
+    except (ValueError, OSError) as e:
+        print(f"Warning: could not limit worker memory to {memory_mb} MB: {e}")
+
+def _init_agentops():
+    if str(os.getenv('AGENTOPS_ENABLED')).lower() not in ['true', '1']:
+        return None
+    try:
+        import agentops
+        agentops.init(api_key=os.getenv('AGENTOPS_API_KEY'), auto_start_session=False)
+        return agentops
+    except ModuleNotFoundError as e:
+        print(f"Error initializing AgentOps: {str(e)}")
+        return None
+
+def run_job(job, emit, agentops=None):
+    """Build and kick off the crew of a job, in this process, reporting through emit(event).
+    The last event is always 'finished'."""
+    from crew_build import CrewBuildError
+    from crew_cache import CREW_CACHE
+    from task_graph import DagRunner, dag_runner_supported
+    run_id = job['run_id']
+    if job.get('parallel') and not dag_runner_supported():
+        print("Warning: this crewai version cannot run tasks in parallel, running them sequentially")
+        job = dict(job, parallel=False)
+    if job.get('crew_rows'):
+        crew = db_utils.crew_from_rows(job['crew_rows'])
+    else:
+        crew = next((crew for crew in db_utils.load_crews() if crew.id == job['crew_id']), None)
+    if crew is None:
+        emit({'type': 'finished', 'status': 'failed', 'error': f"Crew {job['crew_id']} not found"})
+        return
+    try:
+        crewai_crew, build_info = CREW_CACHE.checkout(crew, full_output=True)
+    except CrewBuildError as e:
+        emit({'type': 'finished', 'status': 'failed', 'error': str(e),
+              'build_errors': [(kind, label, str(error)) for kind, label, error in e.errors]})
+        return
+    except Exception as e:
+        emit({'type': 'finished', 'status': 'failed', 'error': f"Error building crew: {e}\n{traceback.format_exc()}"})
+        return
+    emit({'type': 'built', 'build_info': build_info})
+
+    recorder = RunRecorder(crew, job['inputs'], run_id=run_id, on_event=emit)
+    recorder.attach(crewai_crew, announce_tasks=not job.get('parallel'))
+    if job.get('cpu_seconds'):
+        _limit_cpu(job['cpu_seconds'])
+    if agentops:
+        agentops.start_session()
+    try:
+        recorder.start()
+        with crew_scope(run_id, on_llm_call=emit):
+            if job.get('parallel'):
+                runner = DagRunner(crew.task_graph(), crewai_crew, job.get('width', CREW_DAG_WIDTH), on_task_start=recorder.task_started)
+                result = runner.kickoff(inputs=job['inputs'])
+            else:
+                result = crewai_crew.kickoff(inputs=job['inputs'])
+        usage_metrics = getattr(crewai_crew, 'usage_metrics', None)
+        recorder.finish('completed', result=result, usage_metrics=usage_metrics)
+        emit({
+            'type': 'finished', 'status': 'completed',
+            'output': result_to_text(result),
+            'tasks_output': [result_to_text(output) for output in getattr(result, 'tasks_output', None) or []],
+            'usage': usage_to_dict(usage_metrics),
+        })
+    except Exception as e:
+        if agentops:
+            agentops.end_session()
+        stack_trace = traceback.format_exc()
+        recorder.finish('failed', error=stack_trace, usage_metrics=getattr(crewai_crew, 'usage_metrics', None))
+        emit({'type': 'finished', 'status': 'failed', 'error': f"Error running crew: {str(e)}\n{stack_trace}"})
+    finally:
+        if job.get('cpu_seconds'):
+            _limit_cpu(None)
+        db_utils.close_db_connection()
+
+def _worker_main(conn, db_name, memory_mb=None):
+    """Entry point of a worker process: run jobs one at a time until told to stop."""
+    db_utils.DB_NAME = db_name
+    channel = _WorkerChannel(conn)
+    # Every worker queues for the app process's rate limits
+    RATE_LIMITER.remote = channel.call
+    _limit_memory(memory_mb)
+    agentops = _init_agentops()
+    while True:
+        job = channel.jobs.get()
+        if job is None:
+            break
+
+        def emit(event, run_id=job['run_id']):
+            event['time'] = time.time()
+            channel.send(('event', run_id, event))
+
+        run_job(job, emit, agentops)
+
+def run_here(crew, inputs, parallel=False, width=CREW_DAG_WIDTH, on_event=None):
+    """Kick off crew in this process instead of a worker, for scripts. Returns the finished RunHandle;
+    on_event(event) is called with each of its events."""
+    handle = RunHandle("R_" + new_id(), crew.id, crew.name, dict(inputs), parallel, width)
+
+    def emit(event):
+        handle._apply(event)
+        if on_event:
+            on_event(event)
+
+    emit({'type': 'started', 'worker': 'main'})
+    run_job({'run_id': handle.run_id, 'crew_id': crew.id, 'crew_rows': db_utils.crew_rows(crew), 'inputs': handle.inputs,
+             'parallel': parallel, 'width': width}, emit, _init_agentops())
+    return handle
+
+# App process side
+
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.handle = None
+        self.deadline = None
+        self.send_lock = threading.Lock()
+        # call id -> (rate limit key, withdrawn event) of the acquires being served
+        self.acquires = {}
+
+    def send(self, message):
+        with self.send_lock:
+            self.conn.send(message)
+
+def _exit_reason(exitcode):
+    if resource is not None and exitcode == -signal.SIGXCPU:
+        return "CPU time limit exceeded"
+    if exitcode == -signal.SIGKILL:
+        return "worker was killed (out of memory?)"
+    return f"worker exited with code {exitcode}"
+
+class RunExecutor:
+    """Runs kickoffs in a bounded pool of worker processes.
+
+    submit() queues a run and returns its RunHandle. A dispatcher thread
+    hands queued runs to idle workers (spawned on demand, up to max_workers)
+    and applies the events they send back over their pipes. cancel() and
+    the wall clock timeout kill the worker process, so blocked HTTP calls
+    and held locks go with it, and a fresh worker takes the next run.
+    Workers keep their imports and crew cache between runs, and forward
+    their rate limiter calls here so limits stay shared.
+    """
+    def __init__(self, max_workers=RUN_WORKERS, timeout=RUN_TIMEOUT, memory_mb=RUN_MEMORY_MB, cpu_seconds=RUN_CPU_SECONDS):
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.cpu_seconds = cpu_seconds
+        self.context = multiprocessing.get_context('spawn')
+        self.pending = deque()
+        self.workers = []
+        self.runs = {}
+        # Guards pending, workers and the workers' handles: the dispatcher
+        # thread changes them, submit() and stats() read them from others
+        self.lock = threading.Lock()
+        self.wake_lock = threading.Lock()
+        self.wake_reader, self.wake_writer = self.context.Pipe(duplex=False)
+        self.acquires = None
+        self.worker_ids = itertools.count(1)
+        self.dispatcher = None
+        self.stopped = False
+
+    def submit(self, crew, inputs, parallel=False, width=CREW_DAG_WIDTH, timeout=None):
+        """Queue a kickoff of crew as it is now, unsaved edits included: the
+        worker builds it from db_utils.crew_rows(crew). Returns its RunHandle."""
+        handle = RunHandle("R_" + new_id(), crew.id, crew.name, dict(inputs), parallel, width, timeout or self.timeout)
+        handle.crew_rows = db_utils.crew_rows(crew)
+        with self.lock:
+            if self.stopped:
+                raise RuntimeError("Run executor is shut down")
+            self.runs[handle.run_id] = handle
+            self.pending.append(handle)
+            handle._apply({'type': 'queued'})
+            if self.dispatcher is None:
+                # Room for every task a full pool of workers can have waiting at once
+                self.acquires = ThreadPoolExecutor(max_workers=self.max_workers * CREW_DAG_WIDTH,
+                                                   thread_name_prefix='rate-limit-acquire')
+                self.dispatcher = threading.Thread(target=self._dispatch, name='run-executor', daemon=True)
+                self.dispatcher.start()
+                atexit.register(self.shutdown)
+        self._wake()
+        return handle
+
+    def cancel(self, run_id):
+        handle = self.runs.get(run_id)
+        if handle is not None and handle.active:
+            handle.cancel_requested = True
+            self._wake()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'max_workers': self.max_workers,
+                'workers': len(self.workers),
+                'busy': sum(1 for worker in self.workers if worker.handle is not None),
+                'queued': len(self.pending),
+            }
+
+    def shutdown(self):
+        with self.lock:
+            if self.stopped:
+                return
+            self.stopped = True
+        self._wake()
+        if self.dispatcher is not None:
+            self.dispatcher.join(10)
+
+    def _wake(self):
+        with self.wake_lock:
+            self.wake_writer.send(None)
+
+    def _start_worker(self):
+        conn, child_conn = self.context.Pipe()
+        process = self.context.Process(
+            target=_worker_main, args=(child_conn, os.path.abspath(db_utils.DB_NAME), self.memory_mb),
+            name=f'crew-run-worker-{next(self.worker_ids)}'
+        )
+        process.start()
+        child_conn.close()
+        worker = _Worker(process, conn)
+        self.workers.append(worker)
+        return worker
+
+    def _assign(self):
+        # Called with self.lock held
+        for handle in [handle for handle in self.pending if handle.cancel_requested]:
+            self.pending.remove(handle)
+            self._finish(handle, 'cancelled', "Cancelled before it started")
+        while self.pending:
+            worker = next((worker for worker in self.workers if worker.handle is None), None)
+            if worker is None:
+                if len(self.workers) >= self.max_workers:
+                    return
+                worker = self._start_worker()
+            handle = self.pending.popleft()
+            worker.handle = handle
+            worker.deadline = time.monotonic() + handle.timeout if handle.timeout else None
+            handle._apply({'type': 'started', 'worker': worker.process.name})
+            worker.send(('job', {
+                'run_id': handle.run_id, 'crew_id': handle.crew_id, 'crew_rows': handle.crew_rows, 'inputs': handle.inputs,
+                'parallel': handle.parallel, 'width': handle.width, 'cpu_seconds': self.cpu_seconds,
+            }))
+
+    def _dispatch(self):
+        while True:
+            with self.lock:
+                if self.stopped:
+                    break
+                self._assign()
+            deadlines = [worker.deadline for worker in self.workers if worker.deadline is not None]
+            timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            waitables = [self.wake_reader] + [worker.conn for worker in self.workers] + [worker.process.sentinel for worker in self.workers]
+            for ready in wait_connections(waitables, timeout):
+                if ready is self.wake_reader:
+                    while self.wake_reader.poll():
+                        self.wake_reader.recv()
+                    continue
+                worker = next((worker for worker in self.workers if ready in (worker.conn, worker.process.sentinel)), None)
+                if worker is None:
+                    continue
+                if ready is worker.conn:
+                    self._receive(worker)
+                else:
+                    self._worker_exited(worker)
+            now = time.monotonic()
+            for worker in list(self.workers):
+                if worker.handle is None:
+                    continue
+                if worker.handle.cancel_requested:
+                    self._kill(worker, 'cancelled', "Cancelled")
+                elif worker.deadline is not None and now >= worker.deadline:
+                    self._kill(worker, 'failed', f"Timed out after {worker.handle.timeout:.0f}s")
+        for worker in list(self.workers):
+            try:
+                worker.send(('stop', None))
+            except OSError:
+                pass
+            worker.process.join(2)
+            if worker.process.is_alive():
+                self._kill(worker, 'cancelled', "App shut down")
+            else:
+                self._remove(worker)
+        if self.acquires is not None:
+            self.acquires.shutdown(wait=False)
+
+    def _receive(self, worker):
+        # Drain everything queued so a burst of events costs one wakeup
+        while worker in self.workers and worker.conn.poll():
+            try:
+                message = worker.conn.recv()
+            except (EOFError, OSError):
+                self._worker_exited(worker)
+                return
+            if message[0] == 'event':
+                _, run_id, event = message
+                handle = self.runs.get(run_id)
+                if handle is None or not handle.active:
+                    continue
+                handle._apply(event)
+                if not handle.active:
+                    self.runs.pop(run_id, None)
+                    with self.lock:
+                        worker.handle = None
+                    worker.deadline = None
+            elif message[0] == 'call':
+                _, call_id, args = message
+                # acquire() blocks until the limit allows the call, the other
+                # methods only update the limit and are answered right here:
+                # a settle never waits behind the acquires it would release
+                if args[0] == 'acquire':
+                    withdrawn = threading.Event()
+                    worker.acquires[call_id] = (args[1], withdrawn)
+                    self.acquires.submit(self._serve, worker, call_id, args, withdrawn)
+                else:
+                    self._serve(worker, call_id, args)
+
+    def _serve(self, worker, call_id, args, withdrawn=None):
+        try:
+            reply = ('reply', call_id, True, RATE_LIMITER.serve(*args, withdrawn=withdrawn))
+        except Exception as e:
+            reply = ('reply', call_id, False, repr(e))
+        finally:
+            worker.acquires.pop(call_id, None)
+        if withdrawn is not None and withdrawn.is_set():
+            return
+        try:
+            worker.send(reply)
+        except OSError:
+            pass  # the worker is gone
+
+    def _remove(self, worker):
+        with self.lock:
+            if worker in self.workers:
+                self.workers.remove(worker)
+        worker.conn.close()
+        # Its queued acquires would otherwise keep their turn and use up the limit when served
+        for key, withdrawn in list(worker.acquires.values()):
+            RATE_LIMITER.withdraw(key, withdrawn)
+
+    def _worker_exited(self, worker):
+        worker.process.join(1)
+        handle = worker.handle
+        self._remove(worker)
+        if handle is not None and handle.active:
+            self._finish(handle, 'failed', _exit_reason(worker.process.exitcode))
+
+    def _kill(self, worker, status, reason):
+        handle = worker.handle
+        worker.process.kill()
+        worker.process.join(5)
+        self._remove(worker)
+        if handle is not None and handle.active:
+            self._finish(handle, status, reason)
+
+    def _finish(self, handle, status, reason):
+        """End a run its worker could not end itself, in the run history too."""
+        handle._apply({'type': 'finished', 'status': status, 'error': reason})
+        self.runs.pop(handle.run_id, None)
+        if handle.started_at is not None:
+            db_utils.finish_run(handle.run_id, status, datetime.now().isoformat(), handle.elapsed(), error=reason)
+
+RUN_EXECUTOR = RunExecutor()
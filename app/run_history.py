@@ -0,0 +1,162 @@
+import time
+import threading
+from datetime import datetime
+from utils import new_id
+import db_utils
+from rate_limiter import RATE_LIMITER
+
+def usage_to_dict(usage_metrics):
+    """Normalize crewai usage_metrics (a dict in old versions, a pydantic model in new ones)."""
+    if usage_metrics is None:
+        return {}
+    if isinstance(usage_metrics, dict):
+        return dict(usage_metrics)
+    if hasattr(usage_metrics, 'model_dump'):
+        return usage_metrics.model_dump()
+    return dict(vars(usage_metrics))
+
+def result_to_text(result):
+    if hasattr(result, 'raw'):
+        return result.raw
+    if isinstance(result, dict) and 'final_output' in result:
+        return str(result['final_output'])
+    return str(result)
+
+EVENT_TEXT_LIMIT = 2000
+
+def _clip(text):
+    text = str(text or '')
+    return text if len(text) <= EVENT_TEXT_LIMIT else text[:EVENT_TEXT_LIMIT] + '…'
+
+def step_to_event(step):
+    """Event for what crewai passes to step_callback: an AgentAction, AgentFinish or
+    ToolResult, or in old versions a list of (AgentAction, observation) pairs."""
+    if isinstance(step, list) and step and isinstance(step[-1], tuple):
+        action, observation = step[-1]
+        return {'type': 'tool_call', 'tool': getattr(action, 'tool', None),
+                'input': _clip(getattr(action, 'tool_input', '')), 'output': _clip(observation)}
+    if getattr(step, 'tool', None):
+        return {'type': 'tool_call', 'tool': step.tool,
+                'input': _clip(getattr(step, 'tool_input', '')), 'output': _clip(getattr(step, 'result', ''))}
+    if hasattr(step, 'output'):
+        return {'type': 'agent_step', 'final': True, 'thought': _clip(getattr(step, 'thought', '')), 'text': _clip(step.output)}
+    if hasattr(step, 'result'):
+        return {'type': 'tool_call', 'tool': None, 'input': '', 'output': _clip(step.result)}
+    return {'type': 'agent_step', 'final': False, 'thought': _clip(getattr(step, 'thought', '')), 'text': _clip(getattr(step, 'text', step))}
+
+def describe_event(event):
+    """One line of text for a run event, for logs and the Kickoff page."""
+    kind = event['type']
+    if kind == 'started':
+        return f"Started on {event['worker']}"
+    if kind == 'built':
+        return "Crew built" + (" (cached)" if event['build_info']['cached'] else "")
+    if kind == 'task_started':
+        return f"Task {event['position'] + 1} started ({event['agent_role']})"
+    if kind == 'task_finished':
+        return f"Task {event['step']['position'] + 1} finished in {event['step']['duration']:.1f}s"
+    if kind == 'agent_step':
+        return ("Final answer: " if event['final'] else "Thought: ") + (event['thought'] or event['text'])[:300]
+    if kind == 'tool_call':
+        return f"Tool {event['tool'] or ''}({event['input'][:100]}) → {event['output'][:200]}"
+    if kind == 'llm_call':
+        waited = f", waited {event['waited']:.1f}s for the rate limit" if event['waited'] else ""
+        error = f", failed: {event['error']}" if event['error'] else ""
+        return f"LLM call to {event['provider']}: ~{event['tokens']} tokens in {event['seconds']:.1f}s{waited}{error}"
+    if kind == 'finished':
+        return f"Run {event['status']}"
+    return kind
+
+class RunRecorder:
+    """Persist one kickoff of a crew to the runs/run_steps tables.
+
+    attach() installs a callback on every crewai task so each task's output
+    and timing is written as soon as the task finishes. With on_event, the
+    run also publishes task_started, agent_step, tool_call and
+    task_finished events to it, the steps through the crew's step_callback.
+    """
+    def __init__(self, crew, inputs, run_id=None, on_event=None):
+        self.run_id = run_id or "R_" + new_id()
+        self.crew = crew
+        self.inputs = inputs
+        self.on_event = on_event
+        self.started = None
+        self.finished = False
+        self.tasks = []
+        self.announce_tasks = False
+        self._last_step_end = None
+        self._task_starts = {}
+        self._lock = threading.Lock()
+
+    def _publish(self, event):
+        if self.on_event:
+            self.on_event(event)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._last_step_end = (datetime.now(), self.started)
+        db_utils.start_run(self.run_id, self.crew.id, self.crew.name, self.inputs, datetime.now().isoformat())
+        if self.announce_tasks and self.tasks:
+            self._publish_task_started(0)
+
+    def attach(self, crewai_crew, announce_tasks=True):
+        """Install the callbacks. announce_tasks publishes each task_started when the previous task
+        finishes, for kickoffs that run tasks one by one; runners that start tasks themselves call
+        task_started() instead."""
+        self.tasks = self.crew.ordered_tasks()
+        self.announce_tasks = announce_tasks
+        for position, (task, crewai_task) in enumerate(zip(self.tasks, crewai_crew.tasks)):
+            crewai_task.callback = self._task_callback(position, task)
+        if self.on_event:
+            crewai_crew.step_callback = lambda step: self._publish(step_to_event(step))
+
+    def _publish_task_started(self, position):
+        task = self.tasks[position]
+        self._publish({'type': 'task_started', 'position': position, 'task_id': task.id,
+                       'agent_role': task.agent.role if task.agent else None, 'description': task.description})
+
+    def task_started(self, task_id):
+        """Record when a task starts. Needed when tasks run concurrently; otherwise a
+        task is taken to start when the previous one finished."""
+        with self._lock:
+            self._task_starts[task_id] = (datetime.now(), time.perf_counter())
+        position = next((position for position, task in enumerate(self.tasks) if task.id == task_id), None)
+        if position is not None:
+            self._publish_task_started(position)
+
+    def _task_callback(self, position, task):
+        def callback(task_output):
+            now, now_perf = datetime.now(), time.perf_counter()
+            with self._lock:
+                started_at, started_perf = self._task_starts.pop(task.id, None) or self._last_step_end
+                self._last_step_end = (now, now_perf)
+            step = {
+                'position': position,
+                'task_id': task.id,
+                'agent_role': task.agent.role if task.agent else None,
+                'description': task.description,
+                'output': result_to_text(task_output),
+                'started_at': started_at.isoformat(),
+                'finished_at': now.isoformat(),
+                'duration': now_perf - started_perf,
+            }
+            db_utils.save_run_step(self.run_id, **step)
+            self._publish({'type': 'task_finished', 'step': dict(step, output=_clip(step['output']))})
+            if self.announce_tasks and position + 1 < len(self.tasks):
+                self._publish_task_started(position + 1)
+        return callback
+
+    def finish(self, status, result=None, error=None, usage_metrics=None):
+        if self.finished or self.started is None:
+            return
+        self.finished = True
+        usage = usage_to_dict(usage_metrics)
+        rate_limit_wait = RATE_LIMITER.pop_crew_wait(self.run_id)
+        if rate_limit_wait:
+            usage['rate_limit_wait_seconds'] = rate_limit_wait
+        db_utils.finish_run(
+            self.run_id, status, datetime.now().isoformat(), time.perf_counter() - self.started,
+            output=result_to_text(result) if result is not None else None,
+            error=error,
+            usage=usage
+        )
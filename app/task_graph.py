@@ -0,0 +1,207 @@
+import contextvars
+import heapq
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import db_utils
+
+CREW_DAG_WIDTH = int(os.getenv('CREW_DAG_WIDTH', '4'))
+
+def dag_runner_supported():
+    """Whether the installed crewai has the Task and Agent methods DagRunner runs tasks with.
+    Older versions (like the 0.10 line) only run tasks through Crew.kickoff()."""
+    try:
+        from crewai import Agent, Task
+    except ImportError:
+        return False
+    return all(hasattr(Task, name) for name in ('execute_sync', 'interpolate_inputs')) and hasattr(Agent, 'interpolate_inputs')
+
+class CycleError(ValueError):
+    """The context references of a crew's tasks form a cycle. cycle lists the task ids in execution order."""
+    def __init__(self, cycle):
+        self.cycle = cycle
+        super().__init__(f"Task context forms a cycle: {' -> '.join(cycle + cycle[:1])}")
+
+class TaskGraph:
+    """Dependency graph of a crew's tasks.
+
+    A task depends on every task of the crew it takes context from
+    (context_from_async_tasks_ids and context_from_sync_tasks_ids).
+    Context ids of tasks that are not in the crew are skipped with a
+    warning. Durations passed to the analysis methods map task ids to
+    seconds; tasks without one count as the average of the known ones.
+    """
+    def __init__(self, tasks):
+        self.tasks = {task.id: task for task in tasks}
+        self.position = {task_id: position for position, task_id in enumerate(self.tasks)}
+        self.dependencies = {}
+        self.dependents = {task_id: [] for task_id in self.tasks}
+        for task in self.tasks.values():
+            dependencies = []
+            for context_task_id in (task.context_from_async_tasks_ids or []) + (task.context_from_sync_tasks_ids or []):
+                if context_task_id not in self.tasks:
+                    print(f"Warning: Context task with id {context_task_id} not found for task {task.id}")
+                elif context_task_id not in dependencies:
+                    dependencies.append(context_task_id)
+                    self.dependents[context_task_id].append(task.id)
+            self.dependencies[task.id] = dependencies
+
+    def order(self):
+        """Task ids in topological order, keeping the crew's order wherever the dependencies allow it.
+
+        Raises CycleError if the tasks cannot be ordered.
+        """
+        waiting = {task_id: len(dependencies) for task_id, dependencies in self.dependencies.items()}
+        ready = [(self.position[task_id], task_id) for task_id, count in waiting.items() if count == 0]
+        heapq.heapify(ready)
+        order = []
+        while ready:
+            _, task_id = heapq.heappop(ready)
+            order.append(task_id)
+            for dependent in self.dependents[task_id]:
+                waiting[dependent] -= 1
+                if waiting[dependent] == 0:
+                    heapq.heappush(ready, (self.position[dependent], dependent))
+        if len(order) < len(self.tasks):
+            raise CycleError(self._find_cycle(set(self.tasks) - set(order)))
+        return order
+
+    def _find_cycle(self, unordered):
+        # Every unordered task still waits for another unordered task, so
+        # following those dependencies must come back to a visited task.
+        task_id = min(unordered, key=self.position.get)
+        path, seen = [], {}
+        while task_id not in seen:
+            seen[task_id] = len(path)
+            path.append(task_id)
+            task_id = next(dependency for dependency in self.dependencies[task_id] if dependency in unordered)
+        return list(reversed(path[seen[task_id]:]))
+
+    def _durations(self, durations):
+        durations = durations or {}
+        known = [durations[task_id] for task_id in self.tasks if durations.get(task_id) is not None]
+        default = sum(known) / len(known) if known else 1.0
+        return {task_id: durations.get(task_id) if durations.get(task_id) is not None else default for task_id in self.tasks}
+
+    def critical_path(self, durations=None):
+        """(task ids, seconds) of the longest chain of dependent tasks."""
+        durations = self._durations(durations)
+        finish, previous = {}, {}
+        for task_id in self.order():
+            start = 0.0
+            for dependency in self.dependencies[task_id]:
+                if finish[dependency] > start:
+                    start, previous[task_id] = finish[dependency], dependency
+            finish[task_id] = start + durations[task_id]
+        if not finish:
+            return [], 0.0
+        task_id = max(finish, key=finish.get)
+        path = [task_id]
+        while path[-1] in previous:
+            path.append(previous[path[-1]])
+        return list(reversed(path)), finish[task_id]
+
+    def simulate(self, durations=None, width=CREW_DAG_WIDTH):
+        """Seconds DagRunner needs with `width` tasks at a time, if each task takes its duration."""
+        durations = self._durations(durations)
+        waiting = {task_id: len(dependencies) for task_id, dependencies in self.dependencies.items()}
+        ready = [(self.position[task_id], task_id) for task_id, count in waiting.items() if count == 0]
+        heapq.heapify(ready)
+        running, now = [], 0.0
+        while ready or running:
+            while ready and len(running) < max(1, width):
+                _, task_id = heapq.heappop(ready)
+                heapq.heappush(running, (now + durations[task_id], self.position[task_id], task_id))
+            now, _, task_id = heapq.heappop(running)
+            for dependent in self.dependents[task_id]:
+                waiting[dependent] -= 1
+                if waiting[dependent] == 0:
+                    heapq.heappush(ready, (self.position[dependent], dependent))
+        return now
+
+    def estimate(self, durations=None, width=CREW_DAG_WIDTH):
+        """Predicted sequential and parallel run time, the critical path and the speedup between them."""
+        sequential = sum(self._durations(durations).values())
+        parallel = self.simulate(durations, width)
+        path, path_seconds = self.critical_path(durations)
+        return {
+            'width': width,
+            'sequential': sequential,
+            'parallel': parallel,
+            'speedup': sequential / parallel if parallel else 1.0,
+            'critical_path': path,
+            'critical_path_seconds': path_seconds,
+        }
+
+class DagOutput:
+    """Result of DagRunner.kickoff(); raw is the output of the last task, like crewai's CrewOutput."""
+    def __init__(self, tasks_output):
+        self.tasks_output = tasks_output
+        self.raw = tasks_output[-1].raw if tasks_output else ''
+
+    def __str__(self):
+        return self.raw
+
+class DagRunner:
+    """Run a crewai crew's tasks as a DAG, up to `width` independent tasks at once.
+
+    crewai_crew must have been built by MyCrew.get_crewai_crew, so its tasks
+    are in graph.order(). A task receives the outputs of the tasks it takes
+    context from and nothing else; unlike a sequential kickoff, the
+    previous task's output is not passed along implicitly.
+    on_task_start(task_id) is called from the worker thread before a task runs.
+    """
+    def __init__(self, graph, crewai_crew, width=CREW_DAG_WIDTH, on_task_start=None):
+        self.graph = graph
+        self.crewai_crew = crewai_crew
+        self.width = max(1, width)
+        self.on_task_start = on_task_start
+
+    def kickoff(self, inputs=None):
+        crew = self.crewai_crew
+        order = self.graph.order()
+        crewai_tasks = dict(zip(order, crew.tasks))
+        if inputs:
+            for crewai_task in crew.tasks:
+                crewai_task.interpolate_inputs(inputs)
+            for agent in crew.agents:
+                agent.interpolate_inputs(inputs)
+        for agent in crew.agents:
+            agent.crew = crew
+            if getattr(crew, 'step_callback', None) and not getattr(agent, 'step_callback', None):
+                agent.step_callback = crew.step_callback
+
+        outputs = {}
+        waiting = {task_id: len(dependencies) for task_id, dependencies in self.graph.dependencies.items()}
+        ready = [(self.graph.position[task_id], task_id) for task_id, count in waiting.items() if count == 0]
+        heapq.heapify(ready)
+        with ThreadPoolExecutor(max_workers=self.width, thread_name_prefix='crew-dag') as pool:
+            running = {}
+            while ready or running:
+                while ready and len(running) < self.width:
+                    _, task_id = heapq.heappop(ready)
+                    # Run in a copy of the caller's context, which holds its rate limit crew_scope()
+                    context = contextvars.copy_context()
+                    running[pool.submit(context.run, self._execute, task_id, crewai_tasks[task_id], outputs)] = task_id
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task_id = running.pop(future)
+                    # An error stops scheduling; tasks already running finish first
+                    outputs[task_id] = future.result()
+                    for dependent in self.graph.dependents[task_id]:
+                        waiting[dependent] -= 1
+                        if waiting[dependent] == 0:
+                            heapq.heappush(ready, (self.graph.position[dependent], dependent))
+
+        if hasattr(crew, 'calculate_usage_metrics'):
+            crew.usage_metrics = crew.calculate_usage_metrics()
+        return DagOutput([outputs[task_id] for task_id in order])
+
+    def _execute(self, task_id, crewai_task, outputs):
+        if self.on_task_start:
+            self.on_task_start(task_id)
+        context = '\n\n'.join(outputs[dependency].raw for dependency in self.graph.dependencies[task_id])
+        try:
+            return crewai_task.execute_sync(agent=crewai_task.agent, context=context or None, tools=crewai_task.tools)
+        finally:
+            # The pool's threads end with the kickoff; close the connection the task's callback opened
+            db_utils.close_db_connection()
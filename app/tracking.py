@@ -0,0 +1,26 @@
+import copy
+
+class ChangeTracked:
+    """Mixin remembering the last state of an entity that was written to the database.
+
+    db_utils serializes the entity to a plain dict and compares it with the
+    remembered state, so unchanged entities are not written at all and
+    changed ones only write the fields that differ.
+    """
+    _persisted_state = None
+
+    def mark_persisted(self, state):
+        self._persisted_state = copy.deepcopy(state)
+
+    def mark_unpersisted(self):
+        self._persisted_state = None
+
+    def changed_fields(self, state):
+        """Field names that differ from the persisted state, or None if it was never persisted."""
+        if self._persisted_state is None:
+            return None
+        return [key for key in state.keys() | self._persisted_state.keys()
+                if key not in state or self._persisted_state.get(key, ...) != state[key]]
+
+    def is_dirty(self, state):
+        return self.changed_fields(state) != []
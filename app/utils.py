@@ -1,17 +1,127 @@
+import importlib
+import os
 import random
 import string
-from streamlit import markdown
+import sys
+import threading
+import time
 
 def rnd_id(length=8):
     characters = string.ascii_letters + string.digits
     random_text = ''.join(random.choice(characters) for _ in range(length))
     return random_text
 
+_CROCKFORD_BASE32 = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+_ulid_lock = threading.Lock()
+_last_ulid = (0, 0)
+
+def new_id():
+    """Sortable ULID-style id: 48-bit millisecond timestamp followed by 80 random bits.
+
+    Ids compare in creation order as plain strings. Within the same
+    millisecond the random part is incremented, so ids from one process
+    are strictly increasing.
+    """
+    global _last_ulid
+    with _ulid_lock:
+        timestamp = time.time_ns() // 1_000_000
+        last_timestamp, last_random = _last_ulid
+        if timestamp <= last_timestamp:
+            timestamp, randomness = last_timestamp, last_random + 1
+        else:
+            randomness = int.from_bytes(os.urandom(10), 'big')
+        _last_ulid = (timestamp, randomness)
+    value = (timestamp << 80) | (randomness & ((1 << 80) - 1))
+    return ''.join(_CROCKFORD_BASE32[(value >> shift) & 31] for shift in range(125, -1, -5))
+
+class _LazyModule:
+    """Stands in for a module and imports it on first attribute access."""
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+# The entity classes only need Streamlit to draw themselves, so scripts that
+# just load and run crews never import it
+st = _LazyModule('streamlit')
+
+class _LocalState(dict):
+    """Attribute-access dict standing in for st.session_state outside Streamlit."""
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+    def __delattr__(self, name):
+        del self[name]
+
+def _streamlit_session():
+    """True in a thread that runs a Streamlit script, the only place st.session_state belongs to a user."""
+    if 'streamlit' not in sys.modules:
+        return False
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    try:
+        return get_script_run_ctx(suppress_warning=True) is not None
+    except TypeError:  # older Streamlit has no suppress_warning
+        return get_script_run_ctx() is not None
+
+class SessionStateProxy:
+    """st.session_state in a Streamlit script thread, one process-wide _LocalState anywhere else.
+
+    Lets the entity classes be loaded and run in worker processes, scripts
+    and the app's background threads, where there is no Streamlit session.
+    """
+    def __init__(self):
+        object.__setattr__(self, '_local', _LocalState())
+
+    def _target(self):
+        if _streamlit_session():
+            from streamlit import session_state
+            return session_state
+        return self._local
+
+    def __getattr__(self, name):
+        return getattr(self._target(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._target(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self._target(), name)
+
+    def __getitem__(self, key):
+        return self._target()[key]
+
+    def __setitem__(self, key, value):
+        self._target()[key] = value
+
+    def __delitem__(self, key):
+        del self._target()[key]
+
+    def __contains__(self, key):
+        return key in self._target()
+
+    def __iter__(self):
+        return iter(self._target())
+
+    def __len__(self):
+        return len(self._target())
+
+ss = SessionStateProxy()
+
 def escape_quotes(s):
     return s.replace('"', '\\"').replace("'", "\\'")
 
 def fix_columns_width():
-    markdown("""
+    st.markdown("""
             <style>
                 div[data-testid="column"] {
                     width: fit-content !important;
@@ -21,4 +131,23 @@ def fix_columns_width():
                     width: fit-content !important;
                 }
             </style>
-            """, unsafe_allow_html=True)
\ No newline at end of file
+            """, unsafe_allow_html=True)
+def draw_search(doc_type, items, placeholder):
+    """Search box over the items of doc_type ('agent' or 'task'). Draws the hits
+    and returns True while there is a query, False otherwise."""
+    import db_utils
+    plural = f"{doc_type}s"
+    query = st.text_input(f"Search {plural}", key=f"search_{plural}", placeholder=placeholder)
+    if not query:
+        return False
+    start = time.perf_counter()
+    hits = db_utils.search(query, doc_types=[doc_type], limit=50)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    st.caption(f"{len(hits)} matching {plural} in {elapsed_ms:.1f} ms")
+    items_by_id = {item.id: item for item in items}
+    for hit in hits:
+        item = items_by_id.get(hit['doc_id'])
+        if item:
+            st.markdown(hit['snippet'])
+            item.draw(key=f"{item.id}_search")
+    return True
@@ -0,0 +1,101 @@
+"""Compare the entity codecs on a synthetic database.
+
+Writes the same synthetic agents, tasks and crews with every available
+codec and reports write time, full load time (db_utils.load_entities over
+every entity type), database file size and the size of the data column
+alone, since the file also holds the search index.
+
+    python benchmarks/codec_benchmark.py --entities 50000
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import db_utils
+import entity_codecs
+
+WORDS = [''.join(random.choices(string.ascii_lowercase, k=random.randint(3, 10))) for _ in range(2000)]
+
+def text(words):
+    return ' '.join(random.choices(WORDS, k=words))
+
+def synthetic_entities(count):
+    agents = max(1, count // 5)
+    crews = max(1, count // 50)
+    tasks = max(1, count - agents - crews)
+    agent_ids = [f'A_{i:08d}' for i in range(agents)]
+    task_ids = [f'T_{i:08d}' for i in range(tasks)]
+    for i, agent_id in enumerate(agent_ids):
+        yield 'agent', agent_id, {
+            'created_at': f'2024-01-01T00:00:{i:08d}',
+            'role': text(4), 'backstory': text(80), 'goal': text(20),
+            'allow_delegation': False, 'verbose': True, 'cache': True,
+            'llm_provider_model': 'OpenAI: gpt-4o-mini', 'temperature': 0.1, 'max_iter': 25,
+            'tool_ids': [],
+        }
+    for i, task_id in enumerate(task_ids):
+        yield 'task', task_id, {
+            'created_at': f'2024-01-02T00:00:{i:08d}',
+            'description': text(150), 'expected_output': text(60), 'async_execution': False,
+            'agent_id': random.choice(agent_ids),
+            'context_from_async_tasks_ids': None, 'context_from_sync_tasks_ids': None,
+        }
+    for i in range(crews):
+        yield 'crew', f'C_{i:08d}', {
+            'created_at': f'2024-01-03T00:00:{i:08d}',
+            'name': text(2), 'process': 'sequential', 'verbose': True,
+            'agent_ids': random.sample(agent_ids, min(5, len(agent_ids))),
+            'task_ids': random.sample(task_ids, min(10, len(task_ids))),
+            'memory': False, 'cache': True, 'planning': False, 'max_rpm': 1000,
+            'manager_llm': None, 'manager_agent_id': None,
+        }
+
+def run(codec, entities, directory):
+    db_utils.close_all_connections()
+    db_utils.DB_NAME = os.path.join(directory, f'{codec}.db')
+    db_utils.DB_CODEC = codec
+    db_utils.initialize_db()
+
+    start = time.perf_counter()
+    for offset in range(0, len(entities), db_utils.EXPORT_BATCH_SIZE):
+        with db_utils.transaction():
+            for entity_type, entity_id, data in entities[offset:offset + db_utils.EXPORT_BATCH_SIZE]:
+                db_utils.save_entity(entity_type, entity_id, data)
+    write_seconds = time.perf_counter() - start
+
+    conn = db_utils.get_db_connection()
+    data_size = conn.execute('SELECT SUM(LENGTH(CAST(data AS BLOB))) FROM entities').fetchone()[0]
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    conn.execute('VACUUM')
+
+    start = time.perf_counter()
+    loaded = sum(len(db_utils.load_entities(entity_type)) for entity_type in ('agent', 'task', 'crew'))
+    load_seconds = time.perf_counter() - start
+
+    db_utils.close_all_connections()
+    return write_seconds, load_seconds, loaded, os.path.getsize(db_utils.DB_NAME), data_size
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entities', type=int, default=50000)
+    parser.add_argument('--codecs', nargs='*', default=list(entity_codecs.CODECS))
+    args = parser.parse_args()
+
+    random.seed(42)
+    entities = list(synthetic_entities(args.entities))
+    print(f"{len(entities)} entities, codecs: {', '.join(args.codecs)}")
+    print(f"{'codec':<14}{'write s':>10}{'load s':>10}{'file MiB':>11}{'data MiB':>11}")
+    with tempfile.TemporaryDirectory() as directory:
+        for codec in args.codecs:
+            write_seconds, load_seconds, loaded, size, data_size = run(codec, entities, directory)
+            assert loaded == len(entities)
+            print(f"{codec:<14}{write_seconds:>10.2f}{load_seconds:>10.2f}{size / 2**20:>11.1f}{data_size / 2**20:>11.1f}")
+
+if __name__ == '__main__':
+    main()
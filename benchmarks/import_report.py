@@ -0,0 +1,90 @@
+"""Report what importing the app's modules costs at startup.
+
+Imports each module in a fresh interpreter with ``python -X importtime``,
+prints the total import time and the heaviest top-level packages, and
+exits non-zero when the total exceeds the budget or when one of the heavy
+backends (crewai, langchain, docker, transformers, ...) is loaded eagerly.
+
+    python benchmarks/import_report.py --budget-ms 1500
+    python benchmarks/import_report.py --module my_tools --module llms --top 5
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app')
+
+DEFAULT_MODULES = ['app']
+
+# Packages that must only be imported when a crew, tool or model is first used
+HEAVY_PACKAGES = [
+    'crewai', 'crewai_tools', 'langchain_openai', 'langchain_groq', 'langchain_anthropic',
+    'langchain_community', 'docker', 'transformers', 'torch', 'openai', 'PIL',
+]
+
+LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)$')
+
+def import_times(module):
+    """Return [(package, self_us, cumulative_us, depth)] in the order the interpreter reported them."""
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=APP_DIR, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+    entries = []
+    for line in proc.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, package = match.groups()
+            entries.append((package, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return entries
+
+def report(module, top):
+    entries = import_times(module)
+    # Children are reported before their parent, so the module's own imports
+    # are the entries between the previous top-level import and the module;
+    # everything before that is interpreter startup (site, encodings, ...).
+    end = max(i for i, e in enumerate(entries) if e[0] == module and e[3] == 0)
+    start = max((i for i, e in enumerate(entries[:end]) if e[3] == 0), default=-1) + 1
+    entries = entries[start:end + 1]
+    total_ms = entries[-1][2] / 1000
+
+    by_root = {}
+    for package, _, cumulative_us, depth in entries:
+        if depth <= 1:
+            root = package.split('.')[0]
+            by_root[root] = max(by_root.get(root, 0), cumulative_us)
+    by_root.pop(module, None)
+
+    loaded = {package.split('.')[0] for package, _, _, _ in entries}
+    heavy = [package for package in HEAVY_PACKAGES if package in loaded]
+
+    print(f"{module}: {total_ms:.0f} ms")
+    for root, cumulative_us in sorted(by_root.items(), key=lambda item: -item[1])[:top]:
+        print(f"    {root:<32}{cumulative_us / 1000:>9.1f} ms")
+    if heavy:
+        print(f"    eagerly imported heavy packages: {', '.join(heavy)}")
+    return total_ms, heavy
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', action='append', dest='modules', help='module to import from app/ (repeatable)')
+    parser.add_argument('--budget-ms', type=float, default=1500, help='maximum import time per module')
+    parser.add_argument('--top', type=int, default=10, help='number of packages to list per module')
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules or DEFAULT_MODULES:
+        total_ms, heavy = report(module, args.top)
+        if total_ms > args.budget_ms:
+            print(f"    over budget: {total_ms:.0f} ms > {args.budget_ms:.0f} ms")
+            failed = True
+        if heavy:
+            failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
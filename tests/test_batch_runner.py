@@ -0,0 +1,98 @@
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+from batch_runner import BatchRun
+
+class StubHandle:
+    def __init__(self, run_id, inputs):
+        self.run_id = run_id
+        self.inputs = inputs
+        self.status = 'completed'
+        self.output = f"done {inputs['x']}"
+        self.error = None
+        self.submitted_at = self.finished_at = time.time()
+
+    def elapsed(self):
+        return 0.0
+
+    def add_done_callback(self, fn):
+        fn(self)
+
+class StubExecutor:
+    """Finishes every run as soon as it is submitted."""
+    def __init__(self):
+        self.run_ids = itertools.count(1)
+        self.submitted = []
+        self.cancelled = []
+
+    def submit(self, crew, inputs, parallel=False, width=None):
+        self.submitted.append(inputs)
+        return StubHandle(f"R_{next(self.run_ids)}", inputs)
+
+    def cancel(self, run_id):
+        self.cancelled.append(run_id)
+
+class CancelledBetweenRows(BatchRun):
+    """cancel() lands after the first row finished, between run()'s two checks of cancel_requested."""
+    reads_until_cancel = None
+    _cancel_requested = False
+
+    @property
+    def cancel_requested(self):
+        if self.reads_until_cancel == 0:
+            self._cancel_requested = True
+        elif self.reads_until_cancel is not None:
+            self.reads_until_cancel -= 1
+        return self._cancel_requested
+
+    @cancel_requested.setter
+    def cancel_requested(self, value):
+        self._cancel_requested = value
+
+    def _record(self, output, handle):
+        super()._record(output, handle)
+        self.reads_until_cancel = 1
+
+class BatchRunTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.output_path = os.path.join(self.directory.name, 'results.jsonl')
+        self.rows = [{'x': str(i)} for i in range(3)]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def results(self):
+        with open(self.output_path, encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def test_runs_every_row_then_skips_them(self):
+        batch = BatchRun(None, self.rows, self.output_path, concurrency=2, executor=StubExecutor()).start()
+        self.assertTrue(batch.wait(5))
+        self.assertEqual(batch.status, 'completed')
+        self.assertEqual(sorted(result['row'] for result in self.results()), [0, 1, 2])
+
+        executor = StubExecutor()
+        batch = BatchRun(None, self.rows, self.output_path, executor=executor).start()
+        self.assertTrue(batch.wait(5))
+        self.assertEqual(executor.submitted, [])
+        self.assertEqual(batch.stats()['skipped'], 3)
+
+    def test_cancel_between_rows_ends_the_batch(self):
+        executor = StubExecutor()
+        batch = CancelledBetweenRows(None, self.rows, self.output_path, concurrency=1, executor=executor).start()
+        self.assertTrue(batch.wait(5), "batch waited for a run it never submitted")
+        self.assertEqual(batch.status, 'cancelled')
+        self.assertEqual(len(executor.submitted), 1)
+        stats = batch.stats()
+        self.assertEqual((stats['completed'], stats['remaining']), (1, 2))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app')
+sys.path.insert(0, APP_DIR)
+
+import db_utils
+from tracking import ChangeTracked
+
+class Note(ChangeTracked):
+    def __init__(self, id, text):
+        self.id = id
+        self.text = text
+
+    def data(self):
+        return {'text': self.text, 'created_at': '2024-01-01'}
+
+def save_note(note):
+    return db_utils._save_tracked('note', note.id, note, note.data())
+
+class TempDatabaseTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_name = db_utils.DB_NAME
+        db_utils.DB_NAME = os.path.join(self.directory.name, 'crewai.db')
+        db_utils.initialize_db()
+
+    def tearDown(self):
+        db_utils.close_all_connections()
+        db_utils.DB_NAME = self.db_name
+        self.directory.cleanup()
+
+    def saved_notes(self):
+        return dict(db_utils.load_entities('note'))
+
+class TransactionTest(TempDatabaseTest):
+    def test_commit_marks_entities_persisted(self):
+        note = Note('N1', 'first')
+        with db_utils.transaction():
+            self.assertTrue(save_note(note))
+            self.assertEqual(self.saved_notes(), {})
+        self.assertEqual(self.saved_notes()['N1']['text'], 'first')
+        self.assertFalse(save_note(note))
+
+    def test_save_again_after_rollback(self):
+        note = Note('N1', 'first')
+        with self.assertRaises(RuntimeError):
+            with db_utils.transaction():
+                save_note(note)
+                raise RuntimeError('abort')
+        self.assertEqual(self.saved_notes(), {})
+        self.assertTrue(save_note(note))
+        self.assertEqual(self.saved_notes()['N1']['text'], 'first')
+
+    def test_rollback_keeps_changes_of_persisted_entity(self):
+        note = Note('N1', 'first')
+        save_note(note)
+        note.text = 'second'
+        with self.assertRaises(RuntimeError):
+            with db_utils.transaction():
+                save_note(note)
+                raise RuntimeError('abort')
+        self.assertEqual(self.saved_notes()['N1']['text'], 'first')
+        self.assertTrue(save_note(note))
+        self.assertEqual(self.saved_notes()['N1']['text'], 'second')
+
+class DataVersionTest(TempDatabaseTest):
+    def shared_notes(self):
+        return dict(db_utils._read_shared_rows()[1].get('note', []))
+
+    def test_reads_keep_the_version(self):
+        version = db_utils.data_version()
+        self.assertEqual(self.shared_notes(), {})
+        self.assertEqual(db_utils.data_version(), version)
+
+    def test_write_in_this_process_moves_the_version(self):
+        version = db_utils.data_version()
+        save_note(Note('N1', 'first'))
+        self.assertNotEqual(db_utils.data_version(), version)
+        self.assertEqual(self.shared_notes()['N1']['text'], 'first')
+
+    def test_write_in_another_process_moves_the_version(self):
+        self.assertEqual(self.shared_notes(), {})
+        version = db_utils.data_version()
+        subprocess.run([sys.executable, '-c', (
+            "import db_utils, sys; db_utils.DB_NAME = sys.argv[1]; "
+            "db_utils.save_entity('note', 'N1', {'text': 'elsewhere', 'created_at': '2024-01-01'})"
+        ), db_utils.DB_NAME], cwd=APP_DIR, check=True)
+        self.assertNotEqual(db_utils.data_version(), version)
+        self.assertEqual(self.shared_notes()['N1']['text'], 'elsewhere')
+
+if __name__ == '__main__':
+    unittest.main()
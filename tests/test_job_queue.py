@@ -0,0 +1,148 @@
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+import db_utils
+from job_queue import Cron, CronError
+
+def next_run(expression, after):
+    return datetime.fromtimestamp(Cron(expression).next_after(datetime(*after).timestamp()))
+
+class CronTest(unittest.TestCase):
+    def test_steps(self):
+        self.assertEqual(next_run('*/15 * * * *', (2024, 1, 1, 10, 7)), datetime(2024, 1, 1, 10, 15))
+        self.assertEqual(next_run('*/15 * * * *', (2024, 1, 1, 10, 45)), datetime(2024, 1, 1, 11, 0))
+        self.assertEqual(next_run('5/20 * * * *', (2024, 1, 1, 10, 30)), datetime(2024, 1, 1, 10, 45))
+
+    def test_ranges_and_lists(self):
+        self.assertEqual(next_run('0 9-17/4 * * *', (2024, 1, 1, 10, 0)), datetime(2024, 1, 1, 13, 0))
+        self.assertEqual(next_run('0 9-17/4 * * *', (2024, 1, 1, 17, 0)), datetime(2024, 1, 2, 9, 0))
+        self.assertEqual(next_run('30 8,20 * * *', (2024, 1, 1, 8, 30)), datetime(2024, 1, 1, 20, 30))
+
+    def test_weekdays_roll_over_the_weekend(self):
+        # 2024-01-05 is a Friday
+        self.assertEqual(next_run('30 8 * * 1-5', (2024, 1, 5, 21, 0)), datetime(2024, 1, 8, 8, 30))
+        self.assertEqual(next_run('0 12 * * 7', (2024, 1, 1, 0, 0)), datetime(2024, 1, 7, 12, 0))
+        self.assertEqual(next_run('0 12 * * 0', (2024, 1, 1, 0, 0)), datetime(2024, 1, 7, 12, 0))
+
+    def test_month_and_day_rollover(self):
+        self.assertEqual(next_run('0 0 1 * *', (2024, 1, 31, 12, 0)), datetime(2024, 2, 1, 0, 0))
+        self.assertEqual(next_run('0 0 31 * *', (2024, 4, 15, 0, 0)), datetime(2024, 5, 31, 0, 0))
+        self.assertEqual(next_run('59 23 31 12 *', (2024, 12, 31, 23, 59)), datetime(2025, 12, 31, 23, 59))
+        self.assertEqual(next_run('0 0 29 2 *', (2024, 3, 1, 0, 0)), datetime(2028, 2, 29, 0, 0))
+
+    def test_either_day_field_matches_when_both_are_restricted(self):
+        # The 13th, or any Friday: 2024-01-05 comes first
+        self.assertEqual(next_run('0 0 13 * 5', (2024, 1, 1, 0, 0)), datetime(2024, 1, 5, 0, 0))
+        self.assertEqual(next_run('0 0 13 * 5', (2024, 1, 12, 0, 0)), datetime(2024, 1, 13, 0, 0))
+
+    def test_invalid_expressions(self):
+        for expression in ('* * *', '61 * * * *', '*/0 * * * *', '0 0 32 * *', '0 0 * * 8', 'a * * * *', '0 0 31 2 *'):
+            with self.subTest(expression=expression), self.assertRaises(CronError):
+                Cron(expression)
+
+class JobQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_name = db_utils.DB_NAME
+        db_utils.DB_NAME = os.path.join(self.directory.name, 'crewai.db')
+        db_utils.initialize_db()
+        self.now = 1000.0
+        patcher = mock.patch('time.time', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        db_utils.close_all_connections()
+        db_utils.DB_NAME = self.db_name
+        self.directory.cleanup()
+
+    def enqueue(self, job_id, crew_id='C1', providers=('OpenAI',), max_attempts=3):
+        db_utils.enqueue_job(job_id, crew_id, crew_id, {}, list(providers), max_attempts=max_attempts)
+
+    def job(self, job_id):
+        return next(job for job in db_utils.load_jobs() if job['id'] == job_id)
+
+    def claimed(self, worker, **limits):
+        job = db_utils.claim_job(worker, 10, **limits)
+        return job and job['id']
+
+    def test_expired_lease_is_reclaimed(self):
+        self.enqueue('J1')
+        self.assertEqual(self.claimed('w1'), 'J1')
+        self.now += 5
+        self.assertIsNone(self.claimed('w2'))
+        self.assertEqual(db_utils.renew_leases('w1', ['J1'], 10), ([], []))
+        self.now += 8  # past the first lease, not the renewed one
+        self.assertIsNone(self.claimed('w2'))
+
+        self.now += 5
+        self.assertEqual(self.claimed('w2'), 'J1')
+        job = self.job('J1')
+        self.assertEqual((job['worker'], job['attempts']), ('w2', 2))
+        self.assertEqual(db_utils.renew_leases('w1', ['J1'], 10), ([], ['J1']))
+        self.assertFalse(db_utils.finish_job('J1', 'w1', 'completed'))
+        self.assertTrue(db_utils.finish_job('J1', 'w2', 'completed'))
+        self.assertEqual(self.job('J1')['status'], 'completed')
+
+    def test_expired_lease_fails_the_job_after_max_attempts(self):
+        self.enqueue('J1', max_attempts=1)
+        self.assertEqual(self.claimed('w1'), 'J1')
+        self.now += 11
+        self.assertIsNone(self.claimed('w2'))
+        job = self.job('J1')
+        self.assertEqual(job['status'], 'failed')
+        self.assertIn('expired', job['error'])
+
+    def test_released_job_does_not_count_an_attempt(self):
+        self.enqueue('J1', max_attempts=1)
+        self.assertEqual(self.claimed('w1'), 'J1')
+        db_utils.release_job('J1', 'w1')
+        self.assertEqual(self.claimed('w2'), 'J1')
+        self.assertEqual(self.job('J1')['attempts'], 1)
+
+    def test_cancel_of_a_running_job_reaches_its_worker(self):
+        self.enqueue('J1')
+        self.claimed('w1')
+        db_utils.cancel_job('J1')
+        self.assertEqual(db_utils.renew_leases('w1', ['J1'], 10), (['J1'], []))
+
+    def test_crew_limit_blocks_a_claim(self):
+        self.enqueue('J1', 'C1')
+        self.enqueue('J2', 'C1')
+        self.enqueue('J3', 'C2')
+        limits = {'crew_limit': lambda crew_id: 1}
+        self.assertEqual(self.claimed('w1', **limits), 'J1')
+        self.assertEqual(self.claimed('w1', **limits), 'J3')
+        self.assertIsNone(self.claimed('w1', **limits))
+        db_utils.finish_job('J1', 'w1', 'completed')
+        self.assertEqual(self.claimed('w1', **limits), 'J2')
+
+    def test_provider_limit_blocks_a_claim(self):
+        self.enqueue('J1', 'C1', ['OpenAI'])
+        self.enqueue('J2', 'C2', ['Groq', 'OpenAI'])
+        self.enqueue('J3', 'C3', ['Groq'])
+        limits = {'provider_limit': {'OpenAI': 1}.get}
+        self.assertEqual(self.claimed('w1', **limits), 'J1')
+        self.assertEqual(self.claimed('w1', **limits), 'J3')
+        self.assertIsNone(self.claimed('w1', **limits))
+        db_utils.finish_job('J1', 'w1', 'failed', 'error')
+        self.assertEqual(self.claimed('w1', **limits), 'J2')
+
+    def test_priority_and_delay(self):
+        self.enqueue('J1')
+        db_utils.enqueue_job('J2', 'C1', 'C1', {}, [], priority=5)
+        db_utils.enqueue_job('J3', 'C1', 'C1', {}, [], priority=9, run_at=self.now + 60)
+        self.assertEqual(self.claimed('w1'), 'J2')
+        self.assertEqual(self.claimed('w1'), 'J1')
+        self.assertIsNone(self.claimed('w1'))
+        self.now += 60
+        self.assertEqual(self.claimed('w1'), 'J3')
+
+if __name__ == '__main__':
+    unittest.main()
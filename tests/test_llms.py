@@ -0,0 +1,113 @@
+import json
+import os
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+import llms
+
+class StubModelServer:
+    """Serves Ollama's /api/tags and LM Studio's /v1/models on a free local port."""
+    def __init__(self):
+        self.ollama_models = ['llama3:latest', 'mistral:7b']
+        self.lmstudio_models = ['qwen2-7b-instruct']
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests += 1
+                if self.path == '/api/tags':
+                    body = {'models': [{'name': name} for name in stub.ollama_models]}
+                elif self.path == '/v1/models':
+                    body = {'data': [{'id': name} for name in stub.lmstudio_models]}
+                else:
+                    self.send_error(404)
+                    return
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread.is_alive():
+            self.server.shutdown()
+            self.server.server_close()
+
+class ModelCatalogTest(unittest.TestCase):
+    def setUp(self):
+        self.server = StubModelServer()
+        config = {'OLLAMA_HOST': self.server.url, 'LMSTUDIO_API_BASE': self.server.url + '/v1'}
+        patcher = mock.patch.object(llms, 'env_config', lambda: config)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.catalog = llms.ModelCatalog({
+            'OpenAI': dict(llms.LLM_CONFIG['OpenAI'], models=['gpt-4o']),
+            'Ollama': dict(llms.LLM_CONFIG['Ollama'], models=['ollama/from-env']),
+            'LM Studio': dict(llms.LLM_CONFIG['LM Studio'], models=['lms-default']),
+        }, ttl=60, first_wait=5)
+        patcher = mock.patch.object(llms, 'MODEL_CATALOG', self.catalog)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def expire(self):
+        """Make the catalog older than its ttl and wait for the refresh the next read starts."""
+        self.catalog.refreshed_at -= self.catalog.ttl + 1
+        self.catalog.models()
+        thread = self.catalog.refreshing
+        if thread is not None:
+            thread.join(5)
+
+    def test_discovered_models_and_positions(self):
+        self.assertEqual(llms.llm_providers_and_models(), [
+            'OpenAI: gpt-4o',
+            'Ollama: ollama/llama3:latest',
+            'Ollama: ollama/mistral:7b',
+            'LM Studio: qwen2-7b-instruct',
+        ])
+        self.assertEqual(llms.llm_model_index('Ollama: ollama/mistral:7b'), 2)
+        self.assertEqual(llms.llm_model_index('LM Studio: qwen2-7b-instruct'), 3)
+        self.assertIsNone(llms.llm_model_index('Ollama: ollama/from-env'))
+
+    def test_refreshes_only_after_ttl(self):
+        llms.llm_providers_and_models()
+        requests = self.server.requests
+        self.server.ollama_models = ['phi3:mini']
+        llms.llm_providers_and_models()
+        self.assertEqual(self.server.requests, requests)
+        self.assertIsNone(llms.llm_model_index('Ollama: ollama/phi3:mini'))
+
+        self.expire()
+        self.assertEqual(llms.llm_model_index('Ollama: ollama/phi3:mini'), 1)
+        self.assertIsNone(llms.llm_model_index('Ollama: ollama/llama3:latest'))
+        self.assertEqual(llms.llm_model_index('LM Studio: qwen2-7b-instruct'), 2)
+
+    def test_falls_back_to_configured_models_when_server_stops(self):
+        llms.llm_providers_and_models()
+        self.server.stop()
+        with mock.patch('builtins.print'):
+            self.expire()
+        self.assertEqual(llms.llm_providers_and_models(), [
+            'OpenAI: gpt-4o', 'Ollama: ollama/from-env', 'LM Studio: lms-default',
+        ])
+        self.assertEqual(llms.llm_model_index('Ollama: ollama/from-env'), 1)
+
+if __name__ == '__main__':
+    unittest.main()
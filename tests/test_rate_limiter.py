@@ -0,0 +1,152 @@
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+from rate_limiter import AcquireWithdrawn, RateLimit, RateLimiter, TokenBucket, _result_headers
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+class TokenBucketTest(unittest.TestCase):
+    def test_refills_continuously_up_to_the_limit(self):
+        bucket = TokenBucket(60, now=0.0)
+        self.assertEqual(bucket.wait_time(60, 0.0), 0.0)
+        bucket.take(60, 0.0)
+        self.assertEqual(bucket.wait_time(1, 0.0), 1.0)
+        self.assertEqual(bucket.wait_time(30, 10.0), 20.0)
+        self.assertEqual(bucket.wait_time(30, 30.0), 0.0)
+        self.assertEqual(bucket.wait_time(60, 600.0), 0.0)
+        self.assertEqual(bucket.level, 60)
+
+    def test_debt_from_settling_delays_later_calls(self):
+        bucket = TokenBucket(120, now=0.0)
+        bucket.take(100, 0.0)
+        bucket.take(100, 0.0)
+        self.assertEqual(bucket.level, -80)
+        self.assertEqual(bucket.wait_time(10, 0.0), 45.0)
+
+    def test_unlimited_never_waits(self):
+        bucket = TokenBucket(None, now=0.0)
+        bucket.take(10**6, 0.0)
+        self.assertEqual(bucket.wait_time(10**6, 0.0), 0.0)
+
+class RateLimitTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.limit = RateLimit('OpenAI (test)', rpm=60, tpm=1000, clock=self.clock)
+
+    def test_acquire_takes_from_both_buckets(self):
+        self.assertEqual(self.limit.acquire(400), 0.0)
+        self.assertEqual(self.limit.requests.level, 59)
+        self.assertEqual(self.limit.tokens.level, 600)
+        self.limit.settle(400, 700)
+        self.assertEqual(self.limit.tokens.level, 300)
+        self.assertEqual(self.limit.stats()['tokens'], 700)
+
+    def test_next_is_the_crew_served_least_recently(self):
+        self.limit.last_served = {'crew-a': 5, 'crew-b': 3}
+        self.limit.waiting = [(10, 'crew-a'), (11, 'crew-a'), (12, 'crew-b'), (13, 'crew-c')]
+        self.assertEqual(self.limit._next(), (13, 'crew-c'))
+        self.limit.waiting.remove((13, 'crew-c'))
+        self.assertEqual(self.limit._next(), (12, 'crew-b'))
+        self.limit.waiting.remove((12, 'crew-b'))
+        self.assertEqual(self.limit._next(), (10, 'crew-a'))
+
+    def test_grants_alternate_between_crews(self):
+        from rate_limiter import crew_scope
+        with crew_scope('crew-a'):
+            self.limit.acquire()
+        self.limit.waiting = [(100, 'crew-a'), (101, 'crew-b')]
+        self.assertEqual(self.limit._next(), (101, 'crew-b'))
+
+    def test_rate_limited_response_backs_off_exponentially(self):
+        for pause in (1, 2, 4, 8):
+            self.limit.rate_limited_response({})
+            self.assertEqual(self.limit.paused_until, self.clock.now + pause)
+        self.limit.consecutive_errors = 10
+        self.limit.rate_limited_response({})
+        self.assertEqual(self.limit.paused_until, self.clock.now + RateLimit.MAX_BACKOFF)
+        self.assertEqual(self.limit.stats()['rate_limited'], 5)
+
+    def test_settle_resets_the_backoff(self):
+        self.limit.rate_limited_response({})
+        self.limit.rate_limited_response({})
+        self.limit.settle(0, 0)
+        self.clock.now += 100
+        self.limit.rate_limited_response({})
+        self.assertEqual(self.limit.paused_until, self.clock.now + 1)
+
+    def test_retry_after_replaces_the_backoff(self):
+        self.limit.rate_limited_response({'Retry-After': '7'})
+        self.assertEqual(self.limit.paused_until, self.clock.now + 7)
+        self.limit.rate_limited_response({'retry-after-ms': '250'})
+        self.assertEqual(self.limit.paused_until, self.clock.now + 7)
+        self.assertEqual(self.limit.stats()['paused_for'], 7)
+
+    def test_headers_cap_the_buckets(self):
+        self.limit.observe_headers({
+            'llm_provider-x-ratelimit-remaining-requests': '3',
+            'x-ratelimit-remaining-tokens': '0',
+            'x-ratelimit-reset-tokens': '6m0s',
+        })
+        self.assertEqual(self.limit.requests.level, 3)
+        self.assertEqual(self.limit.tokens.level, 0)
+        self.assertEqual(self.limit.paused_until, self.clock.now + 360)
+
+    def test_headers_of_a_langchain_result(self):
+        class Message:
+            response_metadata = {'headers': {'x-ratelimit-remaining-requests': '2'}}
+
+        class Generation:
+            message = Message()
+
+        class Result:
+            generations = [[Generation()]]
+            llm_output = {}
+
+        self.assertEqual(_result_headers(Result()), {'x-ratelimit-remaining-requests': '2'})
+        Result.generations = []
+        self.assertEqual(_result_headers(Result()), {})
+
+class WithdrawTest(unittest.TestCase):
+    def test_withdrawn_acquire_leaves_the_queue_without_taking_tokens(self):
+        limiter = RateLimiter()
+        key = ('OpenAI', 'digest')
+        limiter.serve('acquire', key, 1, None, 'crew-a', (0,))
+        withdrawn = threading.Event()
+        errors = []
+
+        def wait_for_turn():
+            try:
+                limiter.serve('acquire', key, 1, None, 'crew-b', (0,), withdrawn=withdrawn)
+            except AcquireWithdrawn as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=wait_for_turn)
+        thread.start()
+        limit = limiter.limits[key]
+        while not limit.waiting:
+            thread.join(0.01)
+        limiter.withdraw(key, withdrawn)
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(limit.waiting, [])
+        self.assertEqual(limit.calls, 1)
+
+    def test_withdrawn_before_serving_never_queues(self):
+        limiter = RateLimiter()
+        withdrawn = threading.Event()
+        limiter.withdraw(('OpenAI', 'digest'), withdrawn)
+        with self.assertRaises(AcquireWithdrawn):
+            limiter.serve('acquire', ('OpenAI', 'digest'), None, None, 'crew-a', (0,), withdrawn=withdrawn)
+
+if __name__ == '__main__':
+    unittest.main()
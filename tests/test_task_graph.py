@@ -0,0 +1,59 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+from task_graph import CycleError, TaskGraph
+
+class StubTask:
+    def __init__(self, id, async_context=None, sync_context=None):
+        self.id = id
+        self.context_from_async_tasks_ids = async_context
+        self.context_from_sync_tasks_ids = sync_context
+
+class TaskGraphTest(unittest.TestCase):
+    def test_order_moves_a_task_after_its_context(self):
+        graph = TaskGraph([StubTask('T1', sync_context=['T3']), StubTask('T2'), StubTask('T3')])
+        self.assertEqual(graph.order(), ['T2', 'T3', 'T1'])
+        self.assertEqual(graph.dependencies['T1'], ['T3'])
+        self.assertEqual(graph.dependents['T3'], ['T1'])
+
+    def test_order_keeps_crew_order_without_dependencies(self):
+        graph = TaskGraph([StubTask('T1'), StubTask('T2', async_context=['T1']), StubTask('T3')])
+        self.assertEqual(graph.order(), ['T1', 'T2', 'T3'])
+
+    def test_two_task_cycle(self):
+        graph = TaskGraph([StubTask('T0'), StubTask('T1', sync_context=['T2']), StubTask('T2', async_context=['T1'])])
+        with self.assertRaises(CycleError) as raised:
+            graph.order()
+        self.assertEqual(raised.exception.cycle, ['T2', 'T1'])
+        self.assertIn('T2 -> T1 -> T2', str(raised.exception))
+
+    def test_self_reference_is_a_cycle(self):
+        graph = TaskGraph([StubTask('T1'), StubTask('T2', sync_context=['T2'])])
+        with self.assertRaises(CycleError) as raised:
+            graph.order()
+        self.assertEqual(raised.exception.cycle, ['T2'])
+
+    def test_simulate_is_bounded_by_width(self):
+        graph = TaskGraph([StubTask(f'T{i}') for i in range(4)])
+        self.assertEqual(graph.simulate({}, width=1), 4.0)
+        self.assertEqual(graph.simulate({}, width=2), 2.0)
+        self.assertEqual(graph.simulate({}, width=8), 1.0)
+
+    def test_simulate_and_critical_path_follow_dependencies(self):
+        graph = TaskGraph([StubTask('A'), StubTask('B'), StubTask('C', sync_context=['A'])])
+        durations = {'A': 1.0, 'B': 2.0, 'C': 3.0}
+        self.assertEqual(graph.simulate(durations, width=1), 6.0)
+        self.assertEqual(graph.simulate(durations, width=2), 4.0)
+        self.assertEqual(graph.critical_path(durations), (['A', 'C'], 4.0))
+        estimate = graph.estimate(durations, width=2)
+        self.assertEqual(estimate['speedup'], 1.5)
+
+    def test_missing_durations_count_as_the_average(self):
+        graph = TaskGraph([StubTask('A'), StubTask('B', sync_context=['A'])])
+        self.assertEqual(graph.simulate({'A': 4.0}), 8.0)
+
+if __name__ == '__main__':
+    unittest.main()